@@ -14,8 +14,9 @@ import numpy as np
 from pathlib import Path
 import vtk
 
-from inference_engine import SliceOrganDetector
-from utils.helpers import check_device, save_results
+from utils.helpers import save_results
+from utils.roi import crop_geometry
+from utils.vtk_bridge import label_color
 
 
 class DetectionWorker(QThread):
@@ -24,20 +25,34 @@ class DetectionWorker(QThread):
     Emits signals to update the UI with progress and results.
     """
     progress = pyqtSignal(int, str)  # (percentage, message)
-    finished = pyqtSignal(list)  # List of detection results
+    detector_ready = pyqtSignal(object)  # Detector created by this worker
+    finished = pyqtSignal(object)  # SegmentationResult (label volume + per-slice metadata)
     error = pyqtSignal(str)  # Error message
 
-    def __init__(self, detector, images, filenames):
+    def __init__(self, detector, images, filenames, geometry=None, fast_mode=True, roi=None, margin=20.0, lps=True):
         super().__init__()
         self.detector = detector
         self.images = images
         self.filenames = filenames
+        self.geometry = geometry
+        self.lps = lps
+        self.fast_mode = fast_mode
+        self.roi = roi
+        self.margin = margin
 
     def run(self):
         """Run detection in background thread."""
         try:
+            if self.detector is None:
+                # torch/TotalSegmentator are imported and the device probed here, off the GUI thread
+                self.progress.emit(5, "Loading TotalSegmentator and checking device...")
+                from inference_engine import SliceOrganDetector
+                self.detector = SliceOrganDetector(fast_mode=self.fast_mode)
+                self.detector_ready.emit(self.detector)
+
             self.progress.emit(10, "Initializing detector...")
-            results = self.detector.detect_organs_in_slices(self.images, self.filenames)
+            results = self.detector.detect_organs_in_slices(self.images, self.filenames, self.geometry,
+                                                            roi=self.roi, margin=self.margin, lps=self.lps)
             self.progress.emit(100, "Detection complete!")
             self.finished.emit(results)
         except Exception as e:
@@ -58,8 +73,12 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
         self.detector = None
         self.results = None
         self.current_slice_idx = 0
-        self.images_cache = None
-        self.overlay_actors = {}  # Store overlay actors for each viewer
+        self.volume = None  # Zero-copy view of the viewer's volume (Z, Y, X)
+        self.geometry = None
+        self.geometry_lps = True
+        self.results_factor = 1  # Downsampling factor of the volume the results refer to
+        self.results_start = 0  # Index of the first processed slice in that volume
+        self.label_volume = None  # Results as one label volume of the viewer's shape (overlay)
 
         # Set dock widget properties
         self.setAllowedAreas(QtCore.Qt.LeftDockWidgetArea | QtCore.Qt.RightDockWidgetArea)
@@ -81,15 +100,15 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
         # Add stretch to push everything to top
         main_layout.addStretch()
 
-        # Check device on startup
-        self.device = check_device()
+        # The device is probed on the first detection run, not at startup
+        self.device = None
 
     def _create_device_info_section(self, parent_layout):
         """Create section showing GPU/CPU status."""
         group = QtWidgets.QGroupBox("⚙️ System Status")
         layout = QtWidgets.QVBoxLayout()
 
-        self.device_label = QtWidgets.QLabel("Checking device...")
+        self.device_label = QtWidgets.QLabel("Device is checked on the first detection run")
         self.device_label.setStyleSheet("padding: 5px;")
         layout.addWidget(self.device_label)
 
@@ -107,6 +126,27 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
         self.fast_mode_checkbox.setToolTip("Uses faster inference with slightly lower accuracy")
         layout.addWidget(self.fast_mode_checkbox)
 
+        # Coarse pass on a pyramid level
+        self.coarse_checkbox = QtWidgets.QCheckBox("Coarse pass (2× downsampled volume)")
+        self.coarse_checkbox.setChecked(False)
+        self.coarse_checkbox.setToolTip("Runs on the viewer's 2× pyramid level: 8× fewer voxels, coarser masks")
+        layout.addWidget(self.coarse_checkbox)
+
+        # Segment only the ROI set in the viewers (plus some context)
+        roi_layout = QtWidgets.QHBoxLayout()
+        self.roi_checkbox = QtWidgets.QCheckBox("Restrict to ROI, margin:")
+        self.roi_checkbox.setChecked(False)
+        self.roi_checkbox.setToolTip("Segments only the box set with ROI > Set ROI; time scales with the box size")
+        roi_layout.addWidget(self.roi_checkbox)
+
+        self.roi_margin_spinbox = QtWidgets.QDoubleSpinBox()
+        self.roi_margin_spinbox.setRange(0.0, 200.0)
+        self.roi_margin_spinbox.setValue(20.0)
+        self.roi_margin_spinbox.setSuffix(" mm")
+        self.roi_margin_spinbox.setToolTip("Context added around the ROI")
+        roi_layout.addWidget(self.roi_margin_spinbox)
+        layout.addLayout(roi_layout)
+
         # Slice range selection
         slice_layout = QtWidgets.QHBoxLayout()
         slice_layout.addWidget(QtWidgets.QLabel("Process slices:"))
@@ -201,6 +241,13 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
 
         layout.addLayout(overlay_layout)
 
+        # Organs drawn in the overlay (unchecking one only edits the overlay's LUT)
+        self.organ_list = QtWidgets.QListWidget()
+        self.organ_list.setMaximumHeight(120)
+        self.organ_list.setToolTip("Organs shown in the overlay")
+        self.organ_list.itemChanged.connect(self.on_organ_toggled)
+        layout.addWidget(self.organ_list)
+
         group.setLayout(layout)
         parent_layout.addWidget(group)
 
@@ -209,7 +256,7 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
         group = QtWidgets.QGroupBox("💾 Export Results")
         layout = QtWidgets.QVBoxLayout()
 
-        self.save_button = QtWidgets.QPushButton("Save Results (CSV + Masks)")
+        self.save_button = QtWidgets.QPushButton("Save Results (CSV + Masks + RLE)")
         self.save_button.clicked.connect(self.save_detection_results)
         self.save_button.setEnabled(False)
         layout.addWidget(self.save_button)
@@ -226,15 +273,22 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
             filename (str): Path to loaded MHD/DICOM file
         """
         try:
-            # Get image data from VTK reader
-            if self.vtkBaseClass.reader is None:
-                return
-
-            # Extract all slices from the 3D volume
-            self.images_cache = self._extract_slices_from_vtk()
-
-            if self.images_cache:
-                num_slices = len(self.images_cache)
+            # Share the viewer's volume (native dtype, no copy)
+            self.volume = self.vtkBaseClass.get_volume_array()
+            self.geometry = self.vtkBaseClass.get_volume_geometry()
+            # Only DICOM geometry is in LPS; NIfTI/MetaImage geometry is exported as read
+            storedVolume = self.vtkBaseClass.storedVolume
+            self.geometry_lps = storedVolume is not None and storedVolume.lps
+
+            # Results of the previous study do not apply to this one
+            self.results = None
+            self.label_volume = None
+            self.organ_list.clear()
+            self.results_text.clear()
+            self.save_button.setEnabled(False)
+
+            if self.volume is not None and len(self.volume) > 0:
+                num_slices = len(self.volume)
                 self.run_button.setEnabled(True)
                 self.status_label.setText(f"✓ Ready: {num_slices} slices loaded")
                 self.status_label.setStyleSheet("color: green; padding: 5px;")
@@ -243,73 +297,48 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
                 self.slice_spinbox.setMaximum(num_slices - 1)
                 self.slice_spinbox.setValue(num_slices // 2)  # Start at middle
 
-                # Update device info
-                import torch
-                if torch.cuda.is_available():
-                    gpu_name = torch.cuda.get_device_name(0)
-                    vram = torch.cuda.get_device_properties(0).total_memory / (1024 ** 3)
-                    self.device_label.setText(f"✓ GPU: {gpu_name}\nVRAM: {vram:.1f} GB")
-                    self.device_label.setStyleSheet("color: green; padding: 5px; font-weight: bold;")
-                else:
-                    self.device_label.setText("⚠️ CPU Mode (Slow)\nRecommend: Use GPU")
-                    self.device_label.setStyleSheet("color: orange; padding: 5px;")
             else:
-                self.status_label.setText("❌ Failed to extract slices")
+                self.status_label.setText("❌ No volume data loaded")
                 self.status_label.setStyleSheet("color: red; padding: 5px;")
 
         except Exception as e:
             self.status_label.setText(f"❌ Error: {str(e)}")
             self.status_label.setStyleSheet("color: red; padding: 5px;")
 
-    def _extract_slices_from_vtk(self):
-        """
-        Extract 2D slices from VTK 3D image data.
-        Returns list of numpy arrays (one per slice).
-        """
-        try:
-            # Get the VTK image data
-            image_data = self.vtkBaseClass.reader.GetOutput()
-            dims = image_data.GetDimensions()
-
-            # Convert VTK image to numpy array
-            from vtk.util import numpy_support
-            vtk_array = image_data.GetPointData().GetScalars()
-            numpy_array = numpy_support.vtk_to_numpy(vtk_array)
-
-            # Reshape to 3D (assuming axial slices along Z axis)
-            numpy_array = numpy_array.reshape(dims[2], dims[1], dims[0])
-
-            # Extract each slice
-            slices = []
-            for z in range(dims[2]):
-                slice_data = numpy_array[z, :, :].astype(np.float32)
-                slices.append(slice_data)
-
-            return slices
-
-        except Exception as e:
-            print(f"Error extracting slices: {e}")
-            return None
-
     def run_detection(self):
         """Run TotalSegmentator detection in background thread."""
-        if not self.images_cache:
+        if self.volume is None:
             QtWidgets.QMessageBox.warning(self, "No Data", "Please load DICOM data first")
             return
 
-        # Initialize detector if needed
-        if self.detector is None:
-            fast_mode = self.fast_mode_checkbox.isChecked()
-            self.detector = SliceOrganDetector(device=self.device, fast_mode=fast_mode)
+        # Full volume, or the viewer's 2x pyramid level for a coarse pass
+        volume, volume_geometry, self.results_factor, self.results_start = self.volume, self.geometry, 1, 0
+        pyramid = self.vtkBaseClass.volumePyramid
+        if self.coarse_checkbox.isChecked() and pyramid is not None and pyramid.get_level(2) is not None:
+            (volume, volume_geometry), self.results_factor = pyramid.get_level(2), 2
 
         # Determine which slices to process
         slice_mode = self.slice_range_combo.currentText()
         if slice_mode == "Current slice only":
-            images_to_process = [self.images_cache[self.current_slice_idx]]
-            filenames = [f"slice_{self.current_slice_idx:04d}"]
+            index = min(self.current_slice_idx // self.results_factor, len(volume) - 1)
+            images_to_process = volume[index:index + 1]
+            geometry = crop_geometry(volume_geometry, (0, 0, index))
+            filenames = [f"slice_{index:04d}"]
+            self.results_start = index
         else:  # "All slices" or "Custom range"
-            images_to_process = self.images_cache
-            filenames = [f"slice_{i:04d}" for i in range(len(self.images_cache))]
+            images_to_process = volume
+            geometry = volume_geometry
+            filenames = [f"slice_{i:04d}" for i in range(len(volume))]
+
+        # ROI in the voxels of the volume processed (the detector crops a view of it)
+        roi = None
+        if self.roi_checkbox.isChecked():
+            if self.vtkBaseClass.roiExtent is None:
+                QtWidgets.QMessageBox.warning(self, "No ROI", "Set an ROI first (ROI > Set ROI)")
+                return
+            roi = [value // self.results_factor for value in self.vtkBaseClass.roiExtent]
+            if slice_mode == "Current slice only":
+                roi[4:6] = [0, 0]
 
         # Disable controls during processing
         self.run_button.setEnabled(False)
@@ -319,12 +348,31 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
         self.status_label.setStyleSheet("color: blue; padding: 5px;")
 
         # Create and start worker thread
-        self.worker = DetectionWorker(self.detector, images_to_process, filenames)
+        # The detector is created by the worker on the first run
+        self.worker = DetectionWorker(self.detector, images_to_process, filenames, geometry,
+                                      fast_mode=self.fast_mode_checkbox.isChecked(),
+                                      roi=roi, margin=self.roi_margin_spinbox.value(), lps=self.geometry_lps)
+        self.worker.detector_ready.connect(self.on_detector_ready)
         self.worker.progress.connect(self.on_detection_progress)
         self.worker.finished.connect(self.on_detection_finished)
         self.worker.error.connect(self.on_detection_error)
         self.worker.start()
 
+    def on_detector_ready(self, detector):
+        """Keep the detector created by the worker and show its device."""
+        self.detector = detector
+        self.device = detector.device
+
+        import torch  # Already loaded by the detector
+        if self.device.type == "cuda":
+            gpu_name = torch.cuda.get_device_name(0)
+            vram = torch.cuda.get_device_properties(0).total_memory / (1024 ** 3)
+            self.device_label.setText(f"✓ GPU: {gpu_name}\nVRAM: {vram:.1f} GB")
+            self.device_label.setStyleSheet("color: green; padding: 5px; font-weight: bold;")
+        else:
+            self.device_label.setText("⚠️ CPU Mode (Slow)\nRecommend: Use GPU")
+            self.device_label.setStyleSheet("color: orange; padding: 5px;")
+
     def on_detection_progress(self, percentage, message):
         """Update progress bar during detection."""
         self.progress_bar.setValue(percentage)
@@ -333,6 +381,7 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
     def on_detection_finished(self, results):
         """Handle detection completion."""
         self.results = results
+        self.label_volume = None
         self.progress_bar.setVisible(False)
         self.run_button.setEnabled(True)
         self.save_button.setEnabled(True)
@@ -344,11 +393,15 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
 
             # Display results for current slice
             self.display_results_for_slice(self.current_slice_idx)
+            self.fill_organ_list()
 
             # Add overlays to viewers if enabled
             if self.show_overlay_checkbox.isChecked():
                 self.update_overlay_on_viewers()
         else:
+            self.organ_list.clear()
+            self.vtkBaseClass.labelOverlay.clear()
+            self.vtkBaseClass.commandSliceSelect.request_render()
             self.status_label.setText("⚠️ No organs detected")
             self.status_label.setStyleSheet("color: orange; padding: 5px;")
 
@@ -370,7 +423,13 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
 
     def display_results_for_slice(self, slice_idx):
         """Display detection results for a specific slice."""
-        if not self.results or slice_idx >= len(self.results):
+        # Coarse results have one entry per block of results_factor slices,
+        # starting at results_start (e.g. a single-slice run)
+        slice_idx = slice_idx // self.results_factor - self.results_start
+        if not self.results:
+            return
+        if not 0 <= slice_idx < len(self.results):
+            self.results_text.setHtml("<i style='color: #999;'>This slice was not processed</i>")
             return
 
         result = self.results[slice_idx]
@@ -392,21 +451,80 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
 
         self.results_text.setHtml(html)
 
+    def build_label_volume(self):
+        """
+        Detection results as one label volume of the viewer's shape.
+
+        Full-volume results are used as they are; coarse results are
+        repeated over each 2x2x2 block, single-slice results placed at their
+        slice, and the rest of the volume is 0.
+        """
+        source = self.results.labels
+        if self.results_factor == 1 and source.shape == self.volume.shape:
+            return source
+
+        labels = np.zeros(self.volume.shape, dtype=source.dtype)
+        factor = self.results_factor
+        depth, height, width = labels.shape
+        for result in self.results:
+            if not result['labels']:
+                continue
+            plane = source[result['slice_index']]
+            if factor > 1:
+                plane = plane.repeat(factor, axis=0).repeat(factor, axis=1)
+            z = (self.results_start + result['slice_index']) * factor
+            labels[z:z + factor, :plane.shape[0], :plane.shape[1]] = plane[:height, :width]
+        return labels
+
     def update_overlay_on_viewers(self):
-        """Add segmentation overlays to the MPR viewers (placeholder for VTK integration)."""
-        # TODO: Implement VTK overlay rendering on your orthogonal viewers
-        # This requires accessing your QtOrthoViewer instances and adding mask actors
-        pass
+        """Draw the detections over the orthogonal views and the 3D planes."""
+        if not self.results or self.volume is None:
+            return
+        # Built once per run; slice changes only make each view reslice its label plane
+        if self.label_volume is None:
+            self.label_volume = self.build_label_volume()
+            overlay = self.vtkBaseClass.labelOverlay
+            overlay.set_opacity(self.overlay_opacity_slider.value() / 100.0)
+            overlay.set_visible(self.show_overlay_checkbox.isChecked())
+            self.vtkBaseClass.set_label_volume(self.label_volume)
+            for row in range(self.organ_list.count()):
+                item = self.organ_list.item(row)
+                overlay.set_label_visible(item.data(QtCore.Qt.UserRole), item.checkState() == QtCore.Qt.Checked)
 
     def toggle_overlay_visibility(self, state):
         """Show/hide overlays on viewers."""
-        # TODO: Implement overlay visibility toggle
-        pass
+        self.vtkBaseClass.labelOverlay.set_visible(bool(state))
+        if state:
+            self.update_overlay_on_viewers()
+        self.vtkBaseClass.commandSliceSelect.request_render()
 
     def update_overlay_opacity(self, value):
         """Update overlay transparency."""
-        # TODO: Implement opacity adjustment
-        pass
+        self.vtkBaseClass.labelOverlay.set_opacity(value / 100.0)
+        self.vtkBaseClass.commandSliceSelect.request_render()
+
+    def fill_organ_list(self):
+        """List the detected organs, each with its overlay color and a visibility checkbox."""
+        overlay = self.vtkBaseClass.labelOverlay
+        self.organ_list.blockSignals(True)
+        self.organ_list.clear()
+        for organ in self.results.organs():
+            label = self.results.organ_label(organ)
+            item = QtWidgets.QListWidgetItem(organ.replace('_', ' ').title())
+            item.setData(QtCore.Qt.UserRole, label)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Unchecked if label in overlay.hiddenLabels else QtCore.Qt.Checked)
+            pixmap = QtGui.QPixmap(12, 12)
+            pixmap.fill(QtGui.QColor.fromRgbF(*label_color(label)))
+            item.setIcon(QtGui.QIcon(pixmap))
+            self.organ_list.addItem(item)
+        self.organ_list.blockSignals(False)
+
+    def on_organ_toggled(self, item):
+        """Show/hide one organ in the overlay."""
+        self.vtkBaseClass.labelOverlay.set_label_visible(item.data(QtCore.Qt.UserRole),
+                                                         item.checkState() == QtCore.Qt.Checked)
+        self.vtkBaseClass.commandSliceSelect.request_render()
 
     def save_detection_results(self):
         """Save results to CSV and mask images."""
@@ -427,7 +545,6 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
         try:
             # Prepare data for saving
             results_data = []
-            masks_to_save = []
 
             for result in self.results:
                 for organ in result['organs']:
@@ -436,16 +553,18 @@ class QtOrganDetectionWidget(QtWidgets.QDockWidget):
                         'slice_index': result['slice_index'],
                         'organ': organ,
                         'confidence': result['confidence'],
+                        'pixel_count': result['pixel_counts'][organ],
                         'mask_path': f"masks/{Path(result['filename']).stem}_{organ}_mask.png"
                     })
 
-                    masks_to_save.append({
-                        'filename': f"{Path(result['filename']).stem}_{organ}",
-                        'mask': result['masks'][organ]
-                    })
+            # Masks are made from the label volume one at a time while they are written,
+            # in DICOM row order like the command-line output
+            rows_flipped = self.vtkBaseClass.storedVolume.rows_flipped
+            masks_to_save = self.results.export_masks(flip_rows=rows_flipped)
 
-            # Save using utils function
-            csv_path, masks_dir = save_results(output_dir, results_data, masks_to_save)
+            # Save using utils function (plus the run-length encoded masks)
+            csv_path, masks_dir = save_results(output_dir, results_data, masks_to_save,
+                                               rle=self.results.to_rle(flip_rows=rows_flipped))
 
             QtWidgets.QMessageBox.information(
                 self,
@@ -8,6 +8,8 @@ from viewers.QtSegmentationViewer import QtSegmentationViewer
 from components.VtkBase import VtkBase
 from components.ViewersConnection import ViewersConnection
 from viewers.ROIViewer import ROIViewer
+from utils.LoadWorker import LoadWorker
+from utils.startup import startup_timer
 # NEW: Import organ detection widget
 from QtOrganDetectionWidget import QtOrganDetectionWidget
 
@@ -26,6 +28,7 @@ class MainWindow(QtWidgets.QMainWindow):
         
         # Create the viewers
         self.vtkBaseClass = VtkBase()
+        startup_timer.mark("MainWindow: VtkBase")
         self.QtSagittalOrthoViewer = QtOrthoViewer(self.vtkBaseClass, SLICE_ORIENTATION_YZ, "Sagittal Plane - YZ")
         self.QtCoronalOrthoViewer = QtOrthoViewer(self.vtkBaseClass, SLICE_ORIENTATION_XZ, "Coronal Plane - XZ")
         self.QtAxialOrthoViewer = QtOrthoViewer(self.vtkBaseClass, SLICE_ORIENTATION_XY, "Axial Plane - XY")
@@ -37,6 +40,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ViewersConnection.add_orthogonal_viewer(self.QtAxialOrthoViewer.get_viewer())
         self.ViewersConnection.add_segmentation_viewer(self.QtExtraViewer.get_viewer())
         self.ViewersConnection.connect_orthogonal_viewers()
+        startup_timer.mark("MainWindow: viewers")
 
         # Set up the main layout
         main_splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
@@ -61,9 +65,25 @@ class MainWindow(QtWidgets.QMainWindow):
         self.status_bar = QtWidgets.QStatusBar()
         self.setStatusBar(self.status_bar)
 
+        ## Loading progress and cancel
+        self.load_progress_bar = QtWidgets.QProgressBar()
+        self.load_progress_bar.setRange(0, 100)
+        self.load_progress_bar.setMaximumWidth(200)
+        self.load_cancel_button = QtWidgets.QPushButton("Cancel")
+        self.load_cancel_button.clicked.connect(self.cancel_loading)
+        self.status_bar.addPermanentWidget(self.load_progress_bar)
+        self.status_bar.addPermanentWidget(self.load_cancel_button)
+        self.load_progress_bar.hide()
+        self.load_cancel_button.hide()
+
+        ## Study loading runs on a worker thread
+        self.load_worker = None
+        self.load_threads = []  # Kept referenced until each thread has finished
+
         # NEW: Add organ detection dock widget to the right side
         self.organ_detection_widget = QtOrganDetectionWidget(self.vtkBaseClass, parent=self)
         self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.organ_detection_widget)
+        startup_timer.mark("MainWindow: detection panel")
 
         # Add menu bar
         self.create_menu()
@@ -85,6 +105,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         file_menu = menu_bar.addMenu("File")
         roi_menu = menu_bar.addMenu("ROI")
+        cine_menu = menu_bar.addMenu("Cine")
+        window_menu = menu_bar.addMenu("Window")
 
         open_action = QtWidgets.QAction("Open Image", self)
         open_action.setShortcut("Ctrl+o")
@@ -95,16 +117,43 @@ class MainWindow(QtWidgets.QMainWindow):
         self.toggle_roi_action.setShortcut("Ctrl+r")
         self.set_roi_action = QtWidgets.QAction("Set ROI", self)
         self.set_roi_action.setShortcut("Ctrl+s")
+        play_all_action = QtWidgets.QAction("Play All Planes", self)
+        play_all_action.setShortcut("Ctrl+p")
+        pause_all_action = QtWidgets.QAction("Pause All Planes", self)
+        pause_all_action.setShortcut("Ctrl+Shift+p")
 
         open_action.triggered.connect(self.open_data)
         open_folder_action.triggered.connect(self.open_folder)
         self.toggle_roi_action.triggered.connect(self.toggle_roi)
         self.set_roi_action.triggered.connect(self.set_roi)
+        play_all_action.triggered.connect(self.play_all_planes)
+        pause_all_action.triggered.connect(self.pause_all_planes)
 
         file_menu.addAction(open_action)
         file_menu.addAction(open_folder_action)
         roi_menu.addAction(self.toggle_roi_action)
         roi_menu.addAction(self.set_roi_action)
+        cine_menu.addAction(play_all_action)
+        cine_menu.addAction(pause_all_action)
+
+        # Window/level presets from the study's histogram (no pass over the voxels)
+        for text, preset, shortcut in (("Auto", "auto", "Ctrl+0"), ("Lung", "lung", "Ctrl+1"),
+                                       ("Bone", "bone", "Ctrl+2"), ("Soft Tissue", "soft_tissue", "Ctrl+3")):
+            preset_action = QtWidgets.QAction(text, self)
+            preset_action.setShortcut(shortcut)
+            preset_action.triggered.connect(lambda checked, preset=preset: self.vtkBaseClass.set_window_preset(preset))
+            window_menu.addAction(preset_action)
+
+    # Cine in the three planes at once: the tracks start on the same tick of the shared clock
+    def play_all_planes(self):
+        for viewer in (self.QtSagittalOrthoViewer, self.QtCoronalOrthoViewer, self.QtAxialOrthoViewer):
+            if viewer.playBtn.isEnabled() and not viewer.status:
+                viewer.play_slices()
+
+    def pause_all_planes(self):
+        for viewer in (self.QtSagittalOrthoViewer, self.QtCoronalOrthoViewer, self.QtAxialOrthoViewer):
+            if viewer.status:
+                viewer.pause_slices()
 
     def toggle_roi(self):
         if self.toggle_roi_action.isChecked():
@@ -128,35 +177,113 @@ class MainWindow(QtWidgets.QMainWindow):
     def open_data(self):
         file_dialog = QFileDialog()
         file_dialog.setFileMode(QFileDialog.ExistingFile)
-        file_dialog.setNameFilter("Image Files (*.nii *.nii.gz *.mhd)")
+        file_dialog.setNameFilter("Image Files (*.nii *.nii.gz *.mhd *.mha)")
         if file_dialog.exec_():
             filenames = file_dialog.selectedFiles()
             if len(filenames) > 0:
-                filename = filenames[0]
-                try:
-                    self.load_data(filename)
-                    self.render_data()
-                except Exception as e:
-                    print(e)
-                    QtWidgets.QMessageBox.critical(self, "Error", "Unable to open the image file.")
+                self.start_loading(filenames[0])
 
     def open_folder(self):
         folder_dialog = QFileDialog()
         folder_dialog.setFileMode(QFileDialog.Directory)
         folder_dialog.setOption(QFileDialog.ShowDirsOnly, True)
         if folder_dialog.exec_():
-            folder_path = folder_dialog.selectedFiles()[0]
-            try:
-                self.load_data(folder_path)
-                self.render_data()
-            except Exception as e:
-                print(e)
-                QtWidgets.QMessageBox.critical(self, "Error", "Unable to open the folder.")
-
-    # Load the data
+            self.start_loading(folder_dialog.selectedFiles()[0])
+
+    # Start loading a study in the background (replaces any load in progress)
+    def start_loading(self, path):
+        self.cancel_loading()
+
+        thread = QtCore.QThread()
+        worker = LoadWorker(path)
+        worker.moveToThread(thread)
+
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.on_load_progress)
+        worker.preview.connect(self.on_load_preview)
+        worker.finished.connect(self.on_load_finished)
+        worker.failed.connect(self.on_load_failed)
+        worker.cancelled.connect(self.on_load_cancelled)
+        for signal in (worker.finished, worker.failed, worker.cancelled):
+            signal.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(lambda: self.load_threads.remove(thread))
+
+        self.load_worker = worker
+        self.load_threads.append(thread)
+        self.load_progress_bar.setValue(0)
+        self.load_progress_bar.show()
+        self.load_cancel_button.show()
+        self.status_bar.showMessage(f"Loading {path}")
+        thread.start()
+
+    # Cancel the current load, if any
+    def cancel_loading(self):
+        if self.load_worker is not None:
+            self.load_worker.cancel()
+            self.load_worker = None
+            self.end_loading()
+            self.status_bar.showMessage("Loading cancelled", 3000)
+
+    # Signals from a cancelled or replaced worker are ignored
+    def is_current_load(self):
+        return self.load_worker is not None and self.sender() is self.load_worker
+
+    def on_load_progress(self, percent, message):
+        if self.is_current_load():
+            self.load_progress_bar.setValue(percent)
+            self.status_bar.showMessage(message)
+
+    def on_load_preview(self, storedVolume):
+        if self.is_current_load():
+            self.show_volume(storedVolume, preview=True)
+            self.status_bar.showMessage("Preview shown, loading full resolution...")
+
+    def on_load_finished(self, storedVolume):
+        if self.is_current_load():
+            self.load_worker = None
+            self.end_loading()
+            self.show_volume(storedVolume)
+            self.status_bar.showMessage(f"Loaded {storedVolume.source}", 5000)
+
+    def on_load_failed(self, message):
+        if self.is_current_load():
+            self.load_worker = None
+            self.end_loading()
+            self.status_bar.clearMessage()
+            QtWidgets.QMessageBox.critical(self, "Error", f"Unable to open the data.\n{message}")
+
+    def on_load_cancelled(self):
+        if self.is_current_load():
+            self.load_worker = None
+            self.end_loading()
+            self.status_bar.showMessage("Loading cancelled", 3000)
+
+    def end_loading(self):
+        self.load_progress_bar.hide()
+        self.load_cancel_button.hide()
+
+    # Load the data (synchronously)
     def load_data(self, filename):
         self.vtkBaseClass.connect_on_data(filename)
+        self.connect_viewers(filename)
 
+        # NEW: Notify organ detection widget that data is loaded
+        self.organ_detection_widget.connect_on_data(filename)
+
+    # Show a volume opened by a LoadWorker (a coarse preview or the full study)
+    def show_volume(self, storedVolume, preview=False):
+        # The preview is already coarse, only the full volume gets a pyramid
+        self.vtkBaseClass.connect_on_volume(storedVolume, pyramid=not preview)
+        self.connect_viewers(storedVolume.source)
+
+        # Detection only runs on the full-resolution volume
+        if not preview:
+            self.organ_detection_widget.connect_on_data(storedVolume.source)
+        self.render_data()
+
+    # Connect the viewers on the data held by vtkBaseClass
+    def connect_viewers(self, filename):
         # Load the image into the correct viewer
         self.QtAxialOrthoViewer.connect_on_data(filename)
         self.QtCoronalOrthoViewer.connect_on_data(filename)
@@ -165,9 +292,6 @@ class MainWindow(QtWidgets.QMainWindow):
         self.QtExtraViewer.connect_on_data(filename)
         self.ViewersConnection.connect_on_data()
 
-        # NEW: Notify organ detection widget that data is loaded
-        self.organ_detection_widget.connect_on_data(filename)
-
     # Render the data
     def render_data(self):
         self.QtAxialOrthoViewer.render()
@@ -177,6 +301,10 @@ class MainWindow(QtWidgets.QMainWindow):
 
     # Close the application
     def closeEvent(self, QCloseEvent):
+        self.cancel_loading()
+        for thread in list(self.load_threads):
+            thread.quit()
+            thread.wait()
         super().closeEvent(QCloseEvent)
         self.QtAxialOrthoViewer.close()
         self.QtCoronalOrthoViewer.close()
@@ -0,0 +1,167 @@
+"""
+Benchmark of compressed DICOM decoding throughput per transfer syntax:
+one pydicom decode per file in a loop, the thread pool, and the process
+pool of utils.compressed_decode.
+
+Transfer syntaxes whose encoder or decoder is not installed are reported
+and skipped.
+
+Usage:
+    python benchmarks/bench_compressed_decoding.py --slices 100 --size 512
+    python benchmarks/bench_compressed_decoding.py --processes 2 4 8
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.encaps import encapsulate
+from pydicom.uid import (ExplicitVRLittleEndian, JPEG2000Lossless, JPEGBaseline8Bit,
+                         JPEGLSLossless, RLELossless, generate_uid)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.compressed_decode import codec_available
+from utils.helpers import load_dicom_series, select_dicom_series
+
+
+def phantom_slice(rng, size, z, bits):
+    """Smooth disc phantom plus noise, so the codecs see realistic data."""
+    y, x = np.mgrid[:size, :size] - size / 2
+    radius = size * (0.3 + 0.1 * np.sin(z / 10))
+    image = np.where(x ** 2 + y ** 2 < radius ** 2, 0.6, 0.1) + 0.2 * np.exp(-((x - z) ** 2 + y ** 2) / (size * 4))
+    image = image + rng.normal(0, 0.01, image.shape)
+    return np.clip(image * (2 ** bits - 1), 0, 2 ** bits - 1).astype(np.uint8 if bits == 8 else np.uint16)
+
+
+def _pillow_frame(pixels, fmt):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    if fmt == "JPEG2000":
+        Image.fromarray(pixels).save(buffer, format=fmt, irreversible=False, no_jp2=True)
+    else:
+        Image.fromarray(pixels).save(buffer, format=fmt, quality=95)
+    return buffer.getvalue()
+
+
+def write_series(folder, syntax, num_slices, size):
+    """
+    Write a synthetic series in one transfer syntax.
+
+    Returns:
+        str: Reason the syntax is not supported here, or None on success
+    """
+    bits = 8 if syntax == JPEGBaseline8Bit else 16
+    rng = np.random.default_rng(0)
+    series_uid = generate_uid()
+    for i in range(num_slices):
+        pixels = phantom_slice(rng, size, i, bits)
+
+        file_meta = FileMetaDataset()
+        file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.2'
+        file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+        ds = FileDataset(None, {}, file_meta=file_meta, preamble=b"\0" * 128)
+        ds.SOPClassUID = file_meta.MediaStorageSOPClassUID
+        ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+        ds.SeriesInstanceUID = series_uid
+        ds.Modality = 'CT'
+        ds.InstanceNumber = i + 1
+        ds.ImagePositionPatient = [0.0, 0.0, float(i)]
+        ds.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        ds.PixelSpacing = [0.7, 0.7]
+        ds.SliceThickness = 1.0
+        ds.Rows = size
+        ds.Columns = size
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = 'MONOCHROME2'
+        ds.BitsAllocated = bits
+        ds.BitsStored = bits
+        ds.HighBit = bits - 1
+        ds.PixelRepresentation = 0
+        ds.PixelData = pixels.tobytes()
+
+        try:
+            if syntax in (JPEG2000Lossless, JPEGBaseline8Bit):
+                # pydicom has no encoder for these without extra plugins; Pillow does
+                fmt = "JPEG2000" if syntax == JPEG2000Lossless else "JPEG"
+                ds.PixelData = encapsulate([_pillow_frame(pixels, fmt)])
+                ds['PixelData'].VR = 'OB'
+                ds.file_meta.TransferSyntaxUID = syntax
+                if syntax == JPEGBaseline8Bit:
+                    ds.PhotometricInterpretation = 'MONOCHROME2'
+            elif syntax != ExplicitVRLittleEndian:
+                ds.compress(syntax)
+        except Exception as e:
+            return f"cannot encode ({type(e).__name__}: {e})"
+        ds.save_as(str(Path(folder) / f"img_{i:05d}.dcm"), enforce_file_format=True)
+    return None
+
+
+def decode_loop(entries):
+    """One pydicom decode per file on one core."""
+    for entry in entries:
+        pydicom.dcmread(entry.path).pixel_array
+
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressed DICOM decoding per transfer syntax")
+    parser.add_argument('--slices', type=int, default=100, help='Slices per synthetic series')
+    parser.add_argument('--size', type=int, default=512, help='Synthetic slice size')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per path (best is reported)')
+    parser.add_argument('--processes', type=int, nargs='*', default=[max(2, os.cpu_count() or 1)],
+                        help='Process counts to test (1 is the thread pool)')
+    args = parser.parse_args()
+
+    syntaxes = [ExplicitVRLittleEndian, RLELossless, JPEGBaseline8Bit, JPEG2000Lossless, JPEGLSLossless]
+    print(f"{args.slices} slices of {args.size}x{args.size}, {os.cpu_count()} CPUs\n")
+    print(f"{'transfer syntax':<34}{'path':<18}{'time':>9}{'slices/s':>10}{'MB/s':>8}")
+
+    for syntax in syntaxes:
+        available, missing = codec_available(syntax)
+        if not available:
+            print(f"{syntax.name:<34}skipped: no decoder ({'; '.join(missing)})")
+            continue
+
+        with tempfile.TemporaryDirectory() as folder:
+            reason = write_series(folder, syntax, args.slices, args.size)
+            if reason:
+                print(f"{syntax.name:<34}skipped: {reason}")
+                continue
+            entries = select_dicom_series(folder)
+            megabytes = args.slices * args.size * args.size * np.dtype(entries[0].dtype).itemsize / 1e6
+
+            paths = [("pydicom loop", lambda: decode_loop(entries)),
+                     ("threads", lambda: load_dicom_series(entries, dtype=None, process_workers=1))]
+            for processes in sorted(set(args.processes) - {1}):
+                paths.append((f"{processes} processes",
+                              lambda p=processes: load_dicom_series(entries, dtype=None, process_workers=p,
+                                                                    min_process_slices=1)))
+
+            for name, fn in paths:
+                # Warm-up starts the worker pool so its start-up is not counted
+                fn()
+                elapsed = timed(fn, args.repeats)
+                print(f"{syntax.name[:33]:<34}{name:<18}{elapsed:8.3f}s{args.slices / elapsed:10.1f}"
+                      f"{megabytes / elapsed:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
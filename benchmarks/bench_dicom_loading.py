@@ -0,0 +1,105 @@
+"""
+Benchmark of DICOM folder loading: sequential per-file loop vs. the
+header-first, thread-pooled loader in utils.helpers.
+
+Usage:
+    python benchmarks/bench_dicom_loading.py --slices 300 --size 512
+    python benchmarks/bench_dicom_loading.py --input /path/to/dicom_folder
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.helpers import load_dicom_slice, load_dicom_volume
+
+
+def write_synthetic_series(folder, num_slices, size):
+    """Write a synthetic int16 CT series (shuffled file names) into folder."""
+    series_uid = generate_uid()
+    rng = np.random.default_rng(0)
+    for i in rng.permutation(num_slices):
+        file_meta = FileMetaDataset()
+        file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.2'
+        file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+        ds = FileDataset(None, {}, file_meta=file_meta, preamble=b"\0" * 128)
+        ds.SOPClassUID = file_meta.MediaStorageSOPClassUID
+        ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+        ds.SeriesInstanceUID = series_uid
+        ds.Modality = 'CT'
+        ds.InstanceNumber = int(i) + 1
+        ds.ImagePositionPatient = [0.0, 0.0, float(i)]
+        ds.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        ds.PixelSpacing = [0.7, 0.7]
+        ds.SliceThickness = 1.0
+        ds.Rows = size
+        ds.Columns = size
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = 'MONOCHROME2'
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 1
+        ds.RescaleSlope = 1
+        ds.RescaleIntercept = -1024
+        ds.PixelData = rng.integers(0, 2000, (size, size), dtype=np.int16).tobytes()
+        ds.save_as(str(Path(folder) / f"img_{i:05d}.dcm"), enforce_file_format=True)
+
+
+def load_sequential(folder):
+    """The previous behaviour: decode every file in turn, then sort."""
+    folder = Path(folder)
+    dicom_files = sorted(folder.glob("*.dcm")) or sorted(f for f in folder.iterdir() if f.is_file())
+    images, metadata_list = [], []
+    for dcm_file in dicom_files:
+        img, meta = load_dicom_slice(str(dcm_file))
+        if img is not None:
+            images.append(img)
+            metadata_list.append(meta)
+    order = sorted(range(len(images)), key=lambda i: metadata_list[i].get('InstanceNumber', 0))
+    return [images[i] for i in order]
+
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DICOM folder loading")
+    parser.add_argument('--input', '-i', default=None, help='Existing DICOM folder (synthetic if omitted)')
+    parser.add_argument('--slices', type=int, default=300, help='Synthetic series length')
+    parser.add_argument('--size', type=int, default=512, help='Synthetic slice size')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per loader (best is reported)')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 4, 8], help='Thread counts to test')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.input
+        if folder is None:
+            folder = tmp
+            print(f"Writing {args.slices} synthetic {args.size}x{args.size} slices...")
+            write_synthetic_series(folder, args.slices, args.size)
+
+        sequential = timed(lambda: load_sequential(folder), args.repeats)
+        print(f"{'sequential loop':<24}{sequential:8.3f} s")
+        for workers in args.workers:
+            elapsed = timed(lambda: load_dicom_volume(folder, max_workers=workers), args.repeats)
+            print(f"{f'header-first, {workers} thr':<24}{elapsed:8.3f} s   x{sequential / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark of fast slider scrolling through the axial view of a synthetic CT phantom.
+
+Slider ticks arrive from a timer faster than the display, and each tick
+does the viewer's per-tick work: take the windowed slice from the slice
+cache (prefetching ahead in the scroll direction), update the displayed
+plane and request a render. Ticks are run twice, once rendering on every
+tick as before and once through components.RenderScheduler, which draws
+the window once per display frame. The frame rates are reported against
+the 30 fps target.
+
+Usage:
+    python benchmarks/bench_slice_scrolling.py --size 512 --depth 800
+    python benchmarks/bench_slice_scrolling.py --tick-rate 500 --seconds 5
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from PyQt5.QtCore import QCoreApplication, QTimer, Qt
+from vtk import vtkImageActor, vtkRenderer, vtkRenderWindow
+from bench_volume_rendering import phantom
+from components.RenderScheduler import RenderScheduler
+from components.VolumeStore import StoredVolume
+from components.VtkBase import VtkBase
+from utils.vtk_bridge import numpy_to_vtk_source
+
+AXIAL = 2
+
+
+class ScrollView:
+    """An offscreen axial view showing slices the way OrthoViewer.update_slice_image does."""
+
+    def __init__(self, vtkBase, size):
+        self.vtkBase = vtkBase
+        self.renderWindow = vtkRenderWindow()
+        self.renderWindow.SetOffScreenRendering(1)
+        self.renderWindow.SetSize(size, size)
+        self.renderer = vtkRenderer()
+        self.renderWindow.AddRenderer(self.renderer)
+        self.actor = vtkImageActor()
+        self.renderer.AddActor(self.actor)
+        self.source = None
+        self.lastIndex = None
+
+    # The work of one slider tick, without the render
+    def show_slice(self, index):
+        direction = 0 if self.lastIndex is None else (index > self.lastIndex) - (index < self.lastIndex)
+        self.lastIndex = index
+        image = self.vtkBase.get_slice_image(AXIAL, index, direction)[np.newaxis]
+        if self.source is None:
+            self.source = numpy_to_vtk_source(image.copy())
+            self.actor.GetMapper().SetInputConnection(self.source.GetOutputPort())
+            self.renderer.ResetCamera()
+        else:
+            self.source.volume[...] = image
+            self.source.Modified()
+
+
+def scroll_positions(depth, ticks):
+    """Slice index of each tick: back and forth through the volume."""
+    cycle = list(range(depth)) + list(range(depth - 2, 0, -1))
+    return [cycle[i % len(cycle)] for i in range(ticks)]
+
+
+def run_ticks(app, view, positions, tick_rate, on_tick):
+    """Deliver the ticks from a timer at tick_rate per second; returns the elapsed time."""
+    remaining = iter(positions)
+    timer = QTimer()
+    timer.setTimerType(Qt.PreciseTimer)
+    timer.setInterval(max(1, int(1000 / tick_rate)))
+
+    def tick():
+        index = next(remaining, None)
+        if index is None:
+            timer.stop()
+            app.quit()
+            return
+        view.show_slice(index)
+        on_tick()
+
+    timer.timeout.connect(tick)
+    start = time.perf_counter()
+    timer.start()
+    app.exec_()
+    return time.perf_counter() - start
+
+
+def report(name, frames, seconds, frame_times, target):
+    fps = frames / seconds
+    verdict = "ok" if fps >= target else "below target"
+    print(f"{name:<22}{frames:8d}{fps:9.1f}{np.median(frame_times) * 1000:9.1f}"
+          f"{np.percentile(frame_times, 95) * 1000:9.1f}   {verdict}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fast slider scrolling")
+    parser.add_argument('--size', type=int, default=512, help='Phantom slice size')
+    parser.add_argument('--depth', type=int, default=300, help='Phantom slices')
+    parser.add_argument('--tick-rate', type=float, default=240.0, help='Slider ticks per second')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each run')
+    parser.add_argument('--window', type=int, default=512, help='Render window size')
+    parser.add_argument('--target-fps', type=float, default=30.0, help='Scrolling frame rate target')
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    volume = phantom(args.size, args.depth)
+    geometry = {'spacing': (0.7, 0.7, 1.0), 'origin': (0.0, 0.0, 0.0), 'direction': (1, 0, 0, 0, 1, 0, 0, 0, 1)}
+    vtkBase = VtkBase()
+    vtkBase.connect_on_volume(StoredVolume("phantom", volume, geometry, "phantom"), pyramid=False)
+    positions = scroll_positions(args.depth, int(args.tick_rate * args.seconds))
+
+    print(f"{args.size}x{args.size}x{args.depth} phantom, {args.window}x{args.window} window, "
+          f"{len(positions)} ticks at {args.tick_rate:.0f}/s, target {args.target_fps:.0f} fps\n")
+    print(f"{'mode':<22}{'frames':>8}{'fps':>9}{'median':>9}{'p95':>9}")
+
+    # Render on every tick
+    view = ScrollView(vtkBase, args.window)
+    frameTimes = []
+
+    def render_now():
+        start = time.perf_counter()
+        view.renderWindow.Render()
+        frameTimes.append(time.perf_counter() - start)
+
+    seconds = run_ticks(app, view, positions, args.tick_rate, render_now)
+    report("render per tick", len(frameTimes), seconds, frameTimes, args.target_fps)
+
+    # One render per display frame, however many ticks arrive in between
+    vtkBase.sliceCache.clear()
+    view = ScrollView(vtkBase, args.window)
+    scheduler = RenderScheduler()
+    frameTimes = []
+    scheduler.frameRendered.connect(frameTimes.append)
+    seconds = run_ticks(app, view, positions, args.tick_rate, lambda: scheduler.request(view.renderWindow))
+    scheduler.flush()
+    report("RenderScheduler", scheduler.renderCount, seconds, frameTimes, args.target_fps)
+
+
+if __name__ == "__main__":
+    main()
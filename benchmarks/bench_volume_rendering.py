@@ -0,0 +1,121 @@
+"""
+Benchmark of CPU volume rendering with level of detail on a synthetic CT phantom.
+
+A camera orbit is rendered offscreen twice: at full quality on every frame,
+and with components.VolumeRenderer's interactive LOD. Frame times are
+reported against the interactive target, followed by the still
+(full-quality) frame drawn when the interaction ends.
+
+Usage:
+    python benchmarks/bench_volume_rendering.py --size 256 --frames 60
+    python benchmarks/bench_volume_rendering.py --size 512 --target-fps 10
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from vtk import vtkRenderer, vtkRenderWindow
+from components.VolumeRenderer import VolumeRenderer
+from components.VolumeStore import StoredVolume
+from components.VtkBase import VtkBase
+
+
+def phantom(size, depth):
+    """CT-like int16 phantom: air, body, lungs, spine and ribs in Hounsfield units."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[:size, :size] / size - 0.5
+    body = (x / 0.4) ** 2 + (y / 0.3) ** 2 < 1
+    lungs = ((np.abs(x) - 0.17) / 0.12) ** 2 + (y / 0.18) ** 2 < 1
+    spine = x ** 2 + (y - 0.2) ** 2 < 0.04 ** 2
+
+    volume = np.empty((depth, size, size), dtype=np.int16)
+    for z in range(depth):
+        image = np.full((size, size), -1000, dtype=np.int16)
+        image[body] = 40
+        image[lungs] = -850
+        image[spine] = 700
+        # Ribs every few centimetres along the body outline
+        if (z // max(1, depth // 16)) % 2 == 0:
+            radius = (x / 0.38) ** 2 + (y / 0.28) ** 2
+            image[(radius > 0.85) & (radius < 1) & body] = 500
+        volume[z] = image + rng.integers(-20, 20, (size, size), dtype=np.int16)
+    return volume
+
+
+def orbit(renderWindow, renderer, frames, step=6.0):
+    """Render an azimuth orbit, returning the time of each frame."""
+    times = []
+    camera = renderer.GetActiveCamera()
+    for _ in range(frames):
+        camera.Azimuth(step)
+        start = time.perf_counter()
+        renderWindow.Render()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def report(name, times, target):
+    fps = len(times) / times.sum()
+    within = np.mean(times <= target) * 100
+    print(f"{name:<22}{np.median(times) * 1000:9.1f}{np.percentile(times, 95) * 1000:9.1f}"
+          f"{fps:9.1f}{within:10.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU volume rendering with LOD")
+    parser.add_argument('--size', type=int, default=256, help='Phantom slice size')
+    parser.add_argument('--depth', type=int, default=None, help='Phantom slices (defaults to size)')
+    parser.add_argument('--frames', type=int, default=60, help='Frames per orbit')
+    parser.add_argument('--target-fps', type=float, default=15.0, help='Interactive frame rate target')
+    parser.add_argument('--window', type=int, default=512, help='Render window size')
+    args = parser.parse_args()
+
+    depth = args.depth or args.size
+    target = 1.0 / args.target_fps
+    volume = phantom(args.size, depth)
+    geometry = {'spacing': (0.7, 0.7, 1.0), 'origin': (0.0, 0.0, 0.0), 'direction': (1, 0, 0, 0, 1, 0, 0, 0, 1)}
+
+    vtkBase = VtkBase()
+    vtkBase.connect_on_volume(StoredVolume("phantom", volume, geometry, "phantom"))
+    vtkBase.volumePyramid.wait()
+
+    renderWindow = vtkRenderWindow()
+    renderWindow.SetOffScreenRendering(1)
+    renderWindow.SetSize(args.window, args.window)
+    renderer = vtkRenderer()
+    renderWindow.AddRenderer(renderer)
+    volumeRenderer = VolumeRenderer(vtkBase, renderer, interactive_frame_time=target)
+    volumeRenderer.set_enabled(True)
+    renderer.ResetCamera()
+    renderWindow.Render()
+
+    print(f"{args.size}x{args.size}x{depth} phantom, {args.window}x{args.window} window, "
+          f"target {args.target_fps:.0f} fps ({target * 1000:.0f} ms)\n")
+    print(f"{'mode':<22}{'median':>9}{'p95':>9}{'fps':>9}{'on target':>11}")
+
+    # Full quality on every frame (no LOD)
+    report("full quality", orbit(renderWindow, renderer, args.frames), target)
+
+    # LOD: adapts after every frame, like a camera drag in the viewer
+    volumeRenderer.start_interaction()
+    lodTimes = orbit(renderWindow, renderer, args.frames)
+    # The first frames settle the level; the rest show the steady state
+    report("LOD (all frames)", lodTimes, target)
+    report("LOD (settled)", lodTimes[len(lodTimes) // 4:], target)
+    levels = [level for level, _ in list(volumeRenderer.frameTimes)[-args.frames:]]
+    factor, sampleDistance, imageSampleDistance = volumeRenderer.levels[max(set(levels), key=levels.count)]
+    print(f"\nmost used level: pyramid {factor}x, ray step {sampleDistance} voxel, image step {imageSampleDistance} px")
+
+    volumeRenderer.end_interaction()
+    start = time.perf_counter()
+    renderWindow.Render()
+    print(f"still frame after interaction: {(time.perf_counter() - start) * 1000:.1f} ms (full quality)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+from collections import deque
+import math
+import time
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+from .RenderScheduler import RenderScheduler
+
+
+class CineEngine(QObject):
+    """
+    One playback clock shared by the cine of every viewer.
+
+    Each viewer plays a CineTrack; on every tick the engine moves all
+    playing tracks to their due frames, then draws the windows they touched
+    in a single RenderScheduler pass, so three planes in cine render each
+    window once per tick, like one. Frames are derived from a monotonic
+    clock, not counted from ticks: frames that fell due while the previous
+    one was being drawn are dropped instead of piling up, so playback keeps
+    real time. Runs on the GUI thread (a QTimer), so frame handlers may use
+    widgets directly.
+    """
+
+    _default = None
+
+    # Frame rate of the linked tracks
+    fpsChanged = pyqtSignal(float)
+
+    @classmethod
+    def default(cls):
+        """Return the engine shared by all viewers."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, fps:float=30.0):
+        super().__init__()
+        self.fps = fps
+        self._tracks = []  # Playing tracks, in start order
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+        self.tickCount = 0
+
+    # Frame rate of the tracks linked to the shared speed
+    def set_fps(self, fps:float):
+        self.fps = max(0.1, float(fps))
+        for track in self._tracks:
+            if track.linked:
+                track._restart_clock()
+        self.fpsChanged.emit(self.fps)
+
+    def is_playing(self):
+        return bool(self._tracks)
+
+    def start(self, track):
+        if track not in self._tracks:
+            self._tracks.append(track)
+        self._timer.start(0)
+
+    def stop(self, track):
+        if track in self._tracks:
+            self._tracks.remove(track)
+        if not self._tracks:
+            self._timer.stop()
+
+    # Show the frames due now on every track, draw them in one pass, then sleep until the next is due
+    def _tick(self):
+        now = time.perf_counter()
+        self.tickCount += 1
+        shown = [track for track in list(self._tracks) if track._advance(now)]
+
+        # One render of every window touched by the new frames
+        RenderScheduler.default().flush()
+        for track in shown:
+            track._frame_shown()
+
+        if self._tracks:
+            nextTime = min(track.next_time() for track in self._tracks)
+            # Rounded up: waking before the frame is due would only spin
+            self._timer.start(max(0, math.ceil((nextTime - time.perf_counter()) * 1000)))
+
+
+class CineTrack(QObject):
+    """
+    Cine playback of one viewer's slice range on the shared CineEngine clock.
+
+    A linked track plays at the engine's frame rate; an independent one at
+    its own.
+    """
+
+    frameChanged = pyqtSignal(int)
+    finished = pyqtSignal()
+    # Achieved frames per second and frames dropped since play()
+    statsChanged = pyqtSignal(float, int)
+
+    def __init__(self, engine:CineEngine=None, parent=None):
+        super().__init__(parent)
+        self.engine = engine or CineEngine.default()
+        self.fps = self.engine.fps
+        self.linked = True
+        self.minimum = 0
+        self.maximum = 0
+        self.current = 0
+        self.loop = False
+        # Called with the frames expected next whenever a frame is shown, to prepare them
+        self.prefetch = None
+        self.prefetchFrames = 8
+
+        self._startTime = None
+        self._startIndex = 0
+        self._playing = False
+        self.dropped = 0
+        self.shownTimes = deque(maxlen=60)
+        self.shownFrames = deque(maxlen=60)
+
+    def set_range(self, minimum, maximum):
+        self.minimum, self.maximum = int(minimum), int(maximum)
+
+    # Frame rate of this track alone (used while it is not linked)
+    def set_fps(self, fps:float):
+        self.fps = max(0.1, float(fps))
+        if not self.linked:
+            self._restart_clock()
+
+    # Follow the engine's shared frame rate, or this track's own
+    def set_linked(self, linked:bool):
+        self.linked = linked
+        self._restart_clock()
+
+    # Frame rate the track plays at
+    def rate(self):
+        return self.engine.fps if self.linked else self.fps
+
+    def is_playing(self):
+        return self._playing
+
+    # Play from a frame (the current one by default) up to the end of the range
+    def play(self, start=None):
+        self.current = self.current if start is None else int(start)
+        if self.current >= self.maximum:
+            self.current = self.minimum
+        self.dropped = 0
+        self.shownTimes.clear()
+        self.shownFrames.clear()
+        self._playing = True
+        self._restart_clock()
+        self.engine.start(self)
+
+    def pause(self):
+        self._playing = False
+        self.engine.stop(self)
+
+    # Achieved frames per second over the recent frames
+    def achieved_fps(self):
+        if len(self.shownTimes) < 2:
+            return 0.0
+        return (len(self.shownTimes) - 1) / (self.shownTimes[-1] - self.shownTimes[0])
+
+    # Frames expected next, at the stride playback is actually achieving
+    def upcoming_frames(self):
+        stride = 1
+        if len(self.shownFrames) >= 2 and self.shownFrames[-1] > self.shownFrames[0]:
+            stride = max(1, round((self.shownFrames[-1] - self.shownFrames[0]) / (len(self.shownFrames) - 1)))
+        frames = range(self.current + stride, self.current + stride * (self.prefetchFrames + 1), stride)
+        return [frame for frame in frames if frame <= self.maximum]
+
+    # Time the next frame is due
+    def next_time(self):
+        if self._startTime is None:
+            return 0.0
+        return self._startTime + (self.current - self._startIndex + 1) / self.rate()
+
+    # Re-anchor the clock at the current frame (from the next tick)
+    def _restart_clock(self):
+        self._startTime = None
+        self._startIndex = self.current
+
+    # Move to the frame due at a time; returns whether a new frame was emitted
+    def _advance(self, now):
+        # Tracks started since the last tick share this tick as their start, so they stay in phase
+        if self._startTime is None:
+            self._startTime = now
+        due = self._startIndex + int((now - self._startTime) * self.rate())
+        if due > self.maximum:
+            if self.loop:
+                self._startTime, self._startIndex = now, self.minimum
+                due = self.minimum
+            else:
+                due = self.maximum
+        if due == self.current and self.shownTimes:
+            return False
+
+        # Frames due while the previous one was being drawn are skipped
+        if self.shownTimes:
+            self.dropped += max(0, due - self.current - 1)
+        self.current = due
+        self.frameChanged.emit(due)
+        return True
+
+    # After the tick's render: statistics, prefetch, end of the range
+    def _frame_shown(self):
+        self.shownTimes.append(time.perf_counter())
+        self.shownFrames.append(self.current)
+        if self.prefetch is not None:
+            self.prefetch(self.upcoming_frames())
+        self.statsChanged.emit(self.achieved_fps(), self.dropped)
+        if self.current >= self.maximum and not self.loop:
+            self.pause()
+            self.finished.emit()
@@ -1,3 +1,5 @@
+from .RenderScheduler import RenderScheduler
+
 class CommandSliceSelect(object):
     def __init__(self):
         self.resliceCursorWidgets = [None, None, None]
@@ -25,9 +27,17 @@ class CommandSliceSelect(object):
                 self.resliceCursor.SetCenter(self.imagePlaneWidgets[i].GetPolyData().GetPoint(0))
                 self.update_reslice(self.resliceCursorWidgets[(i + 1) % 3], self.resliceCursorWidgets[(i + 2) % 3])
 
+    # Schedule a render of every window showing the reslice cursor or an image plane
+    def request_render(self):
+        scheduler = RenderScheduler.default()
+        for widget in self.resliceCursorWidgets + self.imagePlaneWidgets:
+            if widget is not None and widget.GetInteractor() is not None:
+                scheduler.request(widget.GetInteractor().GetRenderWindow())
+
     def update_reslice(self, widget1, widget2):
-        widget1.Render()
-        widget2.Render()
+        scheduler = RenderScheduler.default()
+        scheduler.request(widget1.GetInteractor().GetRenderWindow())
+        scheduler.request(widget2.GetInteractor().GetRenderWindow())
         for i in range(3):
             slice_val = self.resliceCursor.GetImage().GetBounds()[i * 2 + int(self.resliceCursor.GetImage().GetExtent()[i * 2] == self.resliceCursor.GetImage().GetExtent()[i * 2 + 1])]
             self.sliders[i].setValue(int(slice_val))
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Label volume drawn over the slices of every view through one lookup table.
+
+A single uint8/uint16 label volume (e.g. an organ segmentation) is wrapped
+without copying and shown by one image actor per view plane, colored
+through a per-label LUT shared by all of them. When its view renders, each
+actor picks the slice the view shows, so moving a slice reslices one label
+plane per view. Opacity and per-label visibility only rewrite the LUT; the
+label volume is never rebuilt:
+
+    overlay = vtkBase.labelOverlay
+    overlay.set_labels(labels, geometry)
+    overlay.add_plane(renderer, locate)     # locate() -> (orientation, index, position) or None
+    overlay.set_opacity(0.4)
+    overlay.set_label_visible(5, False)     # hide one label
+"""
+
+import numpy as np
+from vtk import VTK_UNSIGNED_CHAR, vtkCommand, vtkImageActor, vtkLookupTable
+from vtk.util import numpy_support
+
+from utils.vtk_bridge import label_color, numpy_to_vtk_source
+
+
+class LabelOverlay:
+    """
+    One label volume, its LUT and the image actors showing it in the views.
+    """
+
+    def __init__(self, opacity=0.5):
+        """
+        Args:
+            opacity (float): Alpha of the visible labels
+        """
+        self.labels = None
+        self.source = None
+        self.maxLabel = 0
+        self.colors = None
+        self.opacity = float(opacity)
+        self.visible = True
+        self.hiddenLabels = set()
+
+        self.lut = vtkLookupTable()
+        self.planes = []
+        self.update_lut()
+
+    def set_labels(self, labels, geometry, colors=None):
+        """
+        Show a label volume (same shape and geometry as the displayed volume).
+
+        Args:
+            labels (np.ndarray): (Z, Y, X) integer labels, 0 for background
+            geometry (dict): 'spacing' and 'origin' of the volume
+            colors (dict): Optional {label: (r, g, b)} overriding the default colors
+        """
+        labels = np.asarray(labels)
+        if labels.dtype not in (np.uint8, np.uint16):
+            if labels.size and (labels.min() < 0 or labels.max() > np.iinfo(np.uint16).max):
+                raise ValueError("Labels must fit in uint16")
+            labels = labels.astype(np.uint8 if not labels.size or labels.max() <= 255 else np.uint16)
+
+        self.labels = labels
+        self.maxLabel = max(1, int(labels.max()) if labels.size else 1)
+        self.colors = np.array([(0.0, 0.0, 0.0)] + [(colors or {}).get(label) or label_color(label)
+                                                     for label in range(1, self.maxLabel + 1)])
+        self.source = numpy_to_vtk_source(labels, geometry['spacing'], geometry['origin'])
+        for plane in self.planes:
+            plane.set_input(self.source)
+        self.update_lut()
+
+    def clear(self):
+        self.labels = None
+        self.source = None
+        self.hiddenLabels.clear()
+        for plane in self.planes:
+            plane.set_input(None)
+
+    # Alpha of every visible label (0 to 1)
+    def set_opacity(self, opacity):
+        self.opacity = min(max(float(opacity), 0.0), 1.0)
+        self.update_lut()
+
+    # Show or hide one label (e.g. one organ)
+    def set_label_visible(self, label, visible):
+        if visible:
+            self.hiddenLabels.discard(int(label))
+        else:
+            self.hiddenLabels.add(int(label))
+        self.update_lut()
+
+    # Show or hide the whole overlay (the actors are skipped, the LUT is kept)
+    def set_visible(self, visible):
+        self.visible = bool(visible)
+
+    # Rewrite the LUT from the colors, opacity and hidden labels (label 0 stays transparent)
+    def update_lut(self):
+        colors = self.colors if self.colors is not None else np.zeros((2, 3))
+        rgba = np.empty((len(colors), 4), dtype=np.uint8)
+        rgba[:, :3] = np.round(colors * 255)
+        rgba[:, 3] = round(self.opacity * 255)
+        rgba[0, 3] = 0
+        hidden = [label for label in self.hiddenLabels if label < len(rgba)]
+        rgba[hidden, 3] = 0
+
+        # SetTable marks the values as user-set, so rendering does not rebuild the ramp over them
+        self.lut.SetTable(numpy_support.numpy_to_vtk(rgba, deep=1, array_type=VTK_UNSIGNED_CHAR))
+        self.lut.SetTableRange(0, len(rgba) - 1)
+
+    # Image actor in a renderer following the slice its view shows (see LabelPlane)
+    def add_plane(self, renderer, locate):
+        plane = LabelPlane(self, renderer, locate)
+        self.planes.append(plane)
+        if self.source is not None:
+            plane.set_input(self.source)
+        return plane
+
+
+class LabelPlane:
+    """
+    One view's actor showing the label slice under the view's current slice.
+    """
+
+    def __init__(self, overlay, renderer, locate):
+        """
+        Args:
+            overlay (LabelOverlay): Label volume and LUT shown
+            renderer (vtkRenderer): Renderer of the view
+            locate (callable): Returns the (orientation, voxel index, world position) of the
+                               axis-aligned slice the view shows, or None to hide the labels
+        """
+        self.overlay = overlay
+        self.renderer = renderer
+        self.locate = locate
+        self.extent = None
+
+        self.actor = vtkImageActor()
+        self.actor.GetProperty().SetLookupTable(overlay.lut)
+        self.actor.GetProperty().UseLookupTableScalarRangeOn()
+        self.actor.GetProperty().SetInterpolationTypeToNearest()
+        self.actor.VisibilityOff()
+        renderer.AddViewProp(self.actor)
+        # The slice is picked just before each frame, after the view moved its plane
+        renderer.AddObserver(vtkCommand.StartEvent, lambda caller, event: self.follow())
+
+    def set_input(self, source):
+        self.extent = None
+        if source is None:
+            self.actor.VisibilityOff()
+        else:
+            self.actor.GetMapper().SetInputConnection(source.GetOutputPort())
+
+    # Show the label slice of the view's current plane (one reslice when the slice changed)
+    def follow(self):
+        source = self.overlay.source
+        location = self.locate() if source is not None and self.overlay.visible else None
+        if location is None:
+            self.actor.VisibilityOff()
+            return
+
+        orientation, index, position = location
+        extent = list(source.GetWholeExtent())
+        if not extent[2 * orientation] <= index <= extent[2 * orientation + 1]:
+            self.actor.VisibilityOff()
+            return
+        extent[2 * orientation] = extent[2 * orientation + 1] = index
+        if extent != self.extent:
+            self.extent = extent
+            self.actor.SetDisplayExtent(extent)
+
+        # Drawn in the view's image plane, nudged towards the camera so it is not hidden by it
+        spacing = source.GetDataSpacing()[orientation]
+        depth = source.GetDataOrigin()[orientation] + index * spacing
+        side = 1.0 if self.renderer.GetActiveCamera().GetPosition()[orientation] >= position else -1.0
+        offset = [0.0, 0.0, 0.0]
+        offset[orientation] = position - depth + side * 0.1 * abs(spacing)
+        self.actor.SetPosition(offset)
+        self.actor.VisibilityOn()
@@ -0,0 +1,209 @@
+"""
+Headless rendering of axial, coronal and sagittal slices to images.
+
+Uses the VtkBase reader and its window/level LUT with an offscreen render
+window (EGL or OSMesa builds of VTK need no X server), so key images look
+like the viewers without any Qt widget:
+
+    renderer = OffscreenMPRRenderer(size=(512, 512))
+    renderer.open("/data/study_001")
+    renderer.set_window_level(400, 40)
+    renderer.set_overlay(labels, opacity=0.4)
+    renderer.save_png("axial_060.png", "axial", index=60)
+    renderer.close()
+"""
+
+import numpy as np
+from vtk import (vtkImageSlice, vtkImageSliceMapper, vtkPNGWriter, vtkRenderer, vtkRenderWindow,
+                 vtkTextActor, vtkWindowToImageFilter)
+from vtk.util import numpy_support
+
+from .VtkBase import VtkBase
+from .VolumeStore import VolumeStore
+from utils.vtk_bridge import label_lookup_table, numpy_to_vtk_source
+
+# Slice orientation (index of the normal axis, as in the viewers) per view name
+ORIENTATIONS = {'sagittal': 0, 'coronal': 1, 'axial': 2}
+
+# Camera direction of projection and view up per orientation, matching the
+# viewers' direction labels (patient right on the left of axial and coronal views)
+CAMERAS = {
+    0: ((-1.0, 0.0, 0.0), (0.0, 0.0, 1.0)),
+    1: ((0.0, 1.0, 0.0), (0.0, 0.0, 1.0)),
+    2: ((0.0, 0.0, -1.0), (0.0, 1.0, 0.0)),
+}
+
+
+class OffscreenMPRRenderer:
+    """
+    Renders orthogonal slices of one volume at a time into images, offscreen.
+    """
+
+    def __init__(self, vtkBaseClass=None, size=(512, 512), background=(0.0, 0.0, 0.0), annotate=False):
+        """
+        Args:
+            vtkBaseClass (VtkBase): Pipeline holding the volume (a new one if None)
+            size (tuple): (width, height) of the images in pixels
+            background (tuple): RGB background
+            annotate (bool): Write the view, slice and window/level in a corner
+        """
+        self.vtkBaseClass = vtkBaseClass or VtkBase()
+        self.annotate = annotate
+
+        ## Render Window
+        self.renderWindow = vtkRenderWindow()
+        self.renderWindow.SetOffScreenRendering(1)
+        self.renderWindow.SetSize(*size)
+        self.renderer = vtkRenderer()
+        self.renderer.SetBackground(background)
+        self.renderWindow.AddRenderer(self.renderer)
+
+        ## Image slice through the shared window/level LUT
+        self.sliceMapper = vtkImageSliceMapper()
+        self.imageSlice = vtkImageSlice()
+        self.imageSlice.SetMapper(self.sliceMapper)
+        self.imageSlice.GetProperty().SetLookupTable(self.vtkBaseClass.grayscaleLut)
+        self.imageSlice.GetProperty().UseLookupTableScalarRangeOn()
+        self.imageSlice.GetProperty().SetInterpolationTypeToLinear()
+        self.renderer.AddViewProp(self.imageSlice)
+
+        ## Label overlay (hidden until set)
+        self.overlaySource = None
+        self.overlayMapper = vtkImageSliceMapper()
+        self.overlaySlice = vtkImageSlice()
+        self.overlaySlice.SetMapper(self.overlayMapper)
+        self.overlaySlice.GetProperty().UseLookupTableScalarRangeOn()
+        self.overlaySlice.GetProperty().SetInterpolationTypeToNearest()
+        self.overlaySlice.VisibilityOff()
+        self.renderer.AddViewProp(self.overlaySlice)
+
+        ## Annotation
+        self.textActor = vtkTextActor()
+        self.textActor.GetTextProperty().SetFontSize(14)
+        self.textActor.GetTextProperty().SetColor(0.8, 0.8, 0)
+        self.textActor.SetDisplayPosition(8, 8)
+        self.textActor.SetVisibility(annotate)
+        self.renderer.AddActor(self.textActor)
+
+        ## Capture
+        self.windowToImage = vtkWindowToImageFilter()
+        self.windowToImage.SetInput(self.renderWindow)
+        self.windowToImage.SetInputBufferTypeToRGB()
+        self.windowToImage.ReadFrontBufferOff()
+
+    # Render a volume opened from a path (DICOM folder, NIfTI or MetaImage)
+    def open(self, path):
+        storedVolume = VolumeStore.default().open(path)
+        self.set_volume(storedVolume)
+        return storedVolume
+
+    # Render a volume already in the store
+    def set_volume(self, storedVolume):
+        # No pyramid: slices are always drawn at full resolution
+        self.vtkBaseClass.connect_on_volume(storedVolume, pyramid=False)
+        self.sliceMapper.SetInputConnection(self.vtkBaseClass.imageReader.GetOutputPort())
+        self.clear_overlay()
+
+    def set_window_level(self, window, level):
+        self.vtkBaseClass.set_window_level(window, level)
+
+    # 'auto', 'lung', 'bone' or 'soft_tissue' (from the study's histogram)
+    def set_window_preset(self, name):
+        self.vtkBaseClass.set_window_preset(name)
+
+    # Label volume drawn over the slices (same shape and geometry as the volume)
+    def set_overlay(self, labels, opacity=0.4, colors=None):
+        labels = np.asarray(labels)
+        if labels.shape != self.vtkBaseClass.get_volume_array().shape:
+            raise ValueError(f"Overlay shape {labels.shape} does not match the volume "
+                             f"{self.vtkBaseClass.get_volume_array().shape}")
+        geometry = self.vtkBaseClass.get_volume_geometry()
+        self.overlaySource = numpy_to_vtk_source(labels, geometry['spacing'], geometry['origin'])
+        self.overlayMapper.SetInputConnection(self.overlaySource.GetOutputPort())
+        self.overlaySlice.GetProperty().SetLookupTable(label_lookup_table(labels.max(), opacity, colors))
+        self.overlaySlice.VisibilityOn()
+
+    def clear_overlay(self):
+        self.overlaySource = None
+        self.overlaySlice.VisibilityOff()
+
+    # Number of slices along an orientation
+    def slice_count(self, orientation):
+        orientation = ORIENTATIONS.get(orientation, orientation)
+        return self.vtkBaseClass.imageDimensions[orientation]
+
+    # Slice index at a fraction (0 to 1) of the volume along an orientation
+    def index_at(self, orientation, fraction):
+        count = self.slice_count(orientation)
+        return int(round(min(max(fraction, 0.0), 1.0) * (count - 1)))
+
+    def render(self, orientation, index=None, window=None, level=None):
+        """
+        Render one slice.
+
+        Args:
+            orientation (str|int): 'axial', 'coronal', 'sagittal' or 2, 1, 0
+            index (int): Slice index along the orientation's axis (defaults to the middle)
+            window (float): Window width (keeps the current window/level if None)
+            level (float): Window center
+
+        Returns:
+            np.ndarray: (height, width, 3) uint8 RGB image, top row first
+        """
+        orientation = ORIENTATIONS.get(orientation, orientation)
+        if window is not None and level is not None:
+            self.set_window_level(window, level)
+        count = self.slice_count(orientation)
+        index = count // 2 if index is None else min(max(int(index), 0), count - 1)
+
+        for mapper in (self.sliceMapper, self.overlayMapper):
+            mapper.SetOrientation(orientation)
+            mapper.SetSliceNumber(index)
+        self.fit_camera(orientation, index)
+        if self.annotate:
+            name = next(key for key, value in ORIENTATIONS.items() if value == orientation)
+            window, level = self.vtkBaseClass.get_window_level()
+            self.textActor.SetInput(f"{name} {index + 1}/{count}  W {window:.0f} L {level:.0f}")
+
+        self.renderWindow.Render()
+        self.windowToImage.Modified()
+        self.windowToImage.Update()
+        image = self.windowToImage.GetOutput()
+        width, height, _ = image.GetDimensions()
+        pixels = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars()).reshape(height, width, -1)
+        # VTK images start at the bottom row
+        return pixels[::-1].copy()
+
+    def save_png(self, path, orientation, index=None, window=None, level=None):
+        """Render one slice and write it as a PNG; returns the path."""
+        self.render(orientation, index, window, level)
+        writer = vtkPNGWriter()
+        writer.SetFileName(str(path))
+        writer.SetInputConnection(self.windowToImage.GetOutputPort())
+        writer.Write()
+        return path
+
+    # Parallel camera looking at the slice, fitted to the volume's extent in the plane
+    def fit_camera(self, orientation, index):
+        bounds = self.vtkBaseClass.bounds
+        center = [(bounds[2 * i] + bounds[2 * i + 1]) / 2.0 for i in range(3)]
+        image = self.vtkBaseClass.imageReader.GetOutput()
+        center[orientation] = image.GetOrigin()[orientation] + index * image.GetSpacing()[orientation]
+
+        direction, viewUp = CAMERAS[orientation]
+        camera = self.renderer.GetActiveCamera()
+        camera.ParallelProjectionOn()
+        camera.SetFocalPoint(center)
+        camera.SetPosition([c - d for c, d in zip(center, direction)])
+        camera.SetViewUp(viewUp)
+
+        # Half extents along the screen's vertical and horizontal axes
+        sizes = [bounds[2 * i + 1] - bounds[2 * i] for i in range(3)]
+        vertical = int(np.argmax(np.abs(viewUp)))
+        horizontal = 3 - orientation - vertical
+        width, height = self.renderWindow.GetSize()
+        camera.SetParallelScale(max(sizes[vertical], sizes[horizontal] * height / width) / 2.0 or 1.0)
+        self.renderer.ResetCameraClippingRange()
+
+    def close(self):
+        self.renderWindow.Finalize()
@@ -0,0 +1,74 @@
+from collections import deque
+import time
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+
+class RenderScheduler(QObject):
+    """
+    Coalesces render requests so each render window is drawn at most once per display frame.
+
+    Viewers call request() instead of Render(); every window requested
+    during a frame is rendered once when the frame's timer fires on the GUI
+    thread. Must be used from the GUI thread.
+    """
+
+    _default = None
+
+    # Seconds taken to draw the windows of a frame
+    frameRendered = pyqtSignal(float)
+
+    @classmethod
+    def default(cls):
+        """Return the scheduler shared by all viewers."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, frame_rate:float=60.0):
+        super().__init__()
+        self.frameInterval = 1.0 / frame_rate
+        self._dirty = {}  # Render windows to draw, in request order
+        self._lastFlush = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self.flush)
+
+        # Start times of the last flushes, for fps()
+        self.flushTimes = deque(maxlen=120)
+        self.renderCount = 0
+
+    # Mark a render window dirty; it is drawn at the next frame
+    def request(self, renderWindow):
+        if renderWindow is None:
+            return
+        self._dirty[renderWindow] = renderWindow
+        if not self._timer.isActive():
+            wait = self.frameInterval - (time.perf_counter() - self._lastFlush)
+            self._timer.start(max(0, int(wait * 1000)))
+
+    # Forget a render window (e.g. when its widget is closed)
+    def cancel(self, renderWindow):
+        self._dirty.pop(renderWindow, None)
+
+    # Render every dirty window once
+    def flush(self):
+        self._timer.stop()
+        self._lastFlush = time.perf_counter()
+        self.flushTimes.append(self._lastFlush)
+
+        windows = list(self._dirty.values())
+        self._dirty.clear()
+        for renderWindow in windows:
+            renderWindow.Render()
+        self.renderCount += len(windows)
+        if windows:
+            self.frameRendered.emit(time.perf_counter() - self._lastFlush)
+
+    # Frames per second over the recent flushes
+    def fps(self):
+        if len(self.flushTimes) < 2:
+            return 0.0
+        return (len(self.flushTimes) - 1) / (self.flushTimes[-1] - self.flushTimes[0])
@@ -0,0 +1,117 @@
+"""
+Level of detail of the resliced slices while the user drags.
+
+While a reslice cursor, window/level or image plane drag is active, slices
+are resliced with nearest-neighbour interpolation and, if frames are still
+too slow, from a downsampled pyramid level. The level is adapted to the
+measured frame time (the RenderScheduler's time to draw all dirty windows),
+so slow machines drop quality sooner; the level reached is kept for the next
+drag. On release the views go back to full-resolution linear reslicing:
+
+    resliceLod = ResliceLOD(vtkBase)
+    resliceLod.start_interaction()    # on StartInteractionEvent
+    resliceLod.end_interaction()      # on EndInteractionEvent, then render
+"""
+
+from collections import deque
+
+from .RenderScheduler import RenderScheduler
+
+# Quality levels, finest first: (pyramid factor, reslice interpolation)
+RESLICE_LOD_LEVELS = (
+    (1, 'linear'),
+    (1, 'nearest'),
+    (2, 'nearest'),
+    (4, 'nearest'),
+    (8, 'nearest'),
+)
+
+
+class ResliceLOD:
+    """
+    Interaction-time reslice quality of the views sharing a VtkBase.
+    """
+
+    def __init__(self, vtkBaseClass, interactive_frame_time=1 / 30, levels=RESLICE_LOD_LEVELS):
+        """
+        Args:
+            vtkBaseClass (VtkBase): Holds the reslice cursor, the plane widgets and the pyramid
+            interactive_frame_time (float): Target seconds per frame while dragging
+            levels (tuple): Quality levels, finest (full quality) first
+        """
+        self.vtkBaseClass = vtkBaseClass
+        self.interactiveFrameTime = interactive_frame_time
+        self.levels = tuple(levels)
+
+        self.interacting = False
+        self.level = 0
+        # Level used for the next interactive frame, adapted to the measured frame time
+        self.interactiveLevel = 1
+        self.factor = 1
+        self.interpolation = 'linear'
+
+        # (level, seconds) of the recent frames
+        self.frameTimes = deque(maxlen=120)
+        self._listening = False
+
+    # Draw the next frames at a quality level (the nearest built one); returns True if it changed
+    def set_level(self, index):
+        index = min(max(0, index), len(self.levels) - 1)
+        # Prefer a finer level while the wanted pyramid level is still being built
+        for candidate in range(index, -1, -1):
+            factor, interpolation = self.levels[candidate]
+            if self.vtkBaseClass.get_level_image(factor) is not None:
+                break
+        else:
+            return False
+
+        changed = self.vtkBaseClass.set_reslice_factor(factor)
+        if interpolation != self.interpolation:
+            self.set_interpolation(interpolation)
+            changed = True
+        self.level = candidate
+        return changed
+
+    # Interpolation of the ortho views' reslices and of the 3D image planes
+    def set_interpolation(self, interpolation):
+        self.interpolation = interpolation
+        commandSliceSelect = self.vtkBaseClass.commandSliceSelect
+        for resliceCursorWidget in commandSliceSelect.resliceCursorWidgets:
+            if resliceCursorWidget is not None:
+                reslice = resliceCursorWidget.GetRepresentation().GetReslice()
+                if interpolation == 'nearest':
+                    reslice.SetInterpolationModeToNearestNeighbor()
+                else:
+                    reslice.SetInterpolationModeToLinear()
+        for imagePlaneWidget in commandSliceSelect.imagePlaneWidgets:
+            if imagePlaneWidget is not None:
+                if interpolation == 'nearest':
+                    imagePlaneWidget.SetResliceInterpolateToNearestNeighbour()
+                else:
+                    imagePlaneWidget.SetResliceInterpolateToLinear()
+
+    def start_interaction(self):
+        if not self._listening:
+            RenderScheduler.default().frameRendered.connect(self.record_frame)
+            self._listening = True
+        self.interacting = True
+        return self.set_level(self.interactiveLevel)
+
+    # Back to full quality; the caller renders the still frame
+    def end_interaction(self):
+        self.interacting = False
+        return self.set_level(0)
+
+    # Adapt the interactive level to the time of the frame just drawn
+    def record_frame(self, seconds):
+        self.frameTimes.append((self.level, seconds))
+        if not self.interacting:
+            return
+
+        if seconds > self.interactiveFrameTime * 1.25 and self.level < len(self.levels) - 1:
+            self.interactiveLevel = self.level + 1
+        elif seconds < self.interactiveFrameTime * 0.4 and self.level > 1:
+            self.interactiveLevel = self.level - 1
+        else:
+            self.interactiveLevel = self.level
+        self.set_level(self.interactiveLevel)
@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+
+from .RenderScheduler import RenderScheduler
+
+
+class SyncBus(object):
+    """
+    Applies reslice cursor changes to every linked view in one pass.
+
+    The shared state is the reslice cursor's center (and plane normals).
+    A change from any source (cursor drag, slider, cine, 3D plane) is
+    written to that state once; commit() then updates the views whose plane
+    actually moved, the image plane widgets and the sliders (with their
+    signals blocked, so nothing loops back), and requests one render per
+    window. Changes made inside transaction() are committed together.
+    """
+
+    def __init__(self, vtkBaseClass):
+        self.vtkBaseClass = vtkBaseClass
+        self.viewers = []
+        self._depth = 0
+        self._dirty = False
+        self._applying = False
+        # (plane position, normal) each view last showed
+        self._shown = {}
+
+        # Counters proving one change costs one commit and one render request per window
+        self.changeCount = 0
+        self.commitCount = 0
+        self.viewerUpdateCount = 0
+        self.renderRequestCount = 0
+        self.reentrantCount = 0
+
+    def add_viewer(self, orthoViewer):
+        self.viewers.append(orthoViewer)
+        orthoViewer.syncBus = self
+
+    @property
+    def resliceCursor(self):
+        return self.vtkBaseClass.resliceCursor
+
+    @property
+    def commandSliceSelect(self):
+        return self.vtkBaseClass.commandSliceSelect
+
+    # Group changes: views are updated and rendered once, when the outermost transaction ends
+    @contextmanager
+    def transaction(self):
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0 and self._dirty:
+                self.commit()
+
+    # The reslice cursor was moved or rotated in place (e.g. dragged in a view)
+    def cursor_changed(self):
+        self.changed()
+
+    # Move the cursor along one axis (slider or cine of a view, in world coordinates)
+    def set_slice(self, orientation, position):
+        center = list(self.resliceCursor.GetCenter())
+        center[orientation] = position
+        self.resliceCursor.SetCenter(center)
+        self.changed()
+
+    # A 3D image plane was dragged: the cursor follows it along its axis only
+    def plane_moved(self, imagePlaneWidget):
+        self.set_slice(imagePlaneWidget.GetPlaneOrientation(), imagePlaneWidget.GetSlicePosition())
+
+    def changed(self):
+        self.changeCount += 1
+        if self._applying:
+            # Echo of the update being applied (already part of the shared state)
+            self.reentrantCount += 1
+            return
+        self._dirty = True
+        if self._depth == 0:
+            self.commit()
+
+    # Apply the shared cursor state to every view, then request one render per window
+    def commit(self):
+        self._dirty = False
+        self._applying = True
+        try:
+            self.commitCount += 1
+            self.resliceCursor.Update()
+            center = self.resliceCursor.GetCenter()
+
+            for orientation, imagePlaneWidget in enumerate(self.commandSliceSelect.imagePlaneWidgets):
+                if imagePlaneWidget is not None and imagePlaneWidget.GetInput() is not None:
+                    if abs(imagePlaneWidget.GetSlicePosition() - center[orientation]) > 1e-6:
+                        imagePlaneWidget.SetSlicePosition(center[orientation])
+
+            for viewer in self.viewers:
+                plane = (center[viewer.orientation], tuple(self.resliceCursor.GetPlane(viewer.orientation).GetNormal()))
+                if self._shown.get(viewer) != plane:
+                    self._shown[viewer] = plane
+                    viewer.sync_to_cursor()
+                    self.viewerUpdateCount += 1
+
+                slider = self.commandSliceSelect.sliders[viewer.orientation]
+                if slider is not None and slider.value() != int(round(center[viewer.orientation])):
+                    slider.blockSignals(True)
+                    slider.setValue(int(round(center[viewer.orientation])))
+                    slider.blockSignals(False)
+
+            self.request_render()
+        finally:
+            self._applying = False
+
+    # One render request per window showing the cursor or a plane
+    def request_render(self):
+        scheduler = RenderScheduler.default()
+        windows = {}
+        for viewer in self.viewers:
+            viewer.update()
+            windows[viewer.renderWindow] = viewer.renderWindow
+        for widget in self.commandSliceSelect.resliceCursorWidgets + self.commandSliceSelect.imagePlaneWidgets:
+            if widget is not None and widget.GetInteractor() is not None:
+                renderWindow = widget.GetInteractor().GetRenderWindow()
+                windows[renderWindow] = renderWindow
+        for renderWindow in windows.values():
+            scheduler.request(renderWindow)
+        self.renderRequestCount += len(windows)
+
+    # A view showed a new study: its plane is redrawn at the next commit
+    def reset(self):
+        self._shown.clear()
+
+    # Counters per change received
+    def stats(self):
+        changes = max(self.changeCount, 1)
+        return {
+            'changes': self.changeCount,
+            'commits': self.commitCount,
+            'viewer_updates': self.viewerUpdateCount,
+            'render_requests': self.renderRequestCount,
+            'reentrant': self.reentrantCount,
+            'render_requests_per_change': self.renderRequestCount / changes,
+        }
@@ -2,6 +2,7 @@ from vtk import *
 from viewers.OrthoViewer import *
 from viewers.SegmentationViewer import *
 from .CommandSliceSelect import CommandSliceSelect
+from .SyncBus import SyncBus
 
 class ViewersConnection():
     
@@ -12,13 +13,14 @@ class ViewersConnection():
         self.orthogonal_viewers = []
         self.segmentation_viewer = None
         self.vtkBaseClass = vtkBaseClass
+        self.syncBus = SyncBus(vtkBaseClass)
         
     # Connect on data
     def connect_on_data(self):        
         # Set Default Renderer
         for i,ortho_viewer in zip(range(3), self.orthogonal_viewers):
             ## Image Plane Widget
-            self.segmentation_viewer.imagePlaneWidgets[i].SetInputData(self.vtkBaseClass.imageBlend.GetOutput())
+            self.segmentation_viewer.imagePlaneWidgets[i].SetInputData(self.vtkBaseClass.imageReader.GetOutput())
             
             color = [0, 0, 0]
             color[ortho_viewer.orientation] = 1
@@ -31,15 +33,19 @@ class ViewersConnection():
             self.commandSliceSelect = self.vtkBaseClass.commandSliceSelect
             self.commandSliceSelect.imagePlaneWidgets[ortho_viewer.orientation] = self.segmentation_viewer.imagePlaneWidgets[i]
 
-            self.segmentation_viewer.imagePlaneWidgets[i].SetWindowLevel(self.vtkBaseClass.imageWindowLevel.GetWindow(),self.vtkBaseClass.imageWindowLevel.GetLevel())
-            self.segmentation_viewer.imagePlaneWidgets[i].GetColorMap().SetLookupTable(self.orthogonal_viewers[0].grayscaleLut)
+            # Only the displayed slice goes through the shared LUT
+            self.segmentation_viewer.imagePlaneWidgets[i].UserControlledLookupTableOn()
+            self.segmentation_viewer.imagePlaneWidgets[i].SetLookupTable(self.vtkBaseClass.grayscaleLut)
 
+        for ortho_viewer in self.orthogonal_viewers:
+            ortho_viewer.resliceCursorRep.SetLookupTable(self.vtkBaseClass.grayscaleLut)
 
-        self.orthogonal_viewers[1].resliceCursorRep.SetLookupTable(self.orthogonal_viewers[0].grayscaleLut)
-        self.orthogonal_viewers[2].resliceCursorRep.SetLookupTable(self.orthogonal_viewers[0].grayscaleLut)
+        # Window/level of the new study on every view
+        self.vtkBaseClass.set_window_level(*self.vtkBaseClass.get_window_level())
 
-        for ortho_viewer in self.orthogonal_viewers:
-            ortho_viewer.resliceCursorRep.SetLookupTable(self.orthogonal_viewers[0].grayscaleLut)
+        # Every view, plane and slider at the new study's cursor
+        self.syncBus.reset()
+        self.syncBus.commit()
 
     # Add segmentation viewer
     def add_segmentation_viewer(self, segmentation_viewer):
@@ -48,13 +54,12 @@ class ViewersConnection():
     # Add orthogonal viewer
     def add_orthogonal_viewer(self, orthogonal_viewer):
         self.orthogonal_viewers.append(orthogonal_viewer)
+        self.syncBus.add_viewer(orthogonal_viewer)
 
+    # Cursor changes in any view, and 3D plane drags, go through the sync bus: each change
+    # updates every dependent view once instead of each view observing all the others
     def connect_orthogonal_viewers(self):
-        for i in range(len(self.orthogonal_viewers)):
-            # Add observers to the reslice cursor to update the other viewers
-            for j in range(len(self.orthogonal_viewers)):
-                if i != j:
-                    self.orthogonal_viewers[i].resliceCursorWidget.AddObserver(
-                        vtk.vtkResliceCursorWidget.ResliceAxesChangedEvent,
-                        self.orthogonal_viewers[j].update_slice_from_reslice_cursor
-                    )
\ No newline at end of file
+        if self.segmentation_viewer is not None:
+            for imagePlaneWidget in self.segmentation_viewer.imagePlaneWidgets:
+                imagePlaneWidget.AddObserver(vtk.vtkCommand.EndInteractionEvent,
+                                             lambda caller, event: self.syncBus.plane_moved(caller))
@@ -0,0 +1,175 @@
+"""
+CPU volume rendering with level of detail.
+
+The volume is ray cast on the CPU (vtkFixedPointVolumeRayCastMapper). While
+the camera moves, frames are drawn from a downsampled pyramid level with
+coarser ray and image sampling; the level is adapted after every frame to
+keep the frame time under a target. When the interaction ends the next frame
+is drawn at full quality:
+
+    volumeRenderer = VolumeRenderer(vtkBase, renderer)
+    volumeRenderer.set_enabled(True)
+    volumeRenderer.start_interaction()    # on the interactor style's StartInteractionEvent
+    volumeRenderer.end_interaction()      # on EndInteractionEvent, then render
+"""
+
+from collections import deque
+
+from vtk import (vtkColorTransferFunction, vtkCommand, vtkFixedPointVolumeRayCastMapper,
+                 vtkPiecewiseFunction, vtkVolume, vtkVolumeProperty)
+
+# Quality levels, finest first:
+# (pyramid factor, ray sample distance in voxels of the level, image sample distance in pixels)
+LOD_LEVELS = (
+    (1, 1.0, 1.0),
+    (1, 2.0, 1.0),
+    (2, 1.0, 1.5),
+    (2, 2.0, 2.0),
+    (4, 1.0, 2.0),
+    (4, 2.0, 3.0),
+    (8, 2.0, 4.0),
+)
+
+
+class VolumeRenderer:
+    """
+    Volume rendering of the VtkBase volume in one renderer, with interactive LOD.
+    """
+
+    def __init__(self, vtkBaseClass, renderer, interactive_frame_time=1 / 15, levels=LOD_LEVELS):
+        """
+        Args:
+            vtkBaseClass (VtkBase): Holds the volume and its pyramid
+            renderer (vtkRenderer): Renderer the volume is added to
+            interactive_frame_time (float): Target seconds per frame while the camera moves
+            levels (tuple): Quality levels, finest (full quality) first
+        """
+        self.vtkBaseClass = vtkBaseClass
+        self.renderer = renderer
+        self.interactiveFrameTime = interactive_frame_time
+        self.levels = tuple(levels)
+
+        ## Transfer functions and property
+        self.colorFunction = vtkColorTransferFunction()
+        self.opacityFunction = vtkPiecewiseFunction()
+        self.property = vtkVolumeProperty()
+        self.property.SetColor(self.colorFunction)
+        self.property.SetScalarOpacity(self.opacityFunction)
+        self.property.SetInterpolationTypeToLinear()
+        self.property.ShadeOn()
+        self.property.SetAmbient(0.3)
+        self.property.SetDiffuse(0.7)
+        self.property.SetSpecular(0.2)
+
+        ## Volume
+        self.volume = vtkVolume()
+        self.volume.SetProperty(self.property)
+
+        # Mappers per pyramid factor: {factor: (image, mapper)}
+        self.mappers = {}
+        self.enabled = False
+        self.interacting = False
+        self.level = 0
+        # Level used for the next interactive frame, adapted to the measured frame time
+        self.interactiveLevel = 2
+
+        # (level, seconds) of the recent frames, for benchmarks and the status display
+        self.frameTimes = deque(maxlen=120)
+        self.renderer.AddObserver(vtkCommand.EndEvent, self._on_render_end)
+
+    # Show or hide the volume
+    def set_enabled(self, enabled:bool):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            self.connect_on_data()
+            self.renderer.AddVolume(self.volume)
+        else:
+            self.renderer.RemoveVolume(self.volume)
+
+    # Follow the volume currently held by vtkBaseClass
+    def connect_on_data(self):
+        self.mappers = {}
+        self.set_transfer_functions(*self.vtkBaseClass.scalerRange)
+        self.set_level(self.interactiveLevel if self.interacting else 0)
+
+    # Default transfer functions for a scalar range (a CT preset for Hounsfield units)
+    def set_transfer_functions(self, low, high):
+        self.colorFunction.RemoveAllPoints()
+        self.opacityFunction.RemoveAllPoints()
+        if low <= -900 and high >= 300:
+            # Air transparent, soft tissue faint, bone opaque
+            for value, color, opacity in ((-1000, (0.0, 0.0, 0.0), 0.0),
+                                          (-300, (0.6, 0.4, 0.3), 0.0),
+                                          (40, (0.9, 0.6, 0.5), 0.08),
+                                          (200, (1.0, 0.9, 0.8), 0.2),
+                                          (1000, (1.0, 1.0, 1.0), 0.85)):
+                self.colorFunction.AddRGBPoint(value, *color)
+                self.opacityFunction.AddPoint(value, opacity)
+        else:
+            span = (high - low) or 1.0
+            self.colorFunction.AddRGBPoint(low, 0.0, 0.0, 0.0)
+            self.colorFunction.AddRGBPoint(high, 1.0, 1.0, 1.0)
+            self.opacityFunction.AddPoint(low + 0.2 * span, 0.0)
+            self.opacityFunction.AddPoint(high, 0.6)
+
+    # Mapper of a pyramid level, or None if the level is not built yet
+    def get_mapper(self, factor):
+        image = self.vtkBaseClass.get_level_image(factor)
+        if image is None:
+            return None
+        if factor not in self.mappers or self.mappers[factor][0] is not image:
+            mapper = vtkFixedPointVolumeRayCastMapper()
+            mapper.SetInputData(image)
+            # Sampling is set per level here, not adjusted by the mapper
+            mapper.AutoAdjustSampleDistancesOff()
+            mapper.LockSampleDistanceToInputSpacingOff()
+            self.mappers[factor] = (image, mapper)
+        return self.mappers[factor][1]
+
+    # Draw the next frames at a quality level (the nearest built one)
+    def set_level(self, index):
+        index = min(max(0, index), len(self.levels) - 1)
+        # Prefer a coarser level while the wanted pyramid level is still being built
+        for candidate in list(range(index, len(self.levels))) + list(range(index - 1, -1, -1)):
+            factor, sampleDistance, imageSampleDistance = self.levels[candidate]
+            mapper = self.get_mapper(factor)
+            if mapper is not None:
+                break
+        else:
+            return
+
+        spacing = min(mapper.GetInput().GetSpacing())
+        mapper.SetSampleDistance(spacing * sampleDistance)
+        mapper.SetInteractiveSampleDistance(spacing * sampleDistance)
+        mapper.SetImageSampleDistance(imageSampleDistance)
+        if self.volume.GetMapper() is not mapper:
+            self.volume.SetMapper(mapper)
+        self.level = candidate
+
+    def start_interaction(self):
+        self.interacting = True
+        self.set_level(self.interactiveLevel)
+
+    # Back to full quality; the caller renders the still frame
+    def end_interaction(self):
+        self.interacting = False
+        self.set_level(0)
+
+    # Adapt the interactive level to the time of the frame just drawn
+    def _on_render_end(self, caller, event):
+        if not self.enabled:
+            return
+        seconds = self.renderer.GetLastRenderTimeInSeconds()
+        self.frameTimes.append((self.level, seconds))
+        if not self.interacting:
+            return
+
+        if seconds > self.interactiveFrameTime * 1.25 and self.level < len(self.levels) - 1:
+            self.interactiveLevel = self.level + 1
+        elif seconds < self.interactiveFrameTime * 0.4 and self.level > 1:
+            self.interactiveLevel = self.level - 1
+        else:
+            self.interactiveLevel = self.level
+        self.set_level(self.interactiveLevel)
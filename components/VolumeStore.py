@@ -0,0 +1,286 @@
+"""
+Single owner of decoded volumes, shared by the MPR viewers, organ detection,
+ROI extraction, export and the command-line inference.
+
+A study is decoded once (or mapped from the on-disk VolumeCache) and every
+consumer gets a reference to the same read-only (Z, Y, X) buffer plus its
+geometry. Opening the same source again returns the volume already in memory.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.DicomSeriesIndex import DicomSeriesIndex
+from utils.helpers import LoadCancelled
+from utils.VolumeCache import VolumeCache
+from utils.VolumeHistogram import VolumeHistogram
+
+
+def write_nifti(array, geometry, path, lps=True):
+    """
+    Write a (Z, Y, X) volume as NIfTI straight from its buffer.
+
+    The transposed (X, Y, Z) view is Fortran-ordered, which is NIfTI's
+    on-disk order, so nibabel streams the buffer without an in-memory copy.
+    Use an uncompressed ``.nii`` path to avoid the gzip cost.
+
+    Args:
+        array (np.ndarray): (Z, Y, X) volume
+        geometry (dict): 'spacing', 'origin' and 'direction'
+        path (str): Output .nii / .nii.gz path
+        lps (bool): The geometry is in DICOM LPS coordinates and is converted to
+                    NIfTI RAS; otherwise (e.g. read by VTK from a NIfTI/MetaImage
+                    file) it is written as is
+    """
+    import nibabel as nib
+
+    # DICOM LPS -> NIfTI RAS
+    lps_to_ras = np.diag([-1.0, -1.0, 1.0]) if lps else np.eye(3)
+    direction = np.asarray(geometry['direction'], dtype=np.float64).reshape(3, 3)
+    affine = np.eye(4)
+    affine[:3, :3] = lps_to_ras @ direction @ np.diag(geometry['spacing'])
+    affine[:3, 3] = lps_to_ras @ np.asarray(geometry['origin'], dtype=np.float64)
+
+    image = nib.Nifti1Image(array.transpose(2, 1, 0), affine)
+    image.header.set_zooms(tuple(float(v) for v in geometry['spacing']))
+    nib.save(image, str(path))
+
+
+class StoredVolume:
+    """
+    A decoded volume owned by the VolumeStore.
+
+    Attributes:
+        key (str): Source key (also the VolumeCache key)
+        array (np.ndarray): Read-only (Z, Y, X) volume in native dtype
+        geometry (dict): 'spacing', 'origin' and 'direction' of the array
+        source (str): Path the volume was opened from
+        filenames (list): Source file of each slice (DICOM only)
+        metadata (list): Per-slice metadata dicts (DICOM only)
+        rows_flipped (bool): Rows are stored bottom-up (VTK image convention)
+        lps (bool): Geometry is in DICOM LPS patient coordinates (otherwise the
+                    image coordinates of the VTK reader that opened the file)
+        histogram (VolumeHistogram): Intensity histogram (computed once, on first use)
+    """
+
+    def __init__(self, key, array, geometry, source, filenames=None, metadata=None,
+                 rows_flipped=False, lps=False, owner=None):
+        array.flags.writeable = False
+        self.key = key
+        self.array = array
+        self.geometry = geometry
+        self.source = source
+        self.filenames = filenames or [f"slice_{i:04d}" for i in range(array.shape[0])]
+        self.metadata = metadata or [{} for _ in range(array.shape[0])]
+        self.rows_flipped = rows_flipped
+        self.lps = lps
+        # Object owning the buffer when it is not a numpy allocation (e.g. a VTK reader)
+        self._owner = owner
+        self._histogram = None
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    @property
+    def dtype(self):
+        return self.array.dtype
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes
+
+    @property
+    def histogram(self):
+        """Intensity histogram (VolumeHistogram), computed on first use and kept with the volume."""
+        if self._histogram is None:
+            self._histogram = VolumeHistogram.from_volume(self.array)
+        return self._histogram
+
+    def to_nifti(self, path):
+        """Export the volume as NIfTI (see write_nifti)."""
+        write_nifti(self.array, self.geometry, path, lps=self.lps)
+
+
+class VolumeStore:
+    """
+    Process-wide store of decoded volumes.
+
+    Usage:
+        volume = VolumeStore.default().open("/data/study")
+        volume.array, volume.geometry
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        """Return the shared store of this process."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def __init__(self, max_volumes=2, volume_cache=None):
+        """
+        Args:
+            max_volumes (int): Volumes kept referenced by the store itself
+            volume_cache (VolumeCache): On-disk cache (a default one if None)
+        """
+        self.max_volumes = max_volumes
+        self.volumeCache = volume_cache if volume_cache is not None else VolumeCache()
+        self._volumes = OrderedDict()
+        self._lock = threading.RLock()
+
+    def open(self, path, series_uid=None, progress=None, cancelled=None, on_preview=None, preview_slices=64):
+        """
+        Return the decoded volume of a DICOM folder, NIfTI or MetaImage file.
+
+        Args:
+            path (str): DICOM folder, .nii/.nii.gz or .mhd/.mha file
+            series_uid (str): DICOM series to open (defaults to the largest series)
+            progress (callable): Called as progress(done, total) while indexing DICOM
+                                 headers, then while decoding
+            cancelled (callable): Returns True to abort (raises LoadCancelled)
+            on_preview (callable): Receives the middle slice, then a coarse StoredVolume
+                                   (about preview_slices slices), before a long DICOM decode ends
+            preview_slices (int): Number of slices of the preview
+
+        Returns:
+            StoredVolume: Shared volume
+        """
+        # Decoding runs unlocked so other opens and gets are not held up by a long load
+        if os.path.isdir(path):
+            volume = self._open_dicom_folder(path, series_uid, progress, cancelled, on_preview, preview_slices)
+        else:
+            volume = self._open_image_file(path, progress, cancelled)
+
+        with self._lock:
+            # The same study opened concurrently: keep the first one so consumers share its buffer
+            volume = self._volumes.get(volume.key, volume)
+            self._volumes[volume.key] = volume
+            self._volumes.move_to_end(volume.key)
+            while len(self._volumes) > self.max_volumes:
+                self._volumes.popitem(last=False)
+            return volume
+
+    def get(self, key):
+        """Return a volume already in the store, or None."""
+        with self._lock:
+            return self._volumes.get(key)
+
+    def release(self, key):
+        """Drop the store's reference (consumers keep theirs)."""
+        with self._lock:
+            self._volumes.pop(key, None)
+
+    def _open_dicom_folder(self, path, series_uid, progress=None, cancelled=None, on_preview=None, preview_slices=64):
+        # Headers come from the index, only new or changed files are parsed
+        series = DicomSeriesIndex().get_series(path, progress=progress, cancelled=cancelled)
+        if not series:
+            raise ValueError(f"No DICOM images found in {path}")
+        if series_uid is None:
+            # Largest series first, the other series are not mixed in
+            series_uid = next(iter(series))
+        elif series_uid not in series:
+            raise ValueError(f"Series {series_uid} not found in {path}")
+
+        entries = series[series_uid]
+        key = VolumeCache.source_key([entry.path for entry in entries], extra="dicom-native-flipped")
+        volume = self.get(key)
+        if volume is not None:
+            return volume
+
+        from utils.helpers import load_dicom_series, series_geometry
+
+        cached = self.volumeCache.get(key)
+        if cached is not None:
+            array, geometry = cached
+        else:
+            geometry = series_geometry(entries, flip_rows=True)
+            stride = len(entries) // preview_slices if len(entries) >= 2 * preview_slices else 1
+
+            def preview(strided):
+                # Small copy so the preview does not alias slices still being decoded
+                spacing = geometry['spacing'][:2] + (geometry['spacing'][2] * stride,)
+                on_preview(StoredVolume(key + "#preview", strided.copy(), dict(geometry, spacing=spacing),
+                                        path, rows_flipped=True, lps=True))
+
+            if on_preview is not None and stride > 1:
+                # The middle slice of a long series first, decoded on its own
+                from utils.LazyVolume import LazyVolume
+                from utils.roi import crop_geometry
+
+                middle = len(entries) // 2
+                on_preview(StoredVolume(key + "#middle", LazyVolume(entries, flip_rows=True)[middle:middle + 1],
+                                        crop_geometry(geometry, (0, 0, middle)), path, rows_flipped=True, lps=True))
+
+            array, entries = load_dicom_series(entries, dtype=None, flip_rows=True,
+                                               progress=progress, cancelled=cancelled, preview_stride=stride,
+                                               on_preview=preview if on_preview is not None else None)
+            geometry = series_geometry(entries, flip_rows=True)
+            self.volumeCache.put(key, array, geometry)
+
+        if len(entries) != array.shape[0]:
+            # Slices that failed to decode were dropped from the cached volume
+            return StoredVolume(key, array, geometry, path, rows_flipped=True, lps=True)
+
+        metadata = [{
+            'PatientID': entry.patient_id,
+            'SeriesDescription': entry.series_description,
+            'SliceLocation': entry.slice_location,
+            'InstanceNumber': entry.instance_number,
+        } for entry in entries]
+        return StoredVolume(key, array, geometry, path,
+                            filenames=[os.path.basename(entry.path) for entry in entries],
+                            metadata=metadata, rows_flipped=True, lps=True)
+
+    def _open_image_file(self, path, progress=None, cancelled=None):
+        key = VolumeCache.source_key(self._source_files(path), extra="vtk-reader")
+        volume = self.get(key)
+        if volume is not None:
+            return volume
+
+        cached = self.volumeCache.get(key)
+        if cached is not None:
+            array, geometry = cached
+            return StoredVolume(key, array, geometry, path)
+
+        from vtk import vtkMetaImageReader, vtkNIFTIImageReader
+        from utils.vtk_bridge import vtk_image_geometry, vtk_image_to_numpy
+
+        if path.endswith(".nii") or path.endswith(".nii.gz"):
+            imageReader = vtkNIFTIImageReader()
+        elif path.endswith(".mhd") or path.endswith(".mha"):
+            imageReader = vtkMetaImageReader()
+        else:
+            raise ValueError(f"Unsupported image file: {path}")
+        imageReader.SetFileName(path)
+        if progress is not None:
+            imageReader.AddObserver("ProgressEvent", lambda caller, event: progress(int(caller.GetProgress() * 100), 100))
+        imageReader.UpdateWholeExtent()
+        if cancelled is not None and cancelled():
+            raise LoadCancelled()
+
+        image = imageReader.GetOutput()
+        if image.GetNumberOfScalarComponents() != 1:
+            raise ValueError(f"Only single-component images are supported: {path}")
+
+        # The array is a view of the reader's output, which the volume keeps alive
+        array = vtk_image_to_numpy(image)
+        geometry = vtk_image_geometry(image)
+        self.volumeCache.put(key, array, geometry)
+        return StoredVolume(key, array, geometry, path, owner=imageReader)
+
+    @staticmethod
+    def _source_files(path):
+        # Files an image depends on (a MetaImage header and its data file; .mha holds both)
+        files = [path]
+        if path.endswith(".mhd"):
+            stem = os.path.splitext(path)[0]
+            files += [stem + ext for ext in (".raw", ".zraw") if os.path.exists(stem + ext)]
+        return files
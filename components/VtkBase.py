@@ -1,6 +1,16 @@
-import os
+import shutil
+
+import numpy as np
 from vtk import *
 from .CommandSliceSelect import CommandSliceSelect
+from .VolumeStore import VolumeStore
+from utils.vtk_bridge import numpy_to_vtk_source, vtk_image_to_numpy, vtk_image_geometry
+from utils.VolumePyramid import VolumePyramid
+from utils.IntegralVolume import IntegralVolume, region_stats, table_nbytes
+from utils.cache import get_cache_dir
+from utils.SliceCache import SliceImageCache, windowed_slice
+from .ResliceLOD import ResliceLOD
+from .LabelOverlay import LabelOverlay
 
 class VtkBase():
     
@@ -8,49 +18,25 @@ class VtkBase():
     def __init__(self) -> None:
         
         ## Reader
-        self.imageReader = vtkMetaImageReader()
-        temp_path = "./temp/out.mhd"
-        self.imageReader.SetFileName(temp_path) 
-        self.imageReader.UpdateWholeExtent()
+        # Tiny empty placeholder until a study is opened (nothing is read at startup)
+        self.imageReader = numpy_to_vtk_source(np.zeros((2, 2, 2), dtype=np.uint8))
         
         ## Update the data information
         self.update_data_information()
-        
-        ## Filters 
-        ### Image Shift Scale
-        self.imageShiftScale = vtkImageShiftScale()
-        self.imageShiftScale.SetInputData(self.imageReader.GetOutput())
-        self.imageShiftScale.SetOutputScalarTypeToUnsignedChar()
-        self.imageShiftScale.SetShift(-float(self.scalerRange[0]))
-        self.imageShiftScale.UpdateWholeExtent()
-        
-        ### Image Window Level *
-        self.imageWindowLevel = vtkImageMapToWindowLevelColors()
-        self.imageWindowLevel.SetInputConnection(self.imageShiftScale.GetOutputPort())
-        self.imageWindowLevel.UpdateWholeExtent()
-        
-        ### Image Map To Colors **
-        self.imageMapToColors = vtkImageMapToColors()
-        self.imageMapToColors.SetOutputFormatToRGBA()
-        self.imageMapToColors.SetInputData(self.imageWindowLevel.GetOutput())
 
-        ### Grayscale LUT. **
+        ## Grayscale LUT
+        # Window/level is applied through this table to the resliced 2D slices
+        # only; the volume itself stays in its native dtype.
         self.grayscaleLut = vtkLookupTable()
         self.grayscaleLut.SetNumberOfTableValues(256)
-        self.grayscaleLut.SetTableRange(0, 255)
         self.grayscaleLut.SetRampToLinear()
         self.grayscaleLut.SetHueRange(0, 0)
         self.grayscaleLut.SetSaturationRange(0, 0)
         self.grayscaleLut.SetValueRange(0, 1)
         self.grayscaleLut.SetAlphaRange(1, 1)
         self.grayscaleLut.Build()
-        self.imageMapToColors.SetLookupTable(self.grayscaleLut)
-        self.imageMapToColors.UpdateWholeExtent()
-        
-        ## Image Blend
-        self.imageBlend = vtkImageBlend()
-        self.imageBlend.AddInputData(self.imageMapToColors.GetOutput())
-        self.imageBlend.UpdateWholeExtent()
+        self.window, self.level = 255.0, 127.5
+        self.grayscaleLut.SetTableRange(0, 255)
         
         ## Picker        
         self.picker = vtkCellPicker()
@@ -62,60 +48,190 @@ class VtkBase():
         ## Image Reslice
         self.resliceCursor = vtkResliceCursor()
         self.resliceCursor.SetThickMode(0)
-        self.resliceCursor.SetImage(self.imageBlend.GetOutput())
-        self.resliceCursor.SetCenter(self.imageBlend.GetOutput().GetCenter())
+        self.resliceCursor.SetImage(self.imageReader.GetOutput())
+        self.resliceCursor.SetCenter(self.imageReader.GetOutput().GetCenter())
 
         ## Command Slice Select
         self.commandSliceSelect = CommandSliceSelect()
 
+        ## Volume from the shared store backing the reader
+        self.storedVolume = None
+
+        ## Modification time of the reader at its last update
+        self.pipelineMTime = 0
+
+        ## Downsampled levels used while interacting
+        self.volumePyramid = None
+        self.levelImages = {}
+        self.interactionFactor = 1
+        # Reslice quality while dragging, adapted to the measured frame time
+        self.resliceLod = ResliceLOD(self)
+
+        ## Windowed slice images shared by the orthogonal viewers
+        self.sliceCache = SliceImageCache()
+
+        ## Label volume drawn over every view (e.g. organ detections), through one LUT
+        self.labelOverlay = LabelOverlay()
+
+        ## Summed-volume tables for ROI statistics (built on first use per study)
+        self.integralVolume = None
+        # Larger tables are memory-mapped temporary files under the cache directory
+        self.integralMaxBytes = 2 * 2 ** 30
+        # Voxel extent (i0, i1, j0, j1, k0, k1) of the ROI set in the ROI viewer, or None
+        self.roiExtent = None
+
     # Connect to data
     def connect_on_data(self, path:str):
         if path == "":
             return
         
+        # The store decodes each study once; the reader only wraps its buffer
+        self.connect_on_volume(VolumeStore.default().open(path))
+
+    # Connect to a volume already opened by the store (e.g. on a loader thread)
+    def connect_on_volume(self, storedVolume, pyramid=True):
         ## Reader
-        if os.path.isdir(path):
-            self.imageReader = vtkDICOMImageReader()
-            self.imageReader.SetDirectoryName(path)
-        elif path.endswith(".nii") or path.endswith(".nii.gz"):
-            self.imageReader = vtkNIFTIImageReader()
-            self.imageReader.SetFileName(path)
-        elif path.endswith(".mhd"):
-            self.imageReader = vtkMetaImageReader()
-            self.imageReader.SetFileName(path)
+        self.storedVolume = storedVolume
+        self.imageReader = numpy_to_vtk_source(self.storedVolume.array,
+                                               self.storedVolume.geometry['spacing'],
+                                               self.storedVolume.geometry['origin'])
         self.imageReader.UpdateWholeExtent()
         
         # Update the data information
         self.update_data_information()
-        
-        ## Image Shift Scale
-        self.imageShiftScale.SetInputData(self.imageReader.GetOutput())
-        self.imageShiftScale.SetShift(-float(self.scalerRange[0]))
-        if self.scalerRange[1] != self.scalerRange[0]:
-            self.imageShiftScale.SetScale(255.0/(float(self.scalerRange[1] - self.scalerRange[0])))
-        self.imageShiftScale.UpdateWholeExtent()
-
-        ### Image Window Level
-        self.imageWindowLevel.SetInputConnection(self.imageShiftScale.GetOutputPort())
-        self.imageWindowLevel.SetWindow(100.0)
-        self.imageWindowLevel.SetLevel(50.0)
-        self.imageWindowLevel.UpdateWholeExtent()
-
-        ### Image Map To Colors
-        self.imageMapToColors.SetOutputFormatToRGBA()
-        self.imageMapToColors.SetInputData(self.imageWindowLevel.GetOutput())
-        self.imageMapToColors.UpdateWholeExtent()
-        
-        ### Image Blend
-        self.imageBlend.RemoveAllInputs()
-        self.imageBlend.AddInputData(self.imageMapToColors.GetOutput())
-        self.imageBlend.SetOpacity(0, 1.0)
-        self.imageBlend.UpdateWholeExtent()
+
+        ### Window Level
+        # From the study's histogram (1st to 99th percentile), no pass over the voxels
+        self.set_window_level(*storedVolume.histogram.auto_window_level())
         
         ### Reslice Cursor        
-        self.resliceCursor.SetImage(self.imageBlend.GetOutput())
-        self.resliceCursor.SetCenter(self.imageBlend.GetOutput().GetCenter())
+        self.resliceCursor.SetImage(self.imageReader.GetOutput())
+        self.resliceCursor.SetCenter(self.imageReader.GetOutput().GetCenter())
+
+        ### Pyramid, built in the background (not for coarse previews)
+        if self.volumePyramid is not None:
+            self.volumePyramid.cancel()
+        self.volumePyramid = None
+        self.levelImages = {}
+        self.interactionFactor = 1
+        self.sliceCache.clear()
+        if self.integralVolume is not None:
+            self.integralVolume.cancel()
+        self.integralVolume = None
+        self.roiExtent = None
+        self.labelOverlay.clear()
+        if pyramid:
+            self.volumePyramid = VolumePyramid(storedVolume.array, storedVolume.geometry)
+            self.volumePyramid.build_async()
+
+    # Image of a pyramid level (1 is the full-resolution image)
+    def get_level_image(self, factor):
+        if factor == 1:
+            return self.imageReader.GetOutput()
+        if factor not in self.levelImages:
+            level = self.volumePyramid.get_level(factor) if self.volumePyramid is not None else None
+            if level is None:
+                return None
+            array, geometry = level
+            # Native dtype like the full image; the shared LUT does the display mapping
+            self.levelImages[factor] = numpy_to_vtk_source(array, geometry['spacing'], geometry['origin'])
+        return self.levelImages[factor].GetOutput()
+
+    # Intensity histogram of the current study (None before one is opened)
+    def get_histogram(self):
+        return self.storedVolume.histogram if self.storedVolume is not None else None
+
+    # Window/level preset: 'auto', 'lung', 'bone' or 'soft_tissue'
+    def set_window_preset(self, name):
+        histogram = self.get_histogram()
+        if histogram is not None:
+            self.set_window_level(*histogram.preset(name))
+
+    # Set the display window/level (native units) on the LUT and every slice view
+    def set_window_level(self, window, level):
+        self.window, self.level = float(window), float(level)
+        self.grayscaleLut.SetTableRange(self.level - self.window / 2.0, self.level + self.window / 2.0)
+
+        # Views only re-map the slices they show
+        for resliceCursorWidget in self.commandSliceSelect.resliceCursorWidgets:
+            if resliceCursorWidget is not None:
+                resliceCursorWidget.GetRepresentation().SetWindowLevel(self.window, self.level)
+        for imagePlaneWidget in self.commandSliceSelect.imagePlaneWidgets:
+            if imagePlaneWidget is not None:
+                imagePlaneWidget.SetWindowLevel(self.window, self.level)
+        self.commandSliceSelect.request_render()
+
+    def get_window_level(self):
+        return self.window, self.level
+
+    # Windowed 8-bit image of an axis-aligned slice, from the slice cache
+    # (direction +1/-1 prefetches the next slices in the scroll direction)
+    def get_slice_image(self, orientation, index, direction=0):
+        if self.storedVolume is None:
+            return None
+        key = (self.storedVolume.key, orientation, index, self.window, self.level)
+        image = self.sliceCache.get_or_render(key, self.render_slice_image)
+
+        if direction:
+            self.prefetch_slices(orientation, [index + direction * step for step in range(1, self.sliceCache.prefetch_depth + 1)])
+        return image
+
+    # Render slices of an orientation into the cache in the background (replaces its pending prefetch)
+    def prefetch_slices(self, orientation, indices):
+        if self.storedVolume is None:
+            return
+        count = self.storedVolume.array.shape[2 - orientation]
+        keys = [(self.storedVolume.key, orientation, index, self.window, self.level)
+                for index in indices if 0 <= index < count]
+        self.sliceCache.prefetch(keys, self.render_slice_image, stream=orientation)
+
+    # Render a slice cache key (None once another volume is shown)
+    def render_slice_image(self, key):
+        volumeKey, orientation, index, window, level = key
+        storedVolume = self.storedVolume
+        if storedVolume is None or storedVolume.key != volumeKey:
+            return None
+        # Viewer orientations are VTK axes (x, y, z); the array is (Z, Y, X)
+        return windowed_slice(storedVolume.array, 2 - orientation, index, window, level)
+
+    # Label volume drawn over the slices of every view (same shape and geometry as the volume)
+    def set_label_volume(self, labels, colors=None):
+        volume = self.get_volume_array()
+        if volume is None or labels.shape != volume.shape:
+            raise ValueError(f"Label volume shape {labels.shape} does not match the volume "
+                             f"{None if volume is None else volume.shape}")
+        self.labelOverlay.set_labels(labels, self.get_volume_geometry(), colors)
+        self.commandSliceSelect.request_render()
+
+    # Reslice at a lower quality while interacting (see ResliceLOD), full quality otherwise.
+    # Returns True if the resliced images changed.
+    def set_interaction_level(self, interacting:bool):
+        if interacting:
+            return self.resliceLod.start_interaction()
+        return self.resliceLod.end_interaction()
+
+    # Reslice the ortho views from a pyramid level (1 is full resolution); returns True if it changed
+    def set_reslice_factor(self, factor):
+        if factor == self.interactionFactor:
+            return False
+        image = self.get_level_image(factor)
+        if image is None:
+            return False
+        self.interactionFactor = factor
+        center = self.resliceCursor.GetCenter()
+        self.resliceCursor.SetImage(image)
+        self.resliceCursor.SetCenter(center)
+        return True
         
+    # Re-execute the reader only when it changed since the last update
+    # (display mapping happens per slice in the views)
+    def update_pipeline(self):
+        if self.imageReader.GetMTime() <= self.pipelineMTime:
+            return False
+        self.imageReader.UpdateWholeExtent()
+        self.pipelineMTime = self.imageReader.GetMTime()
+        return True
+
     # Update data information
     def update_data_information(self):
         # Calculate the scaler range of data
@@ -125,4 +241,71 @@ class VtkBase():
         self.imageDimensions = self.imageReader.GetOutput().GetDimensions()
         
         # Calculate the bounds of the data
-        self.bounds = self.imageReader.GetOutput().GetBounds()
\ No newline at end of file
+        self.bounds = self.imageReader.GetOutput().GetBounds()
+
+    # Zero-copy (Z, Y, X) numpy view of the loaded volume in its native dtype
+    def get_volume_array(self):
+        if self.storedVolume is not None:
+            return self.storedVolume.array
+        image = self.imageReader.GetOutput()
+        if image.GetPointData().GetScalars() is None:
+            return None
+        volume = vtk_image_to_numpy(image)
+        volume.flags.writeable = False
+        return volume
+
+    # Spacing, origin and direction of the array returned by get_volume_array
+    def get_volume_geometry(self):
+        if self.storedVolume is not None:
+            return self.storedVolume.geometry
+        return vtk_image_geometry(self.imageReader.GetOutput())
+
+    # Convert world bounds to a clamped voxel extent (i0, i1, j0, j1, k0, k1)
+    def bounds_to_extent(self, bounds):
+        image = self.imageReader.GetOutput()
+        origin = image.GetOrigin()
+        spacing = image.GetSpacing()
+        dimensions = image.GetDimensions()
+
+        extent = []
+        for axis in range(3):
+            low = min(bounds[axis * 2], bounds[axis * 2 + 1])
+            high = max(bounds[axis * 2], bounds[axis * 2 + 1])
+            low = int(np.floor((low - origin[axis]) / spacing[axis]))
+            high = int(np.ceil((high - origin[axis]) / spacing[axis]))
+            extent += [min(max(low, 0), dimensions[axis] - 1), min(max(high, 0), dimensions[axis] - 1)]
+        return extent
+
+    # Zero-copy view of the volume inside world bounds
+    def get_roi_array(self, bounds):
+        i0, i1, j0, j1, k0, k1 = self.bounds_to_extent(bounds)
+        return self.get_volume_array()[k0:k1 + 1, j0:j1 + 1, i0:i1 + 1]
+
+    # Summed-volume tables of the current study, started in the background on first use
+    # (None without the disk space for them; on_ready is called from the build thread)
+    def get_integral_volume(self, on_ready=None):
+        if self.integralVolume is None and self.storedVolume is not None:
+            storageDir = None
+            nbytes = table_nbytes(self.storedVolume.array.shape)
+            if nbytes > self.integralMaxBytes:
+                storageDir = str(get_cache_dir("integral"))
+                if shutil.disk_usage(storageDir).free < 2 * nbytes:
+                    return None
+            self.integralVolume = IntegralVolume(self.storedVolume.array, self.storedVolume.geometry['spacing'],
+                                                 storage_dir=storageDir)
+            self.integralVolume.build_async(on_ready)
+        return self.integralVolume
+
+    # Statistics of the voxels inside world bounds (None while the tables are being built)
+    def get_roi_stats(self, bounds, on_ready=None):
+        if self.storedVolume is None:
+            return None
+        extent = self.bounds_to_extent(bounds)
+        integralVolume = self.get_integral_volume(on_ready)
+        if integralVolume is not None:
+            return integralVolume.stats(extent)
+
+        # No room for the tables: one exact pass over the ROI
+        i0, i1, j0, j1, k0, k1 = extent
+        return region_stats(self.storedVolume.array[k0:k1 + 1, j0:j1 + 1, i0:i1 + 1],
+                            self.storedVolume.geometry['spacing'])
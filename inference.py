@@ -14,11 +14,15 @@ import shutil
 from pathlib import Path
 from totalsegmentator.python_api import totalsegmentator
 import SimpleITK as sitk
-from utils import (
+from components.VolumeStore import VolumeStore, write_nifti
+from utils.roi import crop_geometry, extent_slices, paste_crop
+from utils.LazyVolume import LazyVolume
+from utils.SegmentationResult import SegmentationResult
+from utils.helpers import (
     check_device,
     load_dicom_slice,
-    load_dicom_folder,
     save_results,
+    series_geometry,
     estimate_vram_needed
 )
 
@@ -59,27 +63,33 @@ class SliceOrganDetector:
         print(f"  Device: {self.device}")
         print(f"  Fast mode: {self.fast_mode}")
 
-    def _prepare_volume_for_totalseg(self, images):
+    def _prepare_volume_for_totalseg(self, images, geometry=None):
         """
-        Convert list of 2D slices into a 3D volume for TotalSegmentator.
+        Bring slices into the 3D volume TotalSegmentator is fed with.
         TotalSegmentator expects 3D input (even for slice-level detection).
 
         Args:
-            images (list): List of 2D numpy arrays
+            images: (Z, H, W) numpy volume (e.g. the shared VolumeStore buffer) or
+                    LazyVolume, used as is, or list of 2D numpy arrays (stacked once)
+            geometry (dict): Optional 'spacing', 'origin' and 'direction' of the volume
 
         Returns:
-            sitk.Image: 3D SimpleITK image
+            tuple: ((Z, H, W) np.ndarray or LazyVolume, geometry dict)
         """
-        # Stack slices into 3D volume
-        volume = np.stack(images, axis=-1)  # Shape: (H, W, num_slices)
+        if getattr(images, 'ndim', None) == 3:
+            # A numpy volume, or a LazyVolume read only once it is cropped
+            volume = images
+        else:
+            volume = np.stack(images, axis=0)  # Shape: (Z, H, W)
 
-        # Convert to SimpleITK format
-        sitk_img = sitk.GetImageFromArray(np.transpose(volume, (2, 0, 1)))  # (Z, H, W)
-        sitk_img.SetSpacing([1.0, 1.0, 1.0])  # Dummy spacing
+        if geometry is None:
+            # Dummy geometry
+            geometry = {'spacing': (1.0, 1.0, 1.0), 'origin': (0.0, 0.0, 0.0),
+                        'direction': (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0)}
 
-        return sitk_img
+        return volume, geometry
 
-    def detect_organs_in_slices(self, images, filenames=None):
+    def detect_organs_in_slices(self, images, filenames=None, geometry=None, roi=None, margin=20.0, lps=True):
         """
         Detect organs present in each slice and return detailed results.
 
@@ -87,15 +97,24 @@ class SliceOrganDetector:
         using TotalSegmentator 3D segmentation, then extracts per-slice information.
 
         Args:
-            images (list): List of 2D numpy arrays (one per slice)
+            images: (Z, H, W) numpy volume or list of 2D numpy arrays (one per slice)
             filenames (list): List of filenames corresponding to each slice
+            geometry (dict): Optional 'spacing', 'origin' and 'direction' of the volume
+            roi (tuple): Optional (i0, i1, j0, j1, k0, k1) voxel extent; only this box
+                         (plus the margin) is segmented and the labels are pasted back
+                         into full-volume coordinates
+            margin (float): Context around the ROI in mm
+            lps (bool): The geometry is in DICOM LPS coordinates (see write_nifti)
 
         Returns:
-            list: List of dicts, one per slice, containing:
+            SegmentationResult: The label volume, indexable like a list of dicts,
+                  one per slice (of the full volume), containing:
                   - filename: slice filename
                   - organs: list of organ names detected
-                  - masks: dict mapping organ names to binary masks
+                  - pixel_counts, bboxes: per-organ pixel count and (y0, y1, x0, x1) box
+                  - masks: mapping of organ names to binary masks (made when looked up)
                   - confidence: placeholder for confidence scores
+                  An empty list if segmentation produced no output.
         """
         if filenames is None:
             filenames = [f"slice_{i:04d}.dcm" for i in range(len(images))]
@@ -116,14 +135,23 @@ class SliceOrganDetector:
 
         # Create temporary directory for TotalSegmentator I/O
         self.temp_dir = tempfile.mkdtemp()
-        input_path = Path(self.temp_dir) / "input.nii.gz"
+        input_path = Path(self.temp_dir) / "input.nii"
         output_path = Path(self.temp_dir) / "output"
 
         try:
             # Prepare 3D volume from slices
             print("  → Preparing volume for segmentation...")
-            sitk_volume = self._prepare_volume_for_totalseg(images)
-            sitk.WriteImage(sitk_volume, str(input_path))
+            volume, geometry = self._prepare_volume_for_totalseg(images, geometry)
+            full_shape, crop = volume.shape, None
+            if roi is not None:
+                # Zero-copy view of the ROI: inference time scales with the crop
+                crop, start = extent_slices(roi, full_shape, geometry['spacing'], margin)
+                volume, geometry = volume[crop], crop_geometry(geometry, start)
+                print(f"  → Restricted to ROI {volume.shape} of {full_shape} "
+                      f"({volume.size / np.prod(full_shape):.1%} of the voxels)")
+            # A LazyVolume decodes here, only the slices of the crop
+            volume = np.asarray(volume)
+            write_nifti(volume, geometry, input_path, lps=lps)  # Uncompressed, straight from the buffer
 
             # Run TotalSegmentator
             # Use 'fast' task for speed, 'total' for full segmentation
@@ -154,46 +182,15 @@ class SliceOrganDetector:
             # For multi-label output, there's usually one file with all organs
             seg_volume = sitk.ReadImage(str(seg_files[0]))
             seg_array = sitk.GetArrayFromImage(seg_volume)  # Shape: (Z, H, W)
+            if crop is not None:
+                # Labels back in full-volume coordinates (background outside the ROI)
+                seg_array = paste_crop(seg_array, full_shape, crop)
 
-            # Extract per-slice results
-            results = []
-            for slice_idx in range(num_slices):
-                slice_seg = seg_array[slice_idx]  # 2D mask for this slice
-
-                # Find unique organ labels present in this slice
-                unique_labels = np.unique(slice_seg)
-                unique_labels = unique_labels[unique_labels > 0]  # Exclude background
-
-                # Map labels to organ names
-                organs_detected = []
-                masks_dict = {}
-
-                for label in unique_labels:
-                    organ_name = ORGAN_LABELS.get(int(label), f"structure_{int(label)}")
-                    organs_detected.append(organ_name)
-
-                    # Extract binary mask for this organ in this slice
-                    organ_mask = (slice_seg == label).astype(np.uint8)
-                    masks_dict[organ_name] = organ_mask
-
-                # Calculate pseudo-confidence based on mask size (larger = more confident)
-                # Real TotalSegmentator doesn't provide confidence, so we estimate
-                confidence = len(unique_labels) / 10.0 if unique_labels.size > 0 else 0.0
-                confidence = min(confidence, 1.0)
-
-                result = {
-                    'filename': filenames[slice_idx],
-                    'slice_index': slice_idx,
-                    'organs': organs_detected,
-                    'num_organs': len(organs_detected),
-                    'masks': masks_dict,
-                    'confidence': round(confidence, 3)
-                }
-                results.append(result)
-
-                # Print progress
-                if len(organs_detected) > 0:
-                    print(f"    Slice {slice_idx + 1}/{num_slices}: Found {len(organs_detected)} organ(s)")
+            # Per-slice labels, pixel counts and boxes; masks are only made when looked up
+            results = SegmentationResult(seg_array, filenames, ORGAN_LABELS)
+            for result in results:
+                if result['num_organs'] > 0:
+                    print(f"    Slice {result['slice_index'] + 1}/{num_slices}: Found {result['num_organs']} organ(s)")
 
             print(f"✓ Completed segmentation")
             print(f"{'=' * 70}\n")
@@ -247,6 +244,12 @@ Examples:
 
   # Fast mode (less accurate but faster)
   python inference.py --input dicom_folder/ --output results/ --fast
+
+  # Compact run-length encoded masks instead of one PNG per organ and slice
+  python inference.py --input dicom_folder/ --output results/ --save-rle
+
+  # Only a box around one kidney (voxel extent x0 x1 y0 y1 z0 z1), 15 mm context
+  python inference.py --input dicom_folder/ --roi 250 380 180 300 40 120 --margin 15
         """
     )
 
@@ -260,6 +263,13 @@ Examples:
                         help='Use fast mode (less accurate but faster)')
     parser.add_argument('--save-masks', action='store_true',
                         help='Save individual mask images')
+    parser.add_argument('--save-rle', action='store_true',
+                        help='Save run-length encoded masks (masks_rle.json)')
+    parser.add_argument('--roi', type=int, nargs=6, default=None,
+                        metavar=('X0', 'X1', 'Y0', 'Y1', 'Z0', 'Z1'),
+                        help='Segment only this inclusive voxel box (plus --margin)')
+    parser.add_argument('--margin', type=float, default=20.0,
+                        help='Context around --roi in mm (default: 20)')
 
     args = parser.parse_args()
 
@@ -282,18 +292,32 @@ Examples:
             return
         images = [image]
         filenames = [input_path.name]
+        geometry = None
+        rows_flipped = False
     elif input_path.is_dir():
         print(f"Loading DICOM folder: {input_path}")
-        images, filenames, metadata_list = load_dicom_folder(str(input_path))
-        if not images:
-            print("✗ No DICOM files found in folder")
+        try:
+            if args.roi is not None:
+                # Only the slices around the ROI are decoded, on demand
+                images = LazyVolume.from_folder(str(input_path), flip_rows=True)
+                filenames = [Path(path).name for path in images.filenames]
+                geometry = series_geometry(images.entries, flip_rows=True)
+                rows_flipped = True
+            else:
+                # Same decode path and buffer as the GUI (and its on-disk volume cache)
+                volume = VolumeStore.default().open(str(input_path))
+                images, filenames, geometry = volume.array, volume.filenames, volume.geometry
+                rows_flipped = volume.rows_flipped
+        except ValueError as e:
+            print(f"✗ {e}")
             return
+        print(f"✓ Opened {len(filenames)} DICOM slices from {input_path}")
     else:
         print(f"✗ Input path does not exist: {input_path}")
         return
 
     # Run detection
-    results = detector.detect_organs_in_slices(images, filenames)
+    results = detector.detect_organs_in_slices(images, filenames, geometry, roi=args.roi, margin=args.margin)
 
     if not results:
         print("✗ No results obtained")
@@ -301,8 +325,6 @@ Examples:
 
     # Prepare results for saving
     results_data = []
-    masks_to_save = []
-
     for result in results:
         for organ in result['organs']:
             results_data.append({
@@ -310,20 +332,17 @@ Examples:
                 'slice_index': result['slice_index'],
                 'organ': organ,
                 'confidence': result['confidence'],
+                'pixel_count': result['pixel_counts'][organ],
                 'mask_path': f"masks/{Path(result['filename']).stem}_{organ}_mask.png" if args.save_masks else ""
             })
 
-            if args.save_masks:
-                masks_to_save.append({
-                    'filename': f"{Path(result['filename']).stem}_{organ}",
-                    'mask': result['masks'][organ]
-                })
-
     # Save results
     csv_path, masks_dir = save_results(
         args.output,
         results_data,
-        masks=masks_to_save if args.save_masks else None
+        # Stored volumes keep rows bottom-up; masks are saved in DICOM row order
+        masks=results.export_masks(flip_rows=rows_flipped) if args.save_masks else None,
+        rle=results.to_rle(flip_rows=rows_flipped) if args.save_rle else None
     )
 
     # Print summary
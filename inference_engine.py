@@ -4,13 +4,13 @@ Simplified version of inference.py optimized for GUI use.
 """
 
 import numpy as np
-import torch
 import tempfile
 import shutil
 from pathlib import Path
-from totalsegmentator.python_api import totalsegmentator
-import SimpleITK as sitk
+from components.VolumeStore import write_nifti
+from utils.roi import crop_geometry, extent_slices, paste_crop
 from utils.helpers import check_device
+from utils.SegmentationResult import SegmentationResult
 
 # TotalSegmentator organ labels (major organs only)
 ORGAN_LABELS = {
@@ -36,4 +36,97 @@ class SliceOrganDetector:
             fast_mode: Use faster inference settings
         """
         self.device = device if device else check_device()
-        self.fast_
\ No newline at end of file
+        self.fast_mode = fast_mode
+        self.temp_dir = None
+
+    def _prepare_volume_for_totalseg(self, images, geometry=None):
+        """
+        Bring slices into the 3D volume TotalSegmentator is fed with.
+
+        Args:
+            images: (Z, H, W) numpy volume or LazyVolume (used as is) or list of 2D arrays
+            geometry (dict): Optional 'spacing', 'origin' and 'direction' of the volume
+
+        Returns:
+            tuple: ((Z, H, W) np.ndarray or LazyVolume, geometry dict)
+        """
+        if getattr(images, 'ndim', None) == 3:
+            # A numpy volume, or a LazyVolume read only once it is cropped
+            volume = images
+        else:
+            volume = np.stack(images, axis=0)
+
+        if geometry is None:
+            geometry = {'spacing': (1.0, 1.0, 1.0), 'origin': (0.0, 0.0, 0.0),
+                        'direction': (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0)}
+
+        return volume, geometry
+
+    def detect_organs_in_slices(self, images, filenames=None, geometry=None, roi=None, margin=20.0, lps=True):
+        """
+        Segment the volume with TotalSegmentator and report organs per slice.
+
+        Args:
+            images: (Z, H, W) numpy volume, LazyVolume or list of 2D arrays (one per slice)
+            filenames (list): Names for each slice
+            geometry (dict): Optional 'spacing', 'origin' and 'direction' of the volume
+            roi (tuple): Optional (i0, i1, j0, j1, k0, k1) voxel extent segmented alone
+                         (plus the margin); labels are returned in full-volume coordinates
+            margin (float): Context around the ROI in mm
+            lps (bool): The geometry is in DICOM LPS coordinates (see write_nifti)
+
+        Returns:
+            SegmentationResult: Label volume with one metadata dict per slice (filename,
+                                slice_index, organs, num_organs, pixel_counts, bboxes,
+                                lazy masks and confidence); empty list without output
+        """
+        # Heavy ML imports are deferred to the first detection run
+        from totalsegmentator.python_api import totalsegmentator
+        import SimpleITK as sitk
+
+        num_slices = len(images)
+        if filenames is None:
+            filenames = [f"slice_{i:04d}" for i in range(num_slices)]
+
+        self.temp_dir = tempfile.mkdtemp()
+        input_path = Path(self.temp_dir) / "input.nii"
+        output_path = Path(self.temp_dir) / "output"
+
+        try:
+            volume, geometry = self._prepare_volume_for_totalseg(images, geometry)
+            full_shape, crop = volume.shape, None
+            if roi is not None:
+                # Zero-copy view of the ROI: inference time scales with the crop
+                crop, start = extent_slices(roi, full_shape, geometry['spacing'], margin)
+                volume, geometry = volume[crop], crop_geometry(geometry, start)
+            # A LazyVolume decodes here, only the slices of the crop
+            volume = np.asarray(volume)
+            write_nifti(volume, geometry, input_path, lps=lps)
+
+            task = "fast" if self.fast_mode else "total"
+            totalsegmentator(
+                input=str(input_path),
+                output=str(output_path),
+                task=task,
+                ml=True,
+                nr_thr_resamp=1,
+                nr_thr_saving=1,
+                fast=self.fast_mode,
+                device=self.device.type,
+                quiet=True
+            )
+
+            seg_files = list(output_path.glob("*.nii.gz"))
+            if not seg_files:
+                return []
+
+            seg_array = sitk.GetArrayFromImage(sitk.ReadImage(str(seg_files[0])))  # (Z, H, W)
+            if crop is not None:
+                seg_array = paste_crop(seg_array, full_shape, crop)
+
+            # One label volume; per-organ masks are made only when looked up
+            return SegmentationResult(seg_array, filenames, ORGAN_LABELS)
+
+        finally:
+            if self.temp_dir and Path(self.temp_dir).exists():
+                shutil.rmtree(self.temp_dir)
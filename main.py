@@ -1,9 +1,13 @@
-
-
 import sys
-from PyQt5.QtWidgets import QApplication 
-from app import MainWindow
-from qdarktheme import load_stylesheet
+from utils.startup import startup_timer
+
+with startup_timer.stage("import PyQt5"):
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+with startup_timer.stage("import app"):
+    from app import MainWindow
+with startup_timer.stage("import qdarktheme"):
+    from qdarktheme import load_stylesheet
 
 def main():
     """Main function for the application."""
@@ -11,14 +15,21 @@ def main():
     # Create the application
     app = QApplication(sys.argv)
     app.setStyleSheet(load_stylesheet())
+    startup_timer.mark("QApplication + stylesheet")
     
     # Create and show the main window
     window = MainWindow()
+    startup_timer.mark("MainWindow: menus and ROI")
     window.show()
+    startup_timer.mark("show")
+
+    # The first event loop pass paints the window
+    if startup_timer.enabled():
+        QTimer.singleShot(0, lambda: (startup_timer.mark("first paint"), startup_timer.report()))
 
     # Start the event loop
     sys.exit(app.exec_())
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
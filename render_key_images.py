@@ -0,0 +1,205 @@
+"""
+Axial, coronal and sagittal key images (PNG) for many studies, headless.
+
+Each worker process renders whole studies with an offscreen
+OffscreenMPRRenderer, so no display or Qt is needed. Studies are DICOM
+folders, NIfTI or MetaImage files; an archive folder is searched for them.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+IMAGE_SUFFIXES = ('.nii', '.nii.gz', '.mhd', '.mha')
+
+# Renderer reused by all studies of a worker process
+_renderer = None
+
+
+def is_image_file(path):
+    return path.name.lower().endswith(IMAGE_SUFFIXES)
+
+
+def find_studies(root, exclude=()):
+    """
+    Studies under a folder: image files, and folders that directly contain DICOM files.
+
+    Args:
+        root (str): Archive folder
+        exclude (tuple): File names that are not studies (e.g. the overlay label files)
+
+    Returns:
+        list: Sorted study paths
+    """
+    studies = []
+    for folder, subfolders, files in os.walk(root):
+        subfolders.sort()
+        paths = [Path(folder) / name for name in files if name not in exclude]
+        images = [path for path in paths if is_image_file(path)]
+        studies.extend(images)
+        if any(path.suffix.lower() in ('.dcm', '') and not is_image_file(path) for path in paths):
+            studies.append(Path(folder))
+    return sorted(studies)
+
+
+def study_name(study, root=None):
+    """Output folder name of a study (its path relative to the archive root)."""
+    path = Path(study)
+    if root is not None and Path(root) in path.parents:
+        path = path.relative_to(root)
+    name = "__".join(path.parts) if root is not None else path.name
+    for suffix in IMAGE_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def overlay_path(study, overlay):
+    """Label file of a study: absolute, or relative to the study folder (or the file's folder)."""
+    if overlay is None:
+        return None
+    path = Path(overlay)
+    if path.is_absolute():
+        return path
+    folder = Path(study) if Path(study).is_dir() else Path(study).parent
+    return folder / path
+
+
+def _init_worker(size, annotate):
+    global _renderer
+    from components.OffscreenRenderer import OffscreenMPRRenderer
+
+    _renderer = OffscreenMPRRenderer(size=size, annotate=annotate)
+
+
+def render_study(study, output, name, orientations, positions, indices, window, level, overlay, opacity,
+                 preset=None):
+    """
+    Render the key images of one study (runs in a worker process).
+
+    Returns:
+        tuple: (study, list of PNG paths, error message or None)
+    """
+    from components.VolumeStore import VolumeStore
+
+    try:
+        volume = _renderer.open(str(study))
+        if window is not None and level is not None:
+            _renderer.set_window_level(window, level)
+        elif preset is not None:
+            _renderer.set_window_preset(preset)
+
+        labels = overlay_path(study, overlay)
+        if labels is not None:
+            if labels.exists():
+                labelVolume = VolumeStore.default().open(str(labels))
+                _renderer.set_overlay(labelVolume.array, opacity)
+                VolumeStore.default().release(labelVolume.key)
+            else:
+                print(f"⚠️  No overlay {labels} for {study}")
+
+        folder = Path(output) / name
+        folder.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for orientation in orientations:
+            sliceIndices = list(indices or []) + [_renderer.index_at(orientation, p) for p in positions or []]
+            for index in dict.fromkeys(sliceIndices):
+                path = folder / f"{orientation}_{index:04d}.png"
+                paths.append(str(_renderer.save_png(path, orientation, index)))
+
+        # One study at a time per worker: do not keep it referenced
+        VolumeStore.default().release(volume.key)
+        return str(study), paths, None
+    except Exception as e:
+        return str(study), [], f"{type(e).__name__}: {e}"
+
+
+def main():
+    """
+    Main function for command-line usage.
+    """
+    parser = argparse.ArgumentParser(
+        description="Headless axial/coronal/sagittal key images for studies",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Middle slice of each view of one study
+  python render_key_images.py --input dicom_folder/ --output key_images/
+
+  # Whole archive on 8 processes, three positions, CT soft-tissue window
+  python render_key_images.py --archive /data/archive --workers 8 --positions 0.25 0.5 0.75 --window 400 --level 40
+
+  # Lung window on every study
+  python render_key_images.py --archive /data/archive --preset lung
+
+  # Labels drawn over the slices (file next to each study)
+  python render_key_images.py --archive /data/archive --overlay segmentation.nii.gz
+        """
+    )
+    parser.add_argument('--input', '-i', nargs='*', default=[],
+                        help='Study paths (DICOM folders, .nii/.nii.gz or .mhd/.mha files)')
+    parser.add_argument('--archive', '-a', default=None,
+                        help='Folder searched for studies')
+    parser.add_argument('--output', '-o', default='key_images',
+                        help='Output directory, one folder per study (default: key_images/)')
+    parser.add_argument('--orientations', nargs='+', default=['axial', 'coronal', 'sagittal'],
+                        choices=['axial', 'coronal', 'sagittal'], help='Views to render')
+    parser.add_argument('--positions', type=float, nargs='*', default=None,
+                        help='Slice positions as fractions of each view (default: 0.5)')
+    parser.add_argument('--indices', type=int, nargs='*', default=None,
+                        help='Slice indices (added to --positions)')
+    parser.add_argument('--window', type=float, default=None, help='Window width (default: auto from the histogram)')
+    parser.add_argument('--level', type=float, default=None, help='Window center')
+    parser.add_argument('--preset', choices=['auto', 'lung', 'bone', 'soft_tissue'], default=None,
+                        help='Window preset used when --window/--level are not given')
+    parser.add_argument('--overlay', default=None,
+                        help='Label volume drawn over the slices (relative paths are per study)')
+    parser.add_argument('--opacity', type=float, default=0.4, help='Overlay opacity')
+    parser.add_argument('--size', type=int, nargs=2, default=[512, 512], metavar=('WIDTH', 'HEIGHT'),
+                        help='Image size in pixels')
+    parser.add_argument('--annotate', action='store_true', help='Write view, slice and window/level on images')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help='Worker processes')
+    args = parser.parse_args()
+
+    studies = [(Path(path), None) for path in args.input]
+    if args.archive:
+        # Per-study overlay files sit next to the studies
+        exclude = (Path(args.overlay).name,) if args.overlay and not Path(args.overlay).is_absolute() else ()
+        studies += [(path, args.archive) for path in find_studies(args.archive, exclude)]
+    if not studies:
+        parser.error("no studies: give --input and/or --archive")
+    if (args.window is None) != (args.level is None):
+        parser.error("--window and --level must be given together")
+    positions = args.positions if args.positions is not None or args.indices else [0.5]
+
+    print(f"Rendering {len(studies)} studies on {args.workers} workers into {args.output}")
+    start = time.perf_counter()
+    failures = 0
+    # spawn: each worker gets its own rendering context, nothing inherited from the parent
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                             initializer=_init_worker, initargs=(tuple(args.size), args.annotate)) as pool:
+        futures = [pool.submit(render_study, str(study), args.output, study_name(study, root), args.orientations,
+                               positions, args.indices, args.window, args.level, args.overlay, args.opacity,
+                               args.preset)
+                   for study, root in studies]
+        for future in as_completed(futures):
+            study, paths, error = future.result()
+            if error:
+                failures += 1
+                print(f"✗ {study}: {error}")
+            else:
+                print(f"✓ {study}: {len(paths)} images")
+
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s ({len(studies) / elapsed:.2f} studies/s), {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from utils.IntegralVolume import IntegralVolume, region_stats
+
+
+def random_extents(shape, count, rng):
+    depth, height, width = shape
+    for _ in range(count):
+        k0, k1 = sorted(rng.integers(0, depth, 2))
+        j0, j1 = sorted(rng.integers(0, height, 2))
+        i0, i1 = sorted(rng.integers(0, width, 2))
+        yield int(i0), int(i1), int(j0), int(j1), int(k0), int(k1)
+
+
+@pytest.mark.parametrize('dtype', [np.int16, np.float32])
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_stats_match_a_brute_force_scan_on_random_boxes(dtype, on_disk, tmp_path):
+    rng = np.random.default_rng(0)
+    volume = rng.integers(-1024, 3000, (23, 37, 41)).astype(dtype)
+    spacing = (0.7, 0.8, 2.5)
+    integral = IntegralVolume(volume, spacing, block=4, storage_dir=str(tmp_path) if on_disk else None)
+    integral.build()
+    assert integral.ready
+
+    for extent in random_extents(volume.shape, 200, rng):
+        i0, i1, j0, j1, k0, k1 = extent
+        expected = region_stats(volume[k0:k1 + 1, j0:j1 + 1, i0:i1 + 1], spacing)
+        stats = integral.stats(extent)
+        assert stats['count'] == expected['count']
+        assert stats['min'] == expected['min']
+        assert stats['max'] == expected['max']
+        assert stats['mean'] == pytest.approx(expected['mean'], rel=1e-9, abs=1e-9)
+        assert stats['std'] == pytest.approx(expected['std'], rel=1e-6, abs=1e-6)
+        assert stats['volume_ml'] == pytest.approx(expected['volume_ml'])
+
+
+def test_on_ready_is_called_once_the_tables_are_built():
+    calls = []
+    integral = IntegralVolume(np.arange(64, dtype=np.int16).reshape(4, 4, 4))
+    assert integral.stats((0, 3, 0, 3, 0, 3)) is None
+    integral.build(on_ready=lambda: calls.append(integral.ready))
+    assert calls == [True]
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from utils.SegmentationResult import SegmentationResult, rle_decode, rle_encode
+
+LABEL_NAMES = {1: 'liver', 2: 'spleen', 300: 'aorta'}
+
+
+def synthetic_labels():
+    rng = np.random.default_rng(0)
+    labels = np.zeros((6, 20, 24), dtype=np.uint16)
+    labels[1, 3:9, 4:15] = 1
+    labels[1, 12:18, 2:6] = 2
+    labels[2] = rng.choice([0, 1, 2, 300, 7], size=(20, 24))
+    labels[4, 0, 0] = 300
+    labels[5] = 1
+    return labels
+
+
+@pytest.mark.parametrize('mask', [
+    np.zeros((5, 7), dtype=np.uint8),
+    np.ones((5, 7), dtype=np.uint8),
+    np.eye(6, dtype=np.uint8),
+    (np.random.default_rng(1).random((31, 17)) > 0.5).astype(np.uint8),
+])
+def test_rle_round_trip(mask):
+    rle = rle_encode(mask)
+    assert rle['size'] == list(mask.shape)
+    assert sum(rle['counts']) == mask.size
+    np.testing.assert_array_equal(rle_decode(rle), mask)
+
+
+def test_lazy_masks_counts_and_bboxes_match_the_labels():
+    labels = synthetic_labels()
+    result = SegmentationResult(labels, label_names=LABEL_NAMES)
+    assert result.labels.dtype == np.uint16
+    assert len(result) == len(labels)
+
+    for z, info in enumerate(result):
+        present = sorted(int(label) for label in np.unique(labels[z]) if label)
+        assert info['labels'] == present
+        assert info['organs'] == [result.organ_name(label) for label in present]
+        assert info['num_organs'] == len(present)
+
+        for organ in info['organs']:
+            expected = labels[z] == result.organ_label(organ)
+            mask = info['masks'][organ]
+            assert mask.dtype == np.uint8
+            np.testing.assert_array_equal(mask, expected)
+            assert info['pixel_counts'][organ] == expected.sum()
+
+            rows, columns = np.nonzero(expected)
+            assert info['bboxes'][organ] == (rows.min(), rows.max(), columns.min(), columns.max())
+
+            np.testing.assert_array_equal(rle_decode(result.mask_rle(z, organ)), expected)
+            np.testing.assert_array_equal(rle_decode(result.mask_rle(z, organ, flip_rows=True)), expected[::-1])
+
+
+def test_unnamed_labels_and_exports():
+    result = SegmentationResult(synthetic_labels(), label_names=LABEL_NAMES)
+    assert 'structure_7' in result[2]['organs']
+    assert result.organs() == ['liver', 'spleen', 'structure_7', 'aorta']
+
+    exported = list(result.export_masks(flip_rows=True))
+    assert len(exported) == sum(info['num_organs'] for info in result)
+    first = exported[0]
+    assert first['filename'] == 'slice_0001_liver'
+    np.testing.assert_array_equal(first['mask'], result.mask(1, 'liver')[::-1])
+
+    rle = result.to_rle()
+    assert set(rle) == {info['filename'] for info in result if info['organs']}
+    np.testing.assert_array_equal(rle_decode(rle['slice_0004']['aorta']), result.mask(4, 'aorta'))
+
+
+def test_compact_labels_picks_the_smallest_dtype():
+    assert SegmentationResult(np.array([[[0, 3]]], dtype=np.int64)).labels.dtype == np.uint8
+    assert SegmentationResult(np.array([[[0, 300]]], dtype=np.int64)).labels.dtype == np.uint16
+    with pytest.raises(ValueError):
+        SegmentationResult(np.array([[[-1, 0]]], dtype=np.int64))
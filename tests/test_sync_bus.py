@@ -0,0 +1,142 @@
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from components.RenderScheduler import RenderScheduler
+from components.SyncBus import SyncBus
+
+
+class StubPlane:
+    def __init__(self, orientation):
+        self.normal = tuple(1.0 if axis == orientation else 0.0 for axis in range(3))
+
+    def GetNormal(self):
+        return self.normal
+
+
+class StubResliceCursor:
+    def __init__(self):
+        self.center = [0.0, 0.0, 0.0]
+
+    def GetCenter(self):
+        return tuple(self.center)
+
+    def SetCenter(self, center):
+        self.center = list(center)
+
+    def Update(self):
+        pass
+
+    def GetPlane(self, orientation):
+        return StubPlane(orientation)
+
+
+class StubSlider:
+    def __init__(self):
+        self.position = 0
+        self.blocked = False
+
+    def value(self):
+        return self.position
+
+    def setValue(self, value):
+        assert self.blocked, "sliders are moved with their signals blocked"
+        self.position = value
+
+    def blockSignals(self, blocked):
+        self.blocked = blocked
+
+
+class StubCommandSliceSelect:
+    def __init__(self):
+        self.imagePlaneWidgets = [None, None, None]
+        self.resliceCursorWidgets = [None, None, None]
+        self.sliders = [StubSlider(), StubSlider(), StubSlider()]
+
+
+class StubVtkBase:
+    def __init__(self):
+        self.resliceCursor = StubResliceCursor()
+        self.commandSliceSelect = StubCommandSliceSelect()
+
+
+class StubViewer:
+    """A view whose update echoes a cursor change back to the bus, like the reslice widget does."""
+
+    def __init__(self, orientation):
+        self.orientation = orientation
+        self.renderWindow = object()
+        self.syncBus = None
+        self.syncs = 0
+
+    def update(self):
+        pass
+
+    def sync_to_cursor(self):
+        self.syncs += 1
+        self.syncBus.cursor_changed()
+
+
+class StubScheduler:
+    def __init__(self):
+        self.requests = []
+
+    def request(self, renderWindow):
+        self.requests.append(renderWindow)
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    scheduler = StubScheduler()
+    monkeypatch.setattr(RenderScheduler, '_default', scheduler)
+    bus = SyncBus(StubVtkBase())
+    for orientation in range(3):
+        bus.add_viewer(StubViewer(orientation))
+    bus.scheduler = scheduler
+    return bus
+
+
+def test_each_change_outside_a_transaction_commits_once(bus):
+    changes = 20
+    for index in range(changes):
+        bus.set_slice(2, float(index + 1))
+
+    stats = bus.stats()
+    assert stats['changes'] - stats['reentrant'] == changes
+    assert stats['commits'] == changes
+    # One render request per window for each change, however many views echo it
+    assert stats['render_requests'] == changes * len(bus.viewers)
+    assert len(bus.scheduler.requests) == changes * len(bus.viewers)
+    assert bus.commandSliceSelect.sliders[2].value() == changes
+
+
+def test_changes_inside_a_transaction_commit_once(bus):
+    changes = 50
+    with bus.transaction():
+        for index in range(changes):
+            bus.set_slice(index % 3, float(index))
+            bus.cursor_changed()
+
+    stats = bus.stats()
+    assert stats['commits'] == 1
+    assert stats['render_requests'] == len(bus.viewers)
+    assert set(bus.scheduler.requests) == {viewer.renderWindow for viewer in bus.viewers}
+
+
+def test_echoes_from_views_are_not_recommitted(bus):
+    bus.set_slice(0, 5.0)
+
+    stats = bus.stats()
+    updated = sum(viewer.syncs for viewer in bus.viewers)
+    assert updated == stats['viewer_updates'] > 0
+    # Every view that was updated echoed a change; none of them caused another commit
+    assert stats['reentrant'] == updated
+    assert stats['commits'] == 1
+    assert stats['render_requests_per_change'] == len(bus.viewers) / stats['changes']
+
+
+def test_unchanged_planes_are_not_redrawn(bus):
+    bus.set_slice(2, 3.0)
+    first = [viewer.syncs for viewer in bus.viewers]
+    bus.set_slice(2, 3.0)
+    assert [viewer.syncs for viewer in bus.viewers] == first
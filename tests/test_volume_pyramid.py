@@ -0,0 +1,25 @@
+import numpy as np
+
+from utils.VolumePyramid import downsample_geometry
+
+
+def test_coarse_voxel_centre_on_fine_block_centre_with_flipped_rows():
+    # Stored DICOM geometry: rows flipped, so the Y direction column is negated
+    geometry = {
+        'spacing': (0.7, 0.8, 2.5),
+        'origin': (-120.0, 95.0, 30.0),
+        'direction': (1.0, 0.0, 0.0, 0.0, -1.0, 0.0, 0.0, 0.0, 1.0),
+    }
+    spacing = np.asarray(geometry['spacing'])
+    origin = np.asarray(geometry['origin'])
+
+    for factor in (2, 4, 8):
+        coarse = downsample_geometry(geometry, factor)
+        for index in ((0, 0, 0), (1, 2, 3)):
+            index = np.asarray(index, dtype=np.float64)
+            # VTK places voxels at origin + index * spacing
+            coarse_centre = np.asarray(coarse['origin']) + index * np.asarray(coarse['spacing'])
+            block = index * factor + np.arange(factor)[:, None]
+            fine_centre = (origin + block * spacing).mean(axis=0)
+            np.testing.assert_allclose(coarse_centre, fine_centre)
+        assert coarse['direction'] == geometry['direction']
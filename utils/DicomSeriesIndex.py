@@ -0,0 +1,331 @@
+"""
+Persistent index of DICOM headers, stored in SQLite under the cache directory.
+
+Each file is keyed by its path and invalidated by (mtime, size), so reopening
+a folder only reparses files that are new or changed since the last scan.
+Files are grouped into series by SeriesInstanceUID.
+"""
+
+import json
+import os
+import sqlite3
+import struct
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import numpy as np
+
+from .cache import get_cache_dir
+
+# One indexed image file.
+# position: coordinate along the slice normal (None if the header has no geometry)
+# dtype: numpy dtype string of the stored pixels (None if not readable raw)
+# pixel_offset / pixel_length: byte range of raw pixel data (None if it must go through pydicom)
+IndexedSlice = namedtuple("IndexedSlice", [
+    "path", "series_uid", "instance_number", "position",
+    "image_position", "image_orientation", "pixel_spacing", "slice_thickness",
+    "rows", "cols", "dtype", "pixel_offset", "pixel_length",
+    "rescale_slope", "rescale_intercept", "transfer_syntax",
+    "patient_id", "series_description", "slice_location", "modality",
+])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    series_uid TEXT,
+    instance_number INTEGER,
+    position REAL,
+    image_position TEXT,
+    image_orientation TEXT,
+    pixel_spacing TEXT,
+    slice_thickness REAL,
+    rows INTEGER,
+    cols INTEGER,
+    dtype TEXT,
+    pixel_offset INTEGER,
+    pixel_length INTEGER,
+    rescale_slope REAL,
+    rescale_intercept REAL,
+    transfer_syntax TEXT,
+    patient_id TEXT,
+    series_description TEXT,
+    slice_location REAL,
+    modality TEXT
+);
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+"""
+
+_PIXEL_DATA_TAG = 0x7FE00010
+
+
+def _to_json(value):
+    return None if value is None else json.dumps([float(v) for v in value])
+
+
+def _from_json(value):
+    return None if value is None else tuple(json.loads(value))
+
+
+def _pixel_dtype(dcm):
+    """Numpy dtype string of the stored pixels, None if not a single-sample image."""
+    if int(getattr(dcm, "SamplesPerPixel", 1)) != 1:
+        return None
+    bits = int(getattr(dcm, "BitsAllocated", 0))
+    if bits not in (8, 16, 32):
+        return None
+    kind = "i" if int(getattr(dcm, "PixelRepresentation", 0)) == 1 else "u"
+    order = "<" if dcm.file_meta.TransferSyntaxUID.is_little_endian else ">"
+    return f"{order}{kind}{bits // 8}"
+
+
+def _pixel_data_range(fp, dcm):
+    """
+    Byte range of uncompressed pixel data, fp being positioned on the Pixel Data tag.
+
+    Returns:
+        tuple: (offset, length), or (None, None) for encapsulated/unknown data
+    """
+    syntax = dcm.file_meta.TransferSyntaxUID
+    if syntax.is_compressed:
+        return None, None
+
+    offset = fp.tell()
+    endian = "<" if syntax.is_little_endian else ">"
+    header = fp.read(12)
+    if len(header) < 8:
+        return None, None
+
+    group, element = struct.unpack(endian + "HH", header[:4])
+    if (group << 16 | element) != _PIXEL_DATA_TAG:
+        return None, None
+
+    if syntax.is_implicit_VR:
+        length = struct.unpack(endian + "I", header[4:8])[0]
+        value_offset = offset + 8
+    else:
+        length = struct.unpack(endian + "I", header[8:12])[0]
+        value_offset = offset + 12
+
+    if length == 0xFFFFFFFF:
+        return None, None
+    return value_offset, length
+
+
+def _parse_file(path):
+    """
+    Parse the header of one file into a row for the index.
+
+    Returns:
+        dict: Column values (series_uid is None for non-image files)
+    """
+    import pydicom
+
+    row = {"path": path, "series_uid": None}
+    try:
+        with open(path, "rb") as fp:
+            dcm = pydicom.dcmread(fp, stop_before_pixels=True)
+            if not hasattr(dcm, "Rows") or not hasattr(dcm, "Columns"):
+                return row
+            pixel_offset, pixel_length = _pixel_data_range(fp, dcm)
+    except Exception:
+        return row
+
+    # Signed data with unused high bits needs pydicom's sign handling, not a raw read
+    if int(getattr(dcm, "PixelRepresentation", 0)) == 1 and \
+            int(getattr(dcm, "BitsStored", 0)) != int(getattr(dcm, "BitsAllocated", 0)):
+        pixel_offset, pixel_length = None, None
+
+    ipp = getattr(dcm, "ImagePositionPatient", None)
+    iop = getattr(dcm, "ImageOrientationPatient", None)
+    position = None
+    if ipp is not None and iop is not None and len(iop) == 6:
+        normal = np.cross(np.asarray(iop[:3], dtype=np.float64), np.asarray(iop[3:], dtype=np.float64))
+        position = float(np.dot(normal, np.asarray(ipp, dtype=np.float64)))
+
+    instance_number = getattr(dcm, "InstanceNumber", None)
+    slice_location = getattr(dcm, "SliceLocation", None)
+    slice_thickness = getattr(dcm, "SliceThickness", None)
+
+    row.update({
+        "series_uid": str(getattr(dcm, "SeriesInstanceUID", "")) or "unknown",
+        "instance_number": int(instance_number) if instance_number is not None else None,
+        "position": position,
+        "image_position": _to_json(ipp),
+        "image_orientation": _to_json(iop),
+        "pixel_spacing": _to_json(getattr(dcm, "PixelSpacing", None)),
+        "slice_thickness": float(slice_thickness) if slice_thickness is not None else None,
+        "rows": int(dcm.Rows),
+        "cols": int(dcm.Columns),
+        "dtype": _pixel_dtype(dcm),
+        "pixel_offset": pixel_offset,
+        "pixel_length": pixel_length,
+        "rescale_slope": float(getattr(dcm, "RescaleSlope", 1.0)),
+        "rescale_intercept": float(getattr(dcm, "RescaleIntercept", 0.0)),
+        "transfer_syntax": str(dcm.file_meta.TransferSyntaxUID),
+        "patient_id": str(getattr(dcm, "PatientID", "Unknown")),
+        "series_description": str(getattr(dcm, "SeriesDescription", "Unknown")),
+        "slice_location": float(slice_location) if slice_location is not None else None,
+        "modality": str(getattr(dcm, "Modality", "")),
+    })
+    return row
+
+
+class DicomSeriesIndex:
+    """
+    SQLite-backed index of DICOM file headers grouped by series.
+
+    Usage:
+        index = DicomSeriesIndex()
+        series = index.get_series("/data/study")   # {series_uid: [IndexedSlice, ...]}
+    """
+
+    def __init__(self, db_path=None, max_workers=None):
+        """
+        Args:
+            db_path (str): SQLite file (defaults to <cache dir>/dicom_index.sqlite)
+            max_workers (int): Threads used to parse new or changed headers
+        """
+        self.db_path = str(db_path) if db_path else str(get_cache_dir() / "dicom_index.sqlite")
+        self.max_workers = max_workers or min(32, os.cpu_count() or 1)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the index usable from worker threads
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def update(self, folder_path, progress=None, cancelled=None):
+        """
+        Bring the index for a folder up to date.
+
+        Headers parsed before a cancel are still stored, so the next scan
+        only parses the rest.
+
+        Args:
+            folder_path (str): Folder to scan (not recursive)
+            progress (callable): Called as progress(done, total) while parsing headers
+            cancelled (callable): Returns True to abort (raises LoadCancelled)
+
+        Returns:
+            dict: Counts of 'parsed', 'unchanged' and 'removed' files
+        """
+        folder = os.path.abspath(folder_path)
+        on_disk = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    on_disk[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+        with self._connect() as conn:
+            known = {row["path"]: (row["mtime_ns"], row["size"])
+                     for row in conn.execute("SELECT path, mtime_ns, size FROM files WHERE folder = ?", (folder,))}
+
+            removed = [path for path in known if path not in on_disk]
+            stale = [path for path, stamp in on_disk.items() if known.get(path) != stamp]
+
+            if removed:
+                conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+
+        if stale:
+            # Parsed outside the transaction, so the headers read before a cancel are kept
+            rows = []
+            try:
+                self._parse_files(stale, rows, progress, cancelled)
+            finally:
+                self._store_rows(folder, rows, on_disk)
+
+        return {"parsed": len(stale), "unchanged": len(on_disk) - len(stale), "removed": len(removed)}
+
+    def _parse_files(self, paths, rows, progress=None, cancelled=None):
+        """
+        Parse headers on the thread pool, appending each row to ``rows`` as it completes.
+
+        Raises:
+            LoadCancelled: When ``cancelled()`` turns True (``rows`` keeps the headers parsed so far)
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(_parse_file, path) for path in paths}
+            while futures:
+                finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+                rows.extend(future.result() for future in finished)
+                if progress is not None:
+                    progress(len(rows), len(paths))
+                if futures and cancelled is not None and cancelled():
+                    from .helpers import LoadCancelled
+
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise LoadCancelled()
+
+    def _store_rows(self, folder, rows, on_disk):
+        """Insert or replace parsed rows, stamped with the (mtime, size) they were parsed at."""
+        if not rows:
+            return
+        for row in rows:
+            row["folder"] = folder
+            row["mtime_ns"], row["size"] = on_disk[row["path"]]
+        columns = list(IndexedSlice._fields) + ["folder", "mtime_ns", "size"]
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO files ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(row.get(c) for c in columns) for row in rows])
+
+    def get_series(self, folder_path, refresh=True, progress=None, cancelled=None):
+        """
+        Return the image files of a folder grouped by series and sorted in slice order.
+
+        Slices are ordered by position along the slice normal, then instance
+        number, then path.
+
+        Args:
+            folder_path (str): Folder to query
+            refresh (bool): Rescan the folder for new/changed files first
+            progress (callable): Called as progress(done, total) while parsing headers
+            cancelled (callable): Returns True to abort the rescan (raises LoadCancelled)
+
+        Returns:
+            dict: {SeriesInstanceUID: list of IndexedSlice}, largest series first
+        """
+        folder = os.path.abspath(folder_path)
+        if refresh:
+            self.update(folder, progress=progress, cancelled=cancelled)
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(IndexedSlice._fields)} FROM files "
+                "WHERE folder = ? AND series_uid IS NOT NULL", (folder,)).fetchall()
+
+        series = {}
+        for row in rows:
+            entry = IndexedSlice(**dict(row))
+            entry = entry._replace(
+                image_position=_from_json(entry.image_position),
+                image_orientation=_from_json(entry.image_orientation),
+                pixel_spacing=_from_json(entry.pixel_spacing),
+            )
+            series.setdefault(entry.series_uid, []).append(entry)
+
+        for entries in series.values():
+            entries.sort(key=lambda e: (e.position is None, e.position or 0.0,
+                                        e.instance_number is None, e.instance_number or 0, e.path))
+
+        return dict(sorted(series.items(), key=lambda item: -len(item[1])))
+
+    def clear(self, folder_path=None):
+        """Forget one folder, or the whole index if folder_path is None."""
+        with self._connect() as conn:
+            if folder_path is None:
+                conn.execute("DELETE FROM files")
+            else:
+                conn.execute("DELETE FROM files WHERE folder = ?", (os.path.abspath(folder_path),))
@@ -0,0 +1,211 @@
+"""
+Summed-volume tables of a volume, for constant-time box statistics.
+
+The tables hold, at (z, y, x), the sum of the values (and of their squares)
+over the box [0, z) × [0, y) × [0, x), so the sum over any box is eight
+lookups whatever its size. Minimum and maximum come from a grid of per-block
+extremes plus a scan of the partial blocks on the box's faces. Tables are
+built once per study, a slice at a time, on a background thread:
+
+    integral = IntegralVolume(volume, spacing)
+    integral.build_async()
+    stats = integral.stats((i0, i1, j0, j1, k0, k1))   # None until built
+
+Memory: two 8-byte tables of the volume's size (16 bytes per voxel, see
+table_nbytes), about 8 GB for a 2000×512×512 CT. With ``storage_dir`` the
+tables are memory-mapped temporary files there instead of RAM, so the
+operating system pages them out; a lookup touches eight table entries.
+"""
+
+import tempfile
+import threading
+
+import numpy as np
+
+
+def table_nbytes(shape):
+    """Bytes taken by the summed-volume tables of a (Z, Y, X) volume."""
+    depth, height, width = shape
+    return 2 * 8 * (depth + 1) * (height + 1) * (width + 1)
+
+
+def region_stats(region, spacing=(1.0, 1.0, 1.0)):
+    """
+    Statistics of a region by a direct pass over its voxels (no tables).
+
+    Args:
+        region (np.ndarray): (Z, Y, X) view of the voxels
+        spacing (tuple): (x, y, z) voxel spacing in mm
+
+    Returns:
+        dict: Same keys as IntegralVolume.stats, or None for an empty region
+    """
+    if region.size == 0:
+        return None
+    return {
+        'count': region.size,
+        'mean': float(region.mean(dtype=np.float64)),
+        'std': float(region.std(dtype=np.float64)),
+        'min': region.min().item(),
+        'max': region.max().item(),
+        'volume_ml': region.size * spacing[0] * spacing[1] * spacing[2] / 1000.0,
+    }
+
+
+class IntegralVolume:
+    """
+    Summed-volume tables (sum and sum of squares) and block extremes of one volume.
+    """
+
+    def __init__(self, volume, spacing=(1.0, 1.0, 1.0), block=16, storage_dir=None):
+        """
+        Args:
+            volume (np.ndarray): (Z, Y, X) volume
+            spacing (tuple): (x, y, z) voxel spacing in mm
+            block (int): Edge of the blocks whose minimum/maximum are precomputed
+            storage_dir (str): Directory of disk-backed tables (None keeps them in memory)
+        """
+        self.volume = volume
+        self.spacing = tuple(float(s) for s in spacing)
+        self.block = block
+        self.storage_dir = storage_dir
+        # Exact integer sums for integer volumes
+        self.dtype = np.int64 if np.issubdtype(volume.dtype, np.integer) else np.float64
+
+        self.sums = None
+        self.squares = None
+        self.blockMin = None
+        self.blockMax = None
+        self._cancelEvent = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.blockMax is not None
+
+    def build(self, on_ready=None):
+        """
+        Compute the tables on the calling thread.
+
+        Args:
+            on_ready (callable): Called without arguments once the tables are
+                                 built (from the building thread)
+        """
+        depth, height, width = self.volume.shape
+        sums = self.allocate_table((depth + 1, height + 1, width + 1))
+        squares = self.allocate_table(sums.shape)
+        for z in range(depth):
+            if self._cancelEvent.is_set():
+                return
+            plane = self.volume[z].astype(self.dtype)
+            # 2D prefix sums of the slice, added to the table of the slices before it
+            np.add(sums[z, 1:, 1:], plane.cumsum(axis=0).cumsum(axis=1), out=sums[z + 1, 1:, 1:])
+            np.multiply(plane, plane, out=plane)
+            np.add(squares[z, 1:, 1:], plane.cumsum(axis=0).cumsum(axis=1), out=squares[z + 1, 1:, 1:])
+
+        b = self.block
+        rows, columns = np.arange(0, height, b), np.arange(0, width, b)
+        blockMin, blockMax = [], []
+        for z0 in range(0, depth, b):
+            if self._cancelEvent.is_set():
+                return
+            chunk = self.volume[z0:z0 + b]
+            for reduce, out in ((np.minimum, blockMin), (np.maximum, blockMax)):
+                planes = reduce.reduce(chunk, axis=0)
+                out.append(reduce.reduceat(reduce.reduceat(planes, rows, axis=0), columns, axis=1))
+
+        self.sums, self.squares = sums, squares
+        self.blockMin = np.stack(blockMin)
+        self.blockMax = np.stack(blockMax)
+        if on_ready is not None:
+            on_ready()
+
+    def allocate_table(self, shape):
+        """Zeroed table in memory, or memory-mapped on a temporary file under storage_dir."""
+        if self.storage_dir is None:
+            return np.zeros(shape, dtype=self.dtype)
+        # Removed by the OS once closed (on POSIX as soon as it is created); the map keeps it open
+        backing = tempfile.TemporaryFile(dir=self.storage_dir, prefix="integral-")
+        return np.memmap(backing, dtype=self.dtype, mode='w+', shape=shape)
+
+    def build_async(self, on_ready=None):
+        """Start building the tables on a daemon thread."""
+        self._thread = threading.Thread(target=self.build, args=(on_ready,), daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def cancel(self):
+        """Stop a background build."""
+        self._cancelEvent.set()
+
+    def wait(self, timeout=None):
+        """Wait for a background build to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # Sum of a table over the box [z0, z1) × [y0, y1) × [x0, x1)
+    @staticmethod
+    def box_sum(table, z0, z1, y0, y1, x0, x1):
+        return (table[z1, y1, x1] - table[z0, y1, x1] - table[z1, y0, x1] - table[z1, y1, x0]
+                + table[z0, y0, x1] + table[z0, y1, x0] + table[z1, y0, x0] - table[z0, y0, x0])
+
+    # Minimum and maximum over a box: whole blocks from the block grid, the rest scanned
+    def box_extremes(self, z0, z1, y0, y1, x0, x1):
+        b = self.block
+        # Blocks lying entirely inside the box
+        bz0, by0, bx0 = -(-z0 // b), -(-y0 // b), -(-x0 // b)
+        bz1, by1, bx1 = z1 // b, y1 // b, x1 // b
+        if bz0 >= bz1 or by0 >= by1 or bx0 >= bx1:
+            region = self.volume[z0:z1, y0:y1, x0:x1]
+            return region.min(), region.max()
+
+        low = [self.blockMin[bz0:bz1, by0:by1, bx0:bx1].min()]
+        high = [self.blockMax[bz0:bz1, by0:by1, bx0:bx1].max()]
+        iz0, iz1, iy0, iy1, ix0, ix1 = bz0 * b, bz1 * b, by0 * b, by1 * b, bx0 * b, bx1 * b
+        # The box minus its block-aligned core: slabs before/after the core along each axis
+        shell = (
+            (slice(z0, iz0), slice(y0, y1), slice(x0, x1)),
+            (slice(iz1, z1), slice(y0, y1), slice(x0, x1)),
+            (slice(iz0, iz1), slice(y0, iy0), slice(x0, x1)),
+            (slice(iz0, iz1), slice(iy1, y1), slice(x0, x1)),
+            (slice(iz0, iz1), slice(iy0, iy1), slice(x0, ix0)),
+            (slice(iz0, iz1), slice(iy0, iy1), slice(ix1, x1)),
+        )
+        for region in shell:
+            region = self.volume[region]
+            if region.size:
+                low.append(region.min())
+                high.append(region.max())
+        return min(low), max(high)
+
+    def stats(self, extent):
+        """
+        Statistics of the voxels in an extent.
+
+        Args:
+            extent (tuple): (i0, i1, j0, j1, k0, k1) inclusive voxel indices along x, y, z
+
+        Returns:
+            dict: count, mean, std, min, max and volume_ml, or None until the tables are built
+        """
+        if not self.ready:
+            return None
+        i0, i1, j0, j1, k0, k1 = extent
+        box = (k0, k1 + 1, j0, j1 + 1, i0, i1 + 1)
+        count = (k1 - k0 + 1) * (j1 - j0 + 1) * (i1 - i0 + 1)
+        if count <= 0:
+            return None
+
+        total = self.box_sum(self.sums, *box).item()
+        totalSquares = self.box_sum(self.squares, *box).item()
+        # n·Σx² − (Σx)² is exact in Python integers for integer volumes
+        variance = max(count * totalSquares - total * total, 0) / (count * count)
+        low, high = self.box_extremes(*box)
+        return {
+            'count': count,
+            'mean': total / count,
+            'std': float(np.sqrt(variance)),
+            'min': low.item(),
+            'max': high.item(),
+            'volume_ml': count * self.spacing[0] * self.spacing[1] * self.spacing[2] / 1000.0,
+        }
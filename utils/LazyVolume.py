@@ -0,0 +1,164 @@
+"""
+Read-only 3D volume that decodes DICOM slices on first access.
+
+Decoded slices are kept in a bounded LRU, so memory stays capped whatever
+the length of the series, while numpy-style indexing works as usual:
+
+    volume = LazyVolume.from_folder("/data/study")
+    middle = volume[len(volume) // 2]     # decodes one file
+    coronal = volume[:, 256, :]           # streams every slice through the LRU
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .helpers import decode_dicom_slice, select_dicom_series, series_dtype
+
+
+class LazyVolume:
+    """
+    (Z, H, W) volume backed by a sorted list of indexed DICOM files.
+    """
+
+    def __init__(self, entries, dtype=None, cache_bytes=256 * 1024 ** 2, flip_rows=False):
+        """
+        Args:
+            entries (list): Sorted IndexedSlice entries of one series
+            dtype: Output dtype, or None for the series' native dtype after rescale
+            cache_bytes (int): Memory budget for decoded slices
+            flip_rows (bool): Store rows bottom-up (VTK image convention)
+        """
+        if not entries:
+            raise ValueError("LazyVolume needs at least one slice")
+
+        self.entries = list(entries)
+        self.dtype = series_dtype(self.entries) if dtype is None else np.dtype(dtype)
+        self.flip_rows = flip_rows
+        self.shape = (len(self.entries), self.entries[0].rows, self.entries[0].cols)
+        self.ndim = 3
+
+        slice_bytes = self.shape[1] * self.shape[2] * self.dtype.itemsize
+        self.max_cached_slices = max(1, cache_bytes // slice_bytes)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_folder(cls, folder_path, series_uid=None, **kwargs):
+        """
+        Open a DICOM folder lazily through the persistent series index.
+
+        Args:
+            folder_path (str): Path to folder containing DICOM files
+            series_uid (str): Series to open (defaults to the largest series)
+            **kwargs: Passed to the constructor
+
+        Returns:
+            LazyVolume: Volume over the chosen series
+        """
+        entries = select_dicom_series(folder_path, series_uid=series_uid)
+        if not entries:
+            raise ValueError(f"No DICOM images found in {folder_path}")
+        return cls(entries, **kwargs)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for z in range(len(self)):
+            yield self.get_slice(z)
+
+    @property
+    def nbytes(self):
+        """Size of the fully decoded volume (not what is resident)."""
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    @property
+    def filenames(self):
+        return [entry.path for entry in self.entries]
+
+    def get_slice(self, z):
+        """
+        Return slice ``z``, decoding it if it is not cached.
+
+        Args:
+            z (int): Slice index (negative indices allowed)
+
+        Returns:
+            np.ndarray: Read-only (H, W) array
+        """
+        z = int(z)
+        if z < 0:
+            z += len(self)
+        if not 0 <= z < len(self):
+            raise IndexError(f"slice index {z} out of range for {len(self)} slices")
+
+        with self._lock:
+            cached = self._cache.get(z)
+            if cached is not None:
+                self._cache.move_to_end(z)
+                self.hits += 1
+                return cached
+
+        # Decode outside the lock so other threads can read cached slices meanwhile
+        pixels = np.empty(self.shape[1:], dtype=self.dtype)
+        decode_dicom_slice(self.entries[z], pixels, flip_rows=self.flip_rows)
+        pixels.flags.writeable = False
+
+        with self._lock:
+            self.misses += 1
+            self._cache[z] = pixels
+            self._cache.move_to_end(z)
+            while len(self._cache) > self.max_cached_slices:
+                self._cache.popitem(last=False)
+        return pixels
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            i = key.index(Ellipsis)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + key[i + 1:]
+        if len(key) > self.ndim:
+            raise IndexError(f"too many indices for a {self.ndim}-dimensional volume")
+
+        z_key, rest = key[0], key[1:]
+        if isinstance(z_key, (int, np.integer)):
+            return self.get_slice(z_key)[rest]
+
+        z_indices = np.arange(len(self))[z_key]
+        part_shape = np.empty(self.shape[1:], dtype=np.bool_)[rest].shape
+
+        # Copy each part out so only the LRU keeps decoded slices alive
+        out = np.empty((len(z_indices),) + part_shape, dtype=self.dtype)
+        for i, z in enumerate(z_indices):
+            out[i] = self.get_slice(z)[rest]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        volume = self[:]
+        return volume if dtype is None else volume.astype(dtype, copy=False)
+
+    def clear_cache(self):
+        """Drop every decoded slice."""
+        with self._lock:
+            self._cache.clear()
+
+    def cache_info(self):
+        """
+        Returns:
+            dict: hits, misses, number of cached slices and their size in bytes
+        """
+        with self._lock:
+            cached = len(self._cache)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached_slices': cached,
+            'max_cached_slices': self.max_cached_slices,
+            'cached_bytes': cached * self.shape[1] * self.shape[2] * self.dtype.itemsize,
+        }
@@ -0,0 +1,61 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+import threading
+
+from components.VolumeStore import VolumeStore
+from utils.helpers import LoadCancelled
+
+
+class LoadWorker(QObject):
+    """
+    Opens a study through the VolumeStore off the GUI thread.
+
+    Signals are queued to the GUI thread; the worker itself never touches widgets.
+    """
+    progress = pyqtSignal(int, str)     # percent, message
+    preview = pyqtSignal(object)        # middle slice, then coarse StoredVolume
+    finished = pyqtSignal(object)       # full StoredVolume
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, path:str, store:VolumeStore=None):
+        super().__init__()
+        self.path = path
+        self.store = store or VolumeStore.default()
+        self._cancelEvent = threading.Event()
+        self._lastPercent = -1
+
+    # Open the study (runs on the worker thread)
+    def run(self):
+        try:
+            volume = self.store.open(self.path,
+                                     progress=self._on_progress,
+                                     cancelled=self._cancelEvent.is_set,
+                                     on_preview=self.preview.emit)
+        except LoadCancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            print(e)
+            self.failed.emit(str(e))
+            return
+
+        if self._cancelEvent.is_set():
+            self.cancelled.emit()
+        else:
+            # One pass over the voxels here, so window/level and display normalization never rescan them
+            volume.histogram
+            self.finished.emit(volume)
+
+    # Request the load to stop (safe from any thread)
+    def cancel(self):
+        self._cancelEvent.set()
+
+    def is_cancelled(self):
+        return self._cancelEvent.is_set()
+
+    def _on_progress(self, done, total):
+        # Only emit when the percentage changes, not for every slice
+        percent = int(100 * done / max(total, 1))
+        if percent != self._lastPercent:
+            self._lastPercent = percent
+            self.progress.emit(percent, f"Loading {done}/{total}")
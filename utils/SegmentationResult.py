@@ -0,0 +1,210 @@
+"""
+Segmentation of a volume kept as one label volume plus per-slice metadata.
+
+The detectors used to return one full-size uint8 mask per organ and slice;
+this keeps the label volume itself (uint8/uint16) and, per slice, only the
+labels present, their pixel counts and bounding boxes. It still reads like
+the old list of per-slice dicts, but the 'masks' of a slice are made when
+an organ is looked up, and run-length encoded masks are produced on demand
+for export:
+
+    result = SegmentationResult(seg_array, filenames, ORGAN_LABELS)
+    result[12]['organs']                 # organ names in slice 12
+    result[12]['bboxes']['liver']        # (y0, y1, x0, x1), inclusive
+    mask = result[12]['masks']['liver']  # uint8 mask of one slice, made now
+    rle = result.mask_rle(12, 'liver')   # {'size': [h, w], 'counts': [...]}
+"""
+
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+import numpy as np
+
+
+def compact_labels(labels):
+    """
+    Labels in the smallest unsigned dtype holding them (uint8 or uint16).
+
+    Args:
+        labels (np.ndarray): Integer labels, 0 for background
+
+    Returns:
+        np.ndarray: The array itself when already uint8/uint16, else a converted copy
+    """
+    labels = np.asarray(labels)
+    if labels.dtype in (np.uint8, np.uint16):
+        return labels
+    high = int(labels.max()) if labels.size else 0
+    if (labels.size and int(labels.min()) < 0) or high > np.iinfo(np.uint16).max:
+        raise ValueError("Labels must be in [0, 65535]")
+    return labels.astype(np.uint8 if high <= np.iinfo(np.uint8).max else np.uint16)
+
+
+def rle_encode(mask):
+    """
+    Run-length encode a 2D mask.
+
+    Args:
+        mask (np.ndarray): 2D mask (non-zero is foreground)
+
+    Returns:
+        dict: 'size' [height, width] and 'counts', the lengths of the alternating
+              background/foreground runs in row-major order, starting with background
+    """
+    flat = np.asarray(mask).ravel() != 0
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size]))).tolist()
+    if flat.size and flat[0]:
+        counts.insert(0, 0)
+    return {'size': list(np.shape(mask)), 'counts': counts}
+
+
+def rle_decode(rle):
+    """Decode an rle_encode mask back to a uint8 array."""
+    counts = np.asarray(rle['counts'], dtype=np.int64)
+    values = (np.arange(len(counts)) % 2).astype(np.uint8)
+    return np.repeat(values, counts).reshape(rle['size'])
+
+
+class SliceMasks(Mapping):
+    """
+    Organ masks of one slice, computed from the label volume when looked up.
+    """
+
+    def __init__(self, result, slice_index, organs):
+        self.result = result
+        self.sliceIndex = slice_index
+        self.organs = organs
+
+    def __getitem__(self, organ):
+        if organ not in self.organs:
+            raise KeyError(organ)
+        return self.result.mask(self.sliceIndex, organ)
+
+    def __iter__(self):
+        return iter(self.organs)
+
+    def __len__(self):
+        return len(self.organs)
+
+
+class SegmentationResult(Sequence):
+    """
+    Label volume of a segmentation with per-slice organ metadata.
+    """
+
+    def __init__(self, labels, filenames=None, label_names=None):
+        """
+        Args:
+            labels (np.ndarray): (Z, H, W) integer labels, 0 for background
+            filenames (list): Name of each slice (defaults to slice_0000, ...)
+            label_names (dict): {label: organ name}; other labels are named 'structure_<label>'
+        """
+        self.labels = compact_labels(labels)
+        self.filenames = list(filenames) if filenames is not None else [
+            f"slice_{i:04d}" for i in range(len(self.labels))]
+        self.labelNames = dict(label_names or {})
+        self.labelValues = {name: label for label, name in self.labelNames.items()}
+        self.slices = [self.describe_slice(index) for index in range(len(self.labels))]
+
+    def __len__(self):
+        return len(self.slices)
+
+    def __getitem__(self, index):
+        return self.slices[index]
+
+    # Organ name of a label value, and back
+    def organ_name(self, label):
+        return self.labelNames.get(int(label), f"structure_{int(label)}")
+
+    def organ_label(self, organ):
+        if organ in self.labelValues:
+            return self.labelValues[organ]
+        return int(organ.rsplit('_', 1)[-1])
+
+    def describe_slice(self, index):
+        """
+        Metadata of one slice, from one pass over its labelled pixels.
+
+        Returns:
+            dict: filename, slice_index, organs, num_organs, labels, pixel_counts,
+                  bboxes ((y0, y1, x0, x1) inclusive), masks (lazy) and confidence
+        """
+        plane = self.labels[index]
+        flat = plane.ravel()
+        pixels = np.flatnonzero(flat)
+
+        # Labelled pixels grouped by label; each group's first position and extremes
+        values = flat[pixels]
+        order = np.argsort(values, kind='stable')
+        values, pixels = values[order], pixels[order]
+        starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1]))) if values.size else pixels
+        labels = values[starts].tolist()
+        counts = np.diff(np.concatenate((starts, [values.size]))).tolist()
+
+        organs, bboxes = [], {}
+        if labels:
+            rows, columns = np.divmod(pixels, plane.shape[1])
+            extremes = zip(np.minimum.reduceat(rows, starts), np.maximum.reduceat(rows, starts),
+                           np.minimum.reduceat(columns, starts), np.maximum.reduceat(columns, starts))
+            for label, box in zip(labels, extremes):
+                organ = self.organ_name(label)
+                organs.append(organ)
+                bboxes[organ] = tuple(int(value) for value in box)
+
+        return {
+            'filename': self.filenames[index],
+            'slice_index': index,
+            'organs': organs,
+            'num_organs': len(organs),
+            'labels': labels,
+            'pixel_counts': dict(zip(organs, counts)),
+            'bboxes': bboxes,
+            'masks': SliceMasks(self, index, organs),
+            # TotalSegmentator gives no confidence: more structures found, higher score
+            'confidence': round(min(len(labels) / 10.0, 1.0), 3),
+        }
+
+    # Every organ found in the volume, in label order
+    def organs(self):
+        labels = sorted({label for info in self.slices for label in info['labels']})
+        return [self.organ_name(label) for label in labels]
+
+    # uint8 mask of one organ in one slice (flip_rows: rows bottom-up, e.g. back to DICOM row order)
+    def mask(self, slice_index, organ, flip_rows=False):
+        plane = self.labels[slice_index]
+        return ((plane[::-1] if flip_rows else plane) == self.organ_label(organ)).astype(np.uint8)
+
+    def export_masks(self, flip_rows=False):
+        """
+        Masks to save, made one at a time while they are written.
+
+        Args:
+            flip_rows (bool): Flip rows (stored volumes back to DICOM row order)
+
+        Yields:
+            dict: 'filename' (<slice stem>_<organ>) and 'mask' of each organ in each slice
+        """
+        for info in self.slices:
+            for organ in info['organs']:
+                yield {'filename': f"{Path(info['filename']).stem}_{organ}",
+                       'mask': self.mask(info['slice_index'], organ, flip_rows)}
+
+    # Run-length encoded mask of one organ in one slice (see rle_encode)
+    def mask_rle(self, slice_index, organ, flip_rows=False):
+        plane = self.labels[slice_index]
+        return rle_encode((plane[::-1] if flip_rows else plane) == self.organ_label(organ))
+
+    def to_rle(self, flip_rows=False):
+        """
+        Run-length encoded masks of every organ in every slice.
+
+        Args:
+            flip_rows (bool): Encode rows bottom-up (stored volumes in DICOM row order)
+
+        Returns:
+            dict: {filename: {organ: rle}} for the slices with organs
+        """
+        return {info['filename']: {organ: self.mask_rle(info['slice_index'], organ, flip_rows)
+                                   for organ in info['organs']}
+                for info in self.slices if info['organs']}
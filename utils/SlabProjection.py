@@ -0,0 +1,221 @@
+"""
+Thick-slab projections (MIP, MinIP, mean) of a volume along one axis.
+
+A slab is ``thickness`` consecutive slices centred on a slice index. The
+projection is kept between calls, so moving the slab by a few slices only
+reduces the planes that enter and leave it instead of the whole slab:
+
+    projector = SlabProjector(volume, axis=0, mode='mip')
+    image = projector.project(index=120, thickness=20)
+    image = projector.project(index=121)      # one plane in, one plane out
+
+Full reductions are split in row bands over a thread pool (numpy releases
+the GIL while reducing).
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MODES = ('mip', 'minip', 'mean')
+
+
+class SlabProjector:
+    """
+    Incremental slab projection of a (Z, Y, X) volume along one axis.
+    """
+
+    # Initial guess of the cost of gathering one voxel relative to streaming it
+    # in a full reduction; both costs are then measured as the projector runs
+    GATHER_COST = 8
+
+    def __init__(self, volume, axis=0, mode='mip', thickness=1, max_workers=None):
+        """
+        Args:
+            volume (np.ndarray): (Z, Y, X) volume (not modified)
+            axis (int): Projection axis: 0 (Z), 1 (Y) or 2 (X)
+            mode (str): 'mip', 'minip' or 'mean'
+            thickness (int): Slab thickness in slices
+            max_workers (int): Threads of full reductions (defaults to CPU count)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown slab mode: {mode}")
+        self.volume = volume
+        self.axis = axis
+        self.mode = mode
+        self.thickness = max(1, int(thickness))
+
+        # Slab axis first; a view, so nothing is copied for any axis
+        self._slices = np.moveaxis(volume, axis, 0)
+        self._range = None
+        self._acc = None
+        self._image = None
+
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(self.max_workers) if self.max_workers > 1 else None
+
+        # Measured seconds per voxel of full reductions and of gathers
+        self._fullCost = None
+        self._gatherCost = None
+        # Fraction of pixels that went stale at the last check, re-measured every few moves
+        self._staleFraction = 0.0
+        self._movesSinceCheck = 0
+
+        # Planes read by the last projection and counters, for profiling
+        self.planesRead = 0
+        self.fullCount = 0
+        self.incrementalCount = 0
+
+    def close(self):
+        """Stop the reduction threads."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def slab_range(self, index, thickness=None):
+        """
+        Slices covered by a slab, clipped to the volume.
+
+        Returns:
+            tuple: (start, stop) slice indices
+        """
+        thickness = max(1, int(thickness or self.thickness))
+        count = self._slices.shape[0]
+        start = int(index) - thickness // 2
+        start = min(max(0, start), max(0, count - thickness))
+        return start, min(count, start + thickness)
+
+    def project(self, index, thickness=None, mode=None):
+        """
+        Projection of the slab centred on a slice.
+
+        Args:
+            index (int): Centre slice index along the axis
+            thickness (int): New slab thickness (keeps the current one if None)
+            mode (str): New mode (keeps the current one if None)
+
+        Returns:
+            np.ndarray: 2D image, native dtype for 'mip'/'minip', float32 for 'mean'.
+                        Owned by the projector and overwritten by the next call.
+        """
+        if mode is not None and mode != self.mode:
+            if mode not in MODES:
+                raise ValueError(f"Unknown slab mode: {mode}")
+            self.mode = mode
+            self._range = None
+        if thickness is not None:
+            self.thickness = max(1, int(thickness))
+
+        new = self.slab_range(index)
+        if self._range is None:
+            self._full(*new)
+        elif new != self._range:
+            self._move(new)
+
+        if self.mode == 'mean':
+            np.divide(self._acc, new[1] - new[0], out=self._image, casting='unsafe')
+            return self._image
+        return self._acc
+
+    # Reduce a whole slab into the accumulator
+    def _full(self, start, stop):
+        plane = self._slices.shape[1:]
+        if self.mode == 'mean':
+            sumType = np.int64 if np.issubdtype(self.volume.dtype, np.integer) else np.float64
+            self._acc = np.empty(plane, dtype=sumType)
+            self._image = np.empty(plane, dtype=np.float32)
+        else:
+            self._acc = np.empty(plane, dtype=self.volume.dtype)
+            self._image = None
+
+        began = time.perf_counter()
+        rows = plane[0]
+        bands = min(self.max_workers, max(1, rows // 16)) if self._pool is not None else 1
+        edges = np.linspace(0, rows, bands + 1).astype(int)
+        tasks = [(edges[i], edges[i + 1]) for i in range(bands) if edges[i] < edges[i + 1]]
+        if len(tasks) > 1:
+            list(self._pool.map(lambda band: self._reduce_band(start, stop, *band), tasks))
+        else:
+            self._reduce_band(start, stop, 0, rows)
+        self._fullCost = (time.perf_counter() - began) / max(1, (stop - start) * self._acc.size)
+
+        self._range = (start, stop)
+        self.planesRead = stop - start
+        self.fullCount += 1
+
+    def _reduce_band(self, start, stop, row0, row1):
+        block = self._slices[start:stop, row0:row1]
+        out = self._acc[row0:row1]
+        if self.mode == 'mip':
+            np.maximum.reduce(block, axis=0, out=out)
+        elif self.mode == 'minip':
+            np.minimum.reduce(block, axis=0, out=out)
+        else:
+            np.add.reduce(block, axis=0, dtype=out.dtype, out=out)
+
+    # Update the accumulator from the current slab to another one
+    def _move(self, new):
+        start0, stop0 = self._range
+        start1, stop1 = new
+        overlap = min(stop0, stop1) - max(start0, start1)
+
+        removed = [i for i in range(start0, stop0) if not start1 <= i < stop1]
+        added = [i for i in range(start1, stop1) if not start0 <= i < stop0]
+        if overlap <= 0 or len(removed) + len(added) >= stop1 - start1:
+            # A jump: reading the new slab is no more work
+            self._full(start1, stop1)
+            return
+
+        acc = self._acc
+        if self.mode == 'mean':
+            for i in added:
+                np.add(acc, self._slices[i], out=acc, casting='unsafe')
+            for i in removed:
+                np.subtract(acc, self._slices[i], out=acc, casting='unsafe')
+            self.planesRead = len(added) + len(removed)
+        else:
+            gatherCost = self._gatherCost or self.GATHER_COST * self._fullCost
+            self._movesSinceCheck += 1
+            if self._movesSinceCheck < 16 and self._staleFraction * gatherCost > self._fullCost:
+                # Recent moves needed a full pass anyway: skip finding the stale pixels
+                self._full(start1, stop1)
+                return
+            self._movesSinceCheck = 0
+
+            # Pixels whose extreme leaves the slab are recomputed from the new slab only
+            stale = np.zeros(acc.shape, dtype=bool)
+            for i in removed:
+                stale |= self._slices[i] == acc
+            flat = np.flatnonzero(stale)
+            self._staleFraction = len(flat) / acc.size
+            if self._staleFraction * gatherCost > self._fullCost:
+                # Gathering that many scattered pixels is slower than a full pass
+                self._full(start1, stop1)
+                return
+
+            combine = np.maximum if self.mode == 'mip' else np.minimum
+            for i in added:
+                combine(acc, self._slices[i], out=acc)
+            self.planesRead = len(added) + len(removed)
+            if len(flat):
+                began = time.perf_counter()
+                reduce = np.max if self.mode == 'mip' else np.min
+                acc.reshape(-1)[flat] = reduce(self._gather(start1, stop1, flat), axis=0)
+                self._gatherCost = (time.perf_counter() - began) / (len(flat) * (stop1 - start1))
+                self.planesRead += len(flat) / acc.size * (stop1 - start1)
+
+        self._range = new
+        self.incrementalCount += 1
+
+    # Values of a few pixels (flat plane indices) through slices [start, stop), as (slices, pixels)
+    def _gather(self, start, stop, flat):
+        rows, cols = np.divmod(flat, self._slices.shape[2])
+        if not self.volume.flags.c_contiguous:
+            return self._slices[start:stop, rows, cols]
+        # Flat indices into the volume buffer: one take instead of 2D fancy indexing
+        strides = [stride // self.volume.itemsize for stride in self._slices.strides]
+        base = rows * strides[1] + cols * strides[2]
+        planes = np.arange(start, stop) * strides[0]
+        return np.take(self.volume.reshape(-1), planes[:, None] + base[None, :])
@@ -0,0 +1,172 @@
+"""
+Bounded LRU cache of windowed 2D slice images.
+
+Images are 8-bit slices already mapped through a window/level, keyed by
+(volume key, orientation, slice index, window, level), so
+showing a slice again costs a dictionary lookup instead of a reslice. The
+cache is limited by a memory budget; neighbouring slices in the scroll
+direction are rendered ahead of time on a background thread:
+
+    cache = SliceImageCache(max_bytes=256 * 2 ** 20)
+    image = cache.get_or_render(key, render)        # render(key) -> np.ndarray
+    cache.prefetch(next_keys, render, stream=0)     # newest request of a stream wins
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def window_table(dtype_str, window, level):
+    """
+    Lookup table mapping every value of an 8/16-bit integer dtype to a windowed uint8.
+
+    Returns:
+        tuple: (table, offset) to index with ``value - offset``, or None for other dtypes
+    """
+    dtype = np.dtype(dtype_str)
+    if dtype.kind not in 'iu' or dtype.itemsize > 2:
+        return None
+    info = np.iinfo(dtype)
+    values = np.arange(info.min, info.max + 1, dtype=np.float32)
+    table = window_values(values, window, level)
+    table.flags.writeable = False
+    return table, int(info.min)
+
+
+def window_values(values, window, level):
+    """Map values to uint8 through a window/level (linear ramp, clamped)."""
+    window = max(float(window), 1e-6)
+    scaled = (np.asarray(values, dtype=np.float32) - (level - window / 2.0)) * (255.0 / window)
+    return np.clip(scaled, 0, 255, out=scaled).astype(np.uint8)
+
+
+def windowed_slice(volume, axis, index, window, level):
+    """
+    One slice of a (Z, Y, X) volume mapped to uint8 through a window/level.
+
+    Args:
+        volume (np.ndarray): (Z, Y, X) volume
+        axis (int): 0 (axial), 1 (coronal) or 2 (sagittal) numpy axis
+        index (int): Slice index along the axis
+        window (float): Window width
+        level (float): Window center
+
+    Returns:
+        np.ndarray: 2D uint8 image (the plane of the remaining axes, in order)
+    """
+    plane = np.take(volume, index, axis=axis)
+    lookup = window_table(volume.dtype.str, float(window), float(level))
+    if lookup is None:
+        return window_values(plane, window, level)
+    table, offset = lookup
+    if offset == 0:
+        return table[plane]
+    # Signed values shifted to table indices without a wider temporary:
+    # flipping the sign bit of the unsigned view adds -offset
+    unsigned = plane.view(f'u{plane.itemsize}')
+    return table[unsigned ^ np.array(-offset, dtype=unsigned.dtype)]
+
+
+class SliceImageCache:
+    """
+    LRU cache of slice images within a memory budget, with background prefetch.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, prefetch_depth=8):
+        """
+        Args:
+            max_bytes (int): Memory budget of the cached images
+            prefetch_depth (int): Slices rendered ahead in the scroll direction
+        """
+        self.max_bytes = max_bytes
+        self.prefetch_depth = prefetch_depth
+        self.nbytes = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+        # One prefetch thread; a newer request of a stream (e.g. a viewer) makes its older ones stop
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slice-prefetch")
+        self._generations = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._images
+
+    def get(self, key):
+        """Cached image of a key, or None."""
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        """Add an image (made read-only), evicting the least recently used ones over budget."""
+        if image is None or image.nbytes > self.max_bytes:
+            return
+        image.flags.writeable = False
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._images[key] = image
+            self.nbytes += image.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def get_or_render(self, key, render):
+        """
+        Cached image of a key, rendered and cached on a miss.
+
+        Args:
+            key (tuple): Cache key
+            render (callable): render(key) -> np.ndarray, or None if the key is stale
+        """
+        image = self.get(key)
+        if image is not None:
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = render(key)
+        self.put(key, image)
+        return image
+
+    def prefetch(self, keys, render, stream=None):
+        """Render missing keys in the background, in order; replaces the stream's pending prefetch."""
+        with self._lock:
+            generation = self._generations.get(stream, 0) + 1
+            self._generations[stream] = generation
+        self._pool.submit(self._prefetch, stream, generation, list(keys), render)
+
+    def _prefetch(self, stream, generation, keys, render):
+        for key in keys:
+            if generation != self._generations.get(stream):
+                return
+            if key in self:
+                continue
+            try:
+                self.put(key, render(key))
+                self.prefetched += 1
+            except Exception as e:
+                print(f"Slice prefetch failed: {type(e).__name__}: {e}")
+                return
+
+    def clear(self):
+        """Drop every image and any pending prefetch."""
+        with self._lock:
+            self._generations = {stream: generation + 1 for stream, generation in self._generations.items()}
+            self._images.clear()
+            self.nbytes = 0
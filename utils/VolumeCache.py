@@ -0,0 +1,174 @@
+"""
+On-disk cache of decoded volumes, mapped back into memory on reopen.
+
+Each entry is a raw C-ordered ``<key>.raw`` file that can be memory-mapped
+directly, plus a small ``<key>.json`` geometry sidecar (shape, dtype,
+spacing, origin, direction). Keys are derived from the source files'
+paths, sizes and modification times, so an edited study gets a new entry.
+The cache is size-capped and evicts least recently used entries.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from .cache import get_cache_dir
+
+
+class VolumeCache:
+    """
+    Size-capped, LRU-evicted cache of decoded volumes.
+
+    Usage:
+        cache = VolumeCache()
+        key = VolumeCache.source_key(paths)
+        hit = cache.get(key)                  # (np.memmap, geometry) or None
+        if hit is None:
+            cache.put(key, volume, geometry)
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=20 * 1024 ** 3):
+        """
+        Args:
+            cache_dir (str): Directory of the entries (defaults to <cache dir>/volumes)
+            max_bytes (int): Total size above which old entries are evicted
+        """
+        self.cache_dir = str(cache_dir) if cache_dir else str(get_cache_dir("volumes"))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def source_key(paths, extra=""):
+        """
+        Key of a set of source files, from their paths, sizes and mtimes.
+
+        Args:
+            paths (list): Source file paths (order matters, e.g. slice order)
+            extra (str): Anything else the decoded result depends on
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha1(extra.encode())
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".raw", base + ".json"
+
+    def get(self, key):
+        """
+        Map a cached volume into memory.
+
+        Args:
+            key (str): Entry key
+
+        Returns:
+            tuple: (read-only np.memmap (Z, Y, X), geometry dict), or None on a miss
+        """
+        raw_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            volume = np.memmap(raw_path, dtype=np.dtype(meta['dtype']), mode='r', shape=tuple(meta['shape']))
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # The sidecar's mtime records the last access for LRU eviction
+        now = time.time()
+        os.utime(meta_path, (now, now))
+
+        geometry = {name: tuple(meta[name]) for name in ('spacing', 'origin', 'direction')}
+        return volume, geometry
+
+    def put(self, key, volume, geometry):
+        """
+        Store a decoded volume and evict old entries if over the size cap.
+
+        Args:
+            key (str): Entry key
+            volume (np.ndarray): (Z, Y, X) volume
+            geometry (dict): 'spacing', 'origin' and 'direction' tuples
+
+        Returns:
+            bool: True if the entry was written
+        """
+        volume = np.ascontiguousarray(volume)
+        if volume.nbytes > self.max_bytes:
+            return False
+
+        raw_path, meta_path = self._paths(key)
+        meta = {
+            'shape': list(volume.shape),
+            'dtype': volume.dtype.str,
+            'spacing': list(geometry['spacing']),
+            'origin': list(geometry['origin']),
+            'direction': list(geometry.get('direction', np.eye(3).ravel())),
+        }
+
+        # Write to temporary names first so a crash never leaves a half entry behind
+        token = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(raw_path + token, 'wb') as f:
+                volume.tofile(f)
+            with open(meta_path + token, 'w') as f:
+                json.dump(meta, f)
+            os.replace(raw_path + token, raw_path)
+            os.replace(meta_path + token, meta_path)
+        except OSError as e:
+            print(f"⚠️  Could not write volume cache entry {key}: {e}")
+            for path in (raw_path + token, meta_path + token):
+                if os.path.exists(path):
+                    os.remove(path)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                raw_path, meta_path = self._paths(name[:-len(".json")])
+                try:
+                    size = os.path.getsize(raw_path) + os.path.getsize(meta_path)
+                    last_access = os.path.getmtime(meta_path)
+                except OSError:
+                    continue
+                entries.append((last_access, size, raw_path, meta_path))
+                total += size
+
+            removed = 0
+            for _, size, raw_path, meta_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for path in (meta_path, raw_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+                removed += 1
+            return removed
+
+    def size(self):
+        """Total size of the cached entries in bytes."""
+        return sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                   for name in os.listdir(self.cache_dir) if not name.endswith(".tmp"))
@@ -0,0 +1,142 @@
+"""
+Intensity histogram of a volume, computed once per study.
+
+Percentiles, automatic window/level, window presets and the normalization
+of 2D exports are read from the histogram instead of sorting voxels again.
+8/16-bit integer volumes (CT, most MR) get an exact one-count-per-value
+histogram in a single pass; other dtypes a binned one:
+
+    histogram = VolumeHistogram.from_volume(volume)
+    low, high = histogram.percentile((2, 98))
+    window, level = histogram.auto_window_level()
+    window, level = histogram.preset('lung')
+    image8 = histogram.normalize(image)
+"""
+
+import numpy as np
+
+from .SliceCache import window_values
+
+# Standard CT windows (width, center) in Hounsfield units
+WINDOW_PRESETS = {
+    'lung': (1500.0, -600.0),
+    'bone': (1800.0, 400.0),
+    'soft_tissue': (400.0, 40.0),
+}
+
+
+class VolumeHistogram:
+    """
+    Counts of the voxel values of one volume over equal-width bins.
+    """
+
+    def __init__(self, counts, low, width):
+        """
+        Args:
+            counts (np.ndarray): Voxel count per bin
+            low (float): Value of the first bin's lower edge (its value for integer bins)
+            width (float): Bin width (1 for exact integer histograms)
+        """
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.low = float(low)
+        self.width = float(width)
+        self.cumulative = np.cumsum(self.counts)
+        self.total = int(self.cumulative[-1]) if len(self.cumulative) else 0
+        self.exact = self.width == 1.0
+
+        occupied = np.flatnonzero(self.counts)
+        self.min = self.bin_value(occupied[0]) if len(occupied) else 0.0
+        self.max = self.bin_value(occupied[-1]) if len(occupied) else 0.0
+
+    @classmethod
+    def from_volume(cls, volume, bins=4096, chunk=16):
+        """
+        Histogram of a (Z, Y, X) volume, a few slices at a time.
+
+        Args:
+            volume (np.ndarray): Volume of any numeric dtype
+            bins (int): Number of bins for dtypes other than 8/16-bit integers
+            chunk (int): Slices counted per step (bounds the temporaries)
+
+        Returns:
+            VolumeHistogram
+        """
+        dtype = volume.dtype
+        if dtype.kind in 'iu' and dtype.itemsize <= 2:
+            # One bin per possible value; signed values are shifted by flipping the sign bit
+            info = np.iinfo(dtype)
+            size = int(info.max) - int(info.min) + 1
+            unsigned = np.dtype(f'u{dtype.itemsize}')
+            flip = np.array(-int(info.min), dtype=unsigned)
+            counts = np.zeros(size, dtype=np.int64)
+            for z in range(0, volume.shape[0], chunk):
+                values = volume[z:z + chunk].view(unsigned)
+                if info.min:
+                    values = values ^ flip
+                counts += np.bincount(values.ravel(), minlength=size)
+            # Keep the occupied range only
+            occupied = np.flatnonzero(counts)
+            first, last = (occupied[0], occupied[-1]) if len(occupied) else (0, 0)
+            return cls(counts[first:last + 1], int(info.min) + first, 1)
+
+        low = min(float(volume[z:z + chunk].min()) for z in range(0, volume.shape[0], chunk))
+        high = max(float(volume[z:z + chunk].max()) for z in range(0, volume.shape[0], chunk))
+        width = (high - low) / bins if high > low else 1.0
+        counts = np.zeros(bins, dtype=np.int64)
+        for z in range(0, volume.shape[0], chunk):
+            chunkCounts, _ = np.histogram(volume[z:z + chunk], bins=bins, range=(low, low + width * bins))
+            counts += chunkCounts
+        return cls(counts, low, width)
+
+    # Representative value of a bin (the value itself for exact histograms, else the bin centre)
+    def bin_value(self, index):
+        return self.low + (index if self.exact else index + 0.5) * self.width
+
+    def percentile(self, q):
+        """
+        Percentile(s) of the voxel values, like np.percentile (exact for integer histograms).
+
+        Args:
+            q (float|sequence): Percentile(s) in [0, 100]
+
+        Returns:
+            float or np.ndarray
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.total == 0:
+            return np.zeros_like(q)[()]
+        # Linear interpolation between the sorted values around each rank
+        rank = np.clip(q, 0, 100) / 100.0 * (self.total - 1)
+        below = np.floor(rank)
+        lower = np.searchsorted(self.cumulative, below, side='right')
+        upper = np.searchsorted(self.cumulative, np.minimum(below + 1, self.total - 1), side='right')
+        values = self.bin_value(lower) + (rank - below) * (self.bin_value(upper) - self.bin_value(lower))
+        return values[()]
+
+    # Window/level spanning the low to high percentiles of the volume
+    def auto_window_level(self, low=1.0, high=99.0):
+        lowValue, highValue = self.percentile((low, high))
+        window = max(float(highValue - lowValue), self.width)
+        return window, float(lowValue + highValue) / 2.0
+
+    # Whether the values look like CT Hounsfield units (air near -1000)
+    def is_hounsfield(self):
+        return self.min <= -900 and self.max >= 300
+
+    def preset(self, name):
+        """
+        Window/level of a preset ('auto', 'lung', 'bone', 'soft_tissue').
+
+        CT presets are in Hounsfield units; for other data they fall back to 'auto'.
+        """
+        if name in WINDOW_PRESETS and self.is_hounsfield():
+            return WINDOW_PRESETS[name]
+        if name != 'auto' and name not in WINDOW_PRESETS:
+            raise ValueError(f"Unknown window preset {name!r}")
+        return self.auto_window_level()
+
+    # 8-bit display image clipped to the volume's low/high percentiles
+    def normalize(self, image, low=2.0, high=98.0):
+        lowValue, highValue = self.percentile((low, high))
+        window = max(float(highValue - lowValue), 1e-8)
+        return window_values(image, window, float(lowValue + highValue) / 2.0)
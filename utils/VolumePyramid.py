@@ -0,0 +1,195 @@
+"""
+Multi-resolution pyramid of a volume (2×, 4×, 8× downsampled levels).
+
+Levels are block means in the volume's native dtype, each computed from the
+previous one, so the whole pyramid costs one pass over the full volume and
+about 1/7 of its memory. Building runs on a background thread; levels are
+published as soon as they are ready:
+
+    pyramid = VolumePyramid(volume, geometry)
+    pyramid.build_async()
+    level = pyramid.get_level(4)          # None until the 4× level is built
+    coarse = pyramid.coarsest(max_voxels=64 ** 3)
+"""
+
+import threading
+
+import numpy as np
+
+
+def downsample_geometry(geometry, factor):
+    """
+    Geometry of a volume block-averaged by ``factor`` along each axis.
+
+    Each coarse voxel sits at the centre of the block of fine voxels it averages.
+    The offset is taken in index space, the way VTK places image voxels (origin
+    plus index times spacing, direction ignored), so levels overlay the full
+    image exactly even when an axis of the direction is flipped.
+
+    Args:
+        geometry (dict): 'spacing', 'origin' and 'direction' of the fine volume
+        factor (int): Block size
+
+    Returns:
+        dict: Geometry of the coarse volume
+    """
+    spacing = np.asarray(geometry['spacing'], dtype=np.float64)
+    offset = spacing * (factor - 1) / 2.0
+    return {
+        'spacing': tuple(float(v) for v in spacing * factor),
+        'origin': tuple(float(v) for v in np.asarray(geometry['origin'], dtype=np.float64) + offset),
+        'direction': tuple(geometry['direction']),
+    }
+
+
+def downsample2(volume, chunk=32):
+    """
+    2× block mean of a (Z, Y, X) volume in its own dtype.
+
+    Trailing odd voxels are dropped. The mean is computed a few slices at a
+    time so the float temporaries stay small.
+
+    Args:
+        volume (np.ndarray): (Z, Y, X) volume
+        chunk (int): Output slices computed per step
+
+    Returns:
+        np.ndarray: (Z//2, Y//2, X//2) volume
+    """
+    depth, height, width = (max(1, n // 2) for n in volume.shape)
+    out = np.empty((depth, height, width), dtype=volume.dtype)
+    integer = np.issubdtype(volume.dtype, np.integer)
+
+    # Axes shorter than 2 are kept as is rather than emptied
+    fz, fy, fx = (2 if n >= 2 else 1 for n in volume.shape)
+    for z0 in range(0, depth, chunk):
+        z1 = min(depth, z0 + chunk)
+        block = volume[z0 * fz:z1 * fz, :height * fy, :width * fx]
+        block = block.reshape(z1 - z0, fz, height, fy, width, fx).mean(axis=(1, 3, 5), dtype=np.float32)
+        if integer:
+            np.rint(block, out=block)
+        out[z0:z1] = block
+    return out
+
+
+class VolumePyramid:
+    """
+    Downsampled levels of one volume, built in the background.
+    """
+
+    def __init__(self, volume, geometry, factors=(2, 4, 8)):
+        """
+        Args:
+            volume (np.ndarray): Full-resolution (Z, Y, X) volume (level 1)
+            geometry (dict): 'spacing', 'origin' and 'direction' of the volume
+            factors (tuple): Downsampling factors, each twice the previous one
+        """
+        self.volume = volume
+        self.geometry = geometry
+        self.factors = tuple(factors)
+        self._levels = {1: (volume, geometry)}
+        self._lock = threading.Lock()
+        self._cancelEvent = threading.Event()
+        self._thread = None
+
+    def build(self, on_level=None):
+        """
+        Compute the levels on the calling thread.
+
+        Args:
+            on_level (callable): Called as on_level(factor) when a level is ready
+                                 (from the building thread)
+        """
+        previous, previous_factor = self.volume, 1
+        for factor in self.factors:
+            # Each level halves the previous one until the factor is reached
+            level = previous
+            while previous_factor < factor:
+                if self._cancelEvent.is_set():
+                    return
+                level = downsample2(level)
+                level.flags.writeable = False
+                previous_factor *= 2
+            previous = level
+
+            with self._lock:
+                self._levels[factor] = (level, downsample_geometry(self.geometry, factor))
+            if on_level is not None:
+                on_level(factor)
+
+    def build_async(self, on_level=None):
+        """Start building the levels on a daemon thread."""
+        self._thread = threading.Thread(target=self.build, args=(on_level,), daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def cancel(self):
+        """Stop a background build after the level in progress."""
+        self._cancelEvent.set()
+
+    def wait(self, timeout=None):
+        """Wait for a background build to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_level(self, factor):
+        """
+        Args:
+            factor (int): 1 for the full volume, or one of the pyramid factors
+
+        Returns:
+            tuple: (volume, geometry), or None if the level is not built yet
+        """
+        with self._lock:
+            return self._levels.get(factor)
+
+    def available_factors(self):
+        """Factors of the levels built so far, finest first."""
+        with self._lock:
+            return sorted(self._levels)
+
+    def coarsest(self, max_voxels=None, max_factor=None):
+        """
+        The finest built level that fits a voxel budget.
+
+        Args:
+            max_voxels (int): Largest acceptable number of voxels (None for no limit)
+            max_factor (int): Coarsest acceptable factor
+
+        Returns:
+            tuple: (factor, volume, geometry); the coarsest available level if none fits
+        """
+        with self._lock:
+            levels = sorted(self._levels.items())
+        if max_factor is not None:
+            levels = [item for item in levels if item[0] <= max_factor] or levels[:1]
+        for factor, (volume, geometry) in levels:
+            if max_voxels is None or volume.size <= max_voxels:
+                return factor, volume, geometry
+        factor, (volume, geometry) = levels[-1]
+        return factor, volume, geometry
+
+    def thumbnail(self, axis=0, index=None, max_size=128):
+        """
+        Slice through the smallest level that is still at least ``max_size`` pixels across.
+
+        Args:
+            axis (int): 0 for axial (Z), 1 for coronal (Y), 2 for sagittal (X) slices
+            index (int): Slice index in full-resolution voxels (defaults to the middle)
+            max_size (int): Wanted size of the thumbnail's larger side
+
+        Returns:
+            np.ndarray: 2D view into the chosen level
+        """
+        with self._lock:
+            levels = sorted(self._levels.items(), reverse=True)
+        for factor, (volume, _) in levels:
+            plane = [n for i, n in enumerate(volume.shape) if i != axis]
+            if max(plane) >= max_size or factor == 1:
+                break
+        if index is None:
+            index = self.volume.shape[axis] // 2
+        index = min(index // factor, volume.shape[axis] - 1)
+        slicer = [slice(None)] * 3
+        slicer[axis] = index
+        return volume[tuple(slicer)]
@@ -0,0 +1,29 @@
+"""
+Location of the on-disk caches shared by the viewer and the inference scripts.
+"""
+
+import os
+from pathlib import Path
+
+
+def get_cache_dir(name=""):
+    """
+    Return (and create) a cache directory for this application.
+
+    The root is ``$MPR_VIEWER_CACHE_DIR`` if set, otherwise
+    ``$XDG_CACHE_HOME/mpr_viewer`` (``~/.cache/mpr_viewer``).
+
+    Args:
+        name (str): Optional sub-directory name
+
+    Returns:
+        pathlib.Path: Existing cache directory
+    """
+    root = os.environ.get("MPR_VIEWER_CACHE_DIR")
+    if root is None:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME", str(Path.home() / ".cache"))
+        root = os.path.join(xdg_cache, "mpr_viewer")
+
+    cache_dir = Path(root) / name if name else Path(root)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,202 @@
+"""
+Process-pool decoding of compressed DICOM slices (JPEG, JPEG 2000, JPEG-LS, RLE).
+
+Compressed pixel data cannot be read raw and pydicom's decoders hold the GIL,
+so decoding them on threads does not scale. Here each slice is decoded by a
+worker process that writes the pixels straight into a slot of a shared-memory
+staging buffer; the parent copies finished slots into the output volume, so
+no pixel data is pickled between processes.
+
+    decoder = ProcessSliceDecoder((rows, cols), np.int16)
+    future = decoder.submit(entry)            # when decoder.free_slots() > 0
+    decoder.result(future, volume[i])         # True if the slice was decoded
+    decoder.close()
+
+The worker pool is created once per process and reused across loads.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Pool shared by every decoder of this process: (executor, max_workers)
+_pool = None
+_pool_lock = threading.Lock()
+
+# Staging buffers attached in a worker process: {shm name: (SharedMemory, array)}
+_attached = {}
+
+
+def is_compressed(transfer_syntax):
+    """True for encapsulated (compressed) transfer syntaxes."""
+    from pydicom.uid import UID
+
+    try:
+        return bool(transfer_syntax) and UID(transfer_syntax).is_compressed
+    except (TypeError, ValueError):
+        return False
+
+
+def codec_available(transfer_syntax):
+    """
+    Whether pydicom can decode a transfer syntax with the installed plugins.
+
+    Returns:
+        tuple: (available, list of missing dependency descriptions)
+    """
+    from pydicom.pixels import get_decoder
+    from pydicom.uid import UID
+
+    try:
+        decoder = get_decoder(UID(transfer_syntax))
+    except (NotImplementedError, ValueError) as e:
+        return False, [str(e)]
+    return decoder.is_available, list(decoder.missing_dependencies)
+
+
+def transfer_syntax_name(transfer_syntax):
+    """Readable name of a transfer syntax UID."""
+    from pydicom.uid import UID
+
+    return UID(transfer_syntax).name
+
+
+def _get_pool(max_workers):
+    global _pool
+    with _pool_lock:
+        # Replace a pool of another size, or one broken by a crashed worker
+        if _pool is not None and (_pool[1] != max_workers or getattr(_pool[0], "_broken", False)):
+            _pool[0].shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            # forkserver/spawn: never fork a parent that has decode threads running
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = (ProcessPoolExecutor(max_workers=max_workers, mp_context=context), max_workers)
+        return _pool[0]
+
+
+@atexit.register
+def _shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool[0].shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _staging_array(name, shape, dtype):
+    # Attach once per buffer, dropping buffers of earlier loads
+    if name not in _attached:
+        for old_name in list(_attached):
+            shm, _ = _attached.pop(old_name)
+            shm.close()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    return _attached[name][1]
+
+
+def _decode_into_slot(name, shape, dtype, slot, entry, flip_rows):
+    """Worker side: decode one file into its staging slot. Returns None or an error message."""
+    from .helpers import decode_dicom_slice
+
+    try:
+        decode_dicom_slice(entry, _staging_array(name, shape, dtype)[slot], flip_rows=flip_rows)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+class ProcessSliceDecoder:
+    """
+    Decodes compressed slices of one series in worker processes.
+    """
+
+    def __init__(self, slice_shape, dtype, max_workers=None, slots_per_worker=2):
+        """
+        Args:
+            slice_shape (tuple): (rows, cols) of the slices
+            dtype: Output dtype (rescale is applied in the workers)
+            max_workers (int): Worker processes (defaults to CPU count)
+            slots_per_worker (int): Staging slots per worker, bounding the extra memory
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.dtype = np.dtype(dtype)
+        self.shape = (self.max_workers * slots_per_worker,) + tuple(slice_shape)
+
+        nbytes = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._staging = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        self._free = list(range(self.shape[0]))
+        self._slots = {}
+        self._poolFailed = False
+        self._pool = _get_pool(self.max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def free_slots(self):
+        return len(self._free)
+
+    def submit(self, entry, flip_rows=False):
+        """
+        Queue one file for decoding (needs a free slot).
+
+        Returns:
+            Future: Pass it to result() once done
+        """
+        slot = self._free.pop()
+        try:
+            future = self._pool.submit(_decode_into_slot, self._shm.name, self.shape, self.dtype.str,
+                                       slot, entry, flip_rows)
+        except Exception as e:
+            # Broken pool: result() decodes the slice in this process instead
+            future = Future()
+            future.set_exception(e)
+        self._slots[future] = (slot, entry, flip_rows)
+        return future
+
+    def result(self, future, out):
+        """
+        Copy a finished slice into ``out`` and release its slot.
+
+        Returns:
+            bool: True if the slice was decoded
+        """
+        slot, entry, flip_rows = self._slots.pop(future)
+        self._free.append(slot)
+        try:
+            error = future.result()
+        except Exception as e:
+            # The pool is unusable (a worker died or could not start): decode here
+            if not self._poolFailed:
+                print(f"⚠️  Decode workers failed ({type(e).__name__}), decoding in-process")
+                self._poolFailed = True
+            from .helpers import _decode_entry_into
+            return _decode_entry_into(out[None], 0, entry, flip_rows)
+
+        if error is None:
+            out[...] = self._staging[slot]
+        else:
+            print(f"Error loading DICOM {entry.path}: {error}")
+        return error is None
+
+    def close(self):
+        """Drop queued work and free the staging buffer."""
+        for future in self._slots:
+            future.cancel()
+        self._slots.clear()
+        self._staging = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -4,15 +4,14 @@ This module handles all the helper operations needed by the main inference and G
 """
 
 import os
-import torch
-import pydicom
 import numpy as np
-import SimpleITK as sitk
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
-from PIL import Image
 import json
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .DicomSeriesIndex import DicomSeriesIndex
+from .compressed_decode import ProcessSliceDecoder, codec_available, is_compressed, transfer_syntax_name
 
 
 def check_device():
@@ -23,6 +22,9 @@ def check_device():
     Returns:
         torch.device: Device to use for inference (cuda or cpu)
     """
+    # Imported here: torch takes seconds to load and only detection needs it
+    import torch
+
     if torch.cuda.is_available():
         device = torch.device("cuda")
         gpu_name = torch.cuda.get_device_name(0)
@@ -54,6 +56,8 @@ def load_dicom_slice(dicom_path):
     Returns:
         tuple: (image_array, metadata_dict)
     """
+    import pydicom
+
     try:
         # Read DICOM file using pydicom
         dcm = pydicom.dcmread(dicom_path)
@@ -80,57 +84,385 @@ def load_dicom_slice(dicom_path):
         return None, None
 
 
-def load_dicom_folder(folder_path):
+def series_dtype(entries):
+    """
+    Smallest dtype that holds a series after rescale without losing precision.
+
+    Integer data with slope 1 and an integral intercept stays integer
+    (e.g. int16 CT), anything else becomes float32.
+
+    Args:
+        entries (list): IndexedSlice entries of one series
+
+    Returns:
+        np.dtype: Output dtype
+    """
+    dtypes = {e.dtype for e in entries}
+    slopes = {e.rescale_slope for e in entries}
+    intercepts = {e.rescale_intercept for e in entries}
+    if None in dtypes or len(dtypes) != 1 or slopes != {1.0} or any(i != int(i) for i in intercepts):
+        return np.dtype(np.float32)
+
+    stored = np.dtype(dtypes.pop()).newbyteorder('=')
+    if intercepts == {0.0}:
+        return stored
+    return np.result_type(stored, *[np.min_scalar_type(int(i)) for i in intercepts])
+
+
+def series_geometry(entries, flip_rows=False):
+    """
+    Compute spacing, origin and direction of a sorted series.
+
+    Args:
+        entries (list): Sorted IndexedSlice entries of one series
+        flip_rows (bool): Geometry of the volume stored with rows bottom-up
+
+    Returns:
+        dict: 'spacing' (x, y, z), 'origin' (x, y, z) and 'direction'
+              (row-major 3x3 with the column, row and slice axes as columns)
+    """
+    first = entries[0]
+    row_spacing, col_spacing = first.pixel_spacing or (1.0, 1.0)
+
+    positions = [e.position for e in entries if e.position is not None]
+    if len(positions) > 1:
+        slice_spacing = float(np.median(np.diff(positions))) or 1.0
+    else:
+        slice_spacing = first.slice_thickness or 1.0
+
+    if first.image_orientation is not None:
+        row_cosine = np.asarray(first.image_orientation[:3])
+        col_cosine = np.asarray(first.image_orientation[3:])
+        direction = np.column_stack([row_cosine, col_cosine, np.cross(row_cosine, col_cosine)])
+    else:
+        direction = np.eye(3)
+
+    origin = np.asarray(first.image_position or (0.0, 0.0, 0.0), dtype=np.float64)
+    if flip_rows:
+        # Array row 0 is the last DICOM row and the row axis points the other way
+        origin = origin + (first.rows - 1) * float(row_spacing) * direction[:, 1]
+        direction[:, 1] = -direction[:, 1]
+
+    return {
+        'spacing': (float(col_spacing), float(row_spacing), abs(slice_spacing)),
+        'origin': tuple(float(v) for v in origin),
+        'direction': tuple(float(v) for v in direction.ravel()),
+    }
+
+
+def decode_dicom_slice(entry, out, flip_rows=False):
     """
-    Load all DICOM files from a folder and sort by slice location/instance number.
+    Decode the pixels of one indexed DICOM file straight into ``out``.
+
+    Uncompressed pixel data is read raw from its indexed byte offset,
+    anything else goes through pydicom. Rescale slope/intercept is applied
+    in place.
+
+    Args:
+        entry (IndexedSlice): Indexed file
+        out (np.ndarray): Preallocated (H, W) array to fill
+        flip_rows (bool): Store rows bottom-up (VTK image convention)
+
+    Returns:
+        np.ndarray: ``out``
+    """
+    count = entry.rows * entry.cols
+    if entry.pixel_offset is not None and entry.pixel_length >= count * np.dtype(entry.dtype).itemsize:
+        pixels = np.fromfile(entry.path, dtype=entry.dtype, count=count,
+                             offset=entry.pixel_offset).reshape(entry.rows, entry.cols)
+    else:
+        import pydicom
+        pixels = pydicom.dcmread(entry.path).pixel_array
+
+    target = out[::-1] if flip_rows else out
+    target[...] = pixels
+
+    # Apply DICOM rescale (slope and intercept) in place
+    if entry.rescale_slope != 1.0:
+        target *= entry.rescale_slope
+    if entry.rescale_intercept != 0.0:
+        target += out.dtype.type(entry.rescale_intercept)
+    return out
+
+
+def _decode_entry_into(volume, index, entry, flip_rows=False):
+    """
+    Decode one indexed DICOM file into ``volume[index]``, reporting failures.
+
+    Returns:
+        bool: True if the slice was decoded
+    """
+    try:
+        decode_dicom_slice(entry, volume[index], flip_rows=flip_rows)
+        return True
+
+    except Exception as e:
+        print(f"Error loading DICOM {entry.path}: {e}")
+        return False
+
+
+class LoadCancelled(Exception):
+    """Raised when a volume load is cancelled through its ``cancelled`` callback."""
+
+
+def _split_compressed(entries, min_process_slices):
+    """
+    Sort out compressed slices before decoding.
+
+    Returns:
+        tuple: (indices to decode in worker processes, indices without an installed codec)
+    """
+    by_syntax = {}
+    for i, entry in enumerate(entries):
+        if entry.pixel_offset is None and is_compressed(entry.transfer_syntax):
+            by_syntax.setdefault(entry.transfer_syntax, []).append(i)
+
+    process_indices, undecodable = set(), set()
+    for syntax, indices in by_syntax.items():
+        available, missing = codec_available(syntax)
+        if available:
+            process_indices.update(indices)
+        else:
+            print(f"⚠️  No decoder for {transfer_syntax_name(syntax)}, skipping {len(indices)} slices. "
+                  f"Install one of: {'; '.join(missing)}")
+            undecodable.update(indices)
+
+    # Below a few slices the worker start-up costs more than it saves
+    if len(process_indices) < min_process_slices:
+        process_indices = set()
+    return process_indices, undecodable
+
+
+def load_dicom_series(entries, dtype=np.float32, max_workers=None, flip_rows=False,
+                      progress=None, cancelled=None, preview_stride=1, on_preview=None,
+                      process_workers=None, min_process_slices=8):
+    """
+    Decode a sorted series into one preallocated 3D volume.
+
+    Uncompressed slices are read on a thread pool. Compressed slices
+    (JPEG, JPEG 2000, JPEG-LS, RLE) are decoded in worker processes that
+    write into shared memory (see utils.compressed_decode); slices whose
+    codec is not installed are skipped with one warning per transfer syntax.
+
+    With ``preview_stride`` > 1 every N-th slice is decoded first and
+    ``on_preview`` receives the strided view of the volume as soon as those
+    slices are in, so a coarse preview can be shown before decoding finishes.
+
+    Args:
+        entries (list): Sorted IndexedSlice entries of one series
+        dtype: Output dtype, or None for the series' native dtype after rescale
+        max_workers (int): Number of decode threads (defaults to CPU count)
+        flip_rows (bool): Store rows bottom-up (VTK image convention)
+        progress (callable): Called as progress(done, total) after each slice
+        cancelled (callable): Returns True to abort; LoadCancelled is raised
+        preview_stride (int): Slice stride of the early preview
+        on_preview (callable): Called as on_preview(volume[::preview_stride])
+        process_workers (int): Processes for compressed slices (defaults to CPU count,
+                               1 decodes them on the thread pool instead)
+        min_process_slices (int): Fewer compressed slices than this stay on threads
+
+    Returns:
+        tuple: (volume (Z, H, W) np.ndarray, list of decoded entries)
+    """
+    if max_workers is None:
+        max_workers = min(32, os.cpu_count() or 1)
+    if process_workers is None:
+        process_workers = os.cpu_count() or 1
+
+    # Keep the most common slice size so the volume can be preallocated
+    shapes = Counter((e.rows, e.cols) for e in entries)
+    rows, cols = shapes.most_common(1)[0][0]
+    if len(shapes) > 1:
+        print(f"⚠️  Skipping {len(entries) - shapes[(rows, cols)]} slices not matching {rows}x{cols}")
+        entries = [e for e in entries if (e.rows, e.cols) == (rows, cols)]
+
+    dtype = series_dtype(entries) if dtype is None else np.dtype(dtype)
+    total = len(entries)
+    volume = np.empty((total, rows, cols), dtype=dtype)
+
+    process_indices, undecodable = _split_compressed(entries, min_process_slices)
+    if process_workers <= 1:
+        process_indices = set()
+
+    # Pools run tasks in submission order, so preview slices are decoded first
+    stride = max(1, int(preview_stride))
+    order = list(range(0, total, stride)) + [i for i in range(total) if i % stride]
+    preview_remaining = len(range(0, total, stride)) if on_preview is not None and stride > 1 else -1
+
+    decoded = [False] * total
+    done = 0
+
+    def finish(index, ok):
+        nonlocal done, preview_remaining
+        decoded[index] = ok
+        done += 1
+        if index % stride == 0 and preview_remaining > 0:
+            preview_remaining -= 1
+            if preview_remaining == 0:
+                on_preview(volume[::stride])
+        if progress is not None:
+            progress(done, total)
+
+    for index in order:
+        if index in undecodable:
+            finish(index, False)
+
+    process_order = deque(i for i in order if i in process_indices)
+    decoder = ProcessSliceDecoder((rows, cols), dtype, max_workers=process_workers) if process_order else None
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_decode_entry_into, volume, i, entries[i], flip_rows): i
+                       for i in order if i not in process_indices and i not in undecodable}
+
+            def fill_process_slots():
+                while process_order and decoder.free_slots():
+                    i = process_order.popleft()
+                    futures[decoder.submit(entries[i], flip_rows)] = i
+
+            if decoder is not None:
+                fill_process_slots()
+
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                if cancelled is not None and cancelled():
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise LoadCancelled()
+
+                for future in finished:
+                    index = futures.pop(future)
+                    if index in process_indices:
+                        finish(index, decoder.result(future, volume[index]))
+                        fill_process_slots()
+                    else:
+                        finish(index, future.result())
+    finally:
+        if decoder is not None:
+            decoder.close()
+
+    if not all(decoded):
+        keep = [i for i, ok in enumerate(decoded) if ok]
+        volume = volume[keep]
+        entries = [entries[i] for i in keep]
+
+    return volume, entries
+
+
+def select_dicom_series(folder_path, series_uid=None, max_workers=None):
+    """
+    Return the sorted index entries of one series in a DICOM folder.
 
     Args:
         folder_path (str): Path to folder containing DICOM files
+        series_uid (str): Series to select (defaults to the largest series)
+        max_workers (int): Threads used to parse new or changed headers
 
     Returns:
-        tuple: (list of image arrays, list of filenames, list of metadata)
+        list: Sorted IndexedSlice entries (empty if the folder holds no images)
     """
-    folder = Path(folder_path)
-    dicom_files = sorted(folder.glob("*.dcm"))
+    series = DicomSeriesIndex(max_workers=max_workers).get_series(folder_path)
+    if not series:
+        return []
 
-    if not dicom_files:
-        # Try without extension
-        dicom_files = [f for f in folder.iterdir() if f.is_file()]
+    if series_uid is None:
+        series_uid = next(iter(series))
+        if len(series) > 1:
+            print(f"⚠️  Folder holds {len(series)} series, using the largest ({series_uid})")
+    elif series_uid not in series:
+        raise ValueError(f"Series {series_uid} not found in {folder_path}")
 
-    images = []
-    filenames = []
-    metadata_list = []
+    return series[series_uid]
 
-    for dcm_file in dicom_files:
-        img, meta = load_dicom_slice(str(dcm_file))
-        if img is not None:
-            images.append(img)
-            filenames.append(dcm_file.name)
-            metadata_list.append(meta)
 
-    # Sort by instance number or slice location if available
-    if metadata_list and metadata_list[0].get('InstanceNumber'):
-        sorted_indices = sorted(range(len(metadata_list)),
-                                key=lambda i: metadata_list[i].get('InstanceNumber', 0))
-        images = [images[i] for i in sorted_indices]
-        filenames = [filenames[i] for i in sorted_indices]
-        metadata_list = [metadata_list[i] for i in sorted_indices]
+def _entries_metadata(entries):
+    """File names and per-slice metadata dicts of indexed entries."""
+    filenames = [Path(e.path).name for e in entries]
+    metadata_list = [{
+        'PatientID': e.patient_id,
+        'SeriesDescription': e.series_description,
+        'SliceLocation': e.slice_location,
+        'InstanceNumber': e.instance_number,
+    } for e in entries]
+    return filenames, metadata_list
 
-    print(f"✓ Loaded {len(images)} DICOM slices from {folder_path}")
-    return images, filenames, metadata_list
 
+def load_dicom_volume(folder_path, max_workers=None, series_uid=None, dtype=np.float32):
+    """
+    Load a DICOM folder into one preallocated 3D volume.
+
+    Headers come from the persistent DicomSeriesIndex (only new or changed
+    files are parsed), slices are ordered by position along the slice normal,
+    and pixel data is decoded in a thread pool directly into its final slot.
+    A folder holding several series is split by SeriesInstanceUID.
+
+    Args:
+        folder_path (str): Path to folder containing DICOM files
+        max_workers (int): Number of decode threads (defaults to CPU count)
+        series_uid (str): Series to load (defaults to the largest series)
+        dtype: Output dtype, or None for the series' native dtype after rescale
 
-def normalize_image_for_display(img_array):
+    Returns:
+        tuple: (volume (Z, H, W) np.ndarray, list of filenames, list of metadata)
+    """
+    entries = select_dicom_series(folder_path, series_uid=series_uid, max_workers=max_workers)
+    if not entries:
+        print(f"✓ Loaded 0 DICOM slices from {folder_path}")
+        return np.empty((0, 0, 0), dtype=np.float32 if dtype is None else dtype), [], []
+
+    volume, entries = load_dicom_series(entries, dtype=dtype, max_workers=max_workers)
+    filenames, metadata_list = _entries_metadata(entries)
+
+    print(f"✓ Loaded {len(filenames)} DICOM slices from {folder_path}")
+    return volume, filenames, metadata_list
+
+
+def load_dicom_folder(folder_path, max_workers=None, lazy=False):
+    """
+    Load all DICOM files from a folder and sort by slice position/instance number.
+
+    The returned slices are views into a single volume built by
+    ``load_dicom_volume``, so no per-slice copies are made. With ``lazy=True``
+    a LazyVolume is returned instead of a list: it supports ``len``, iteration
+    and indexing like the list, but decodes each slice on first access and
+    keeps memory bounded.
+
+    Args:
+        folder_path (str): Path to folder containing DICOM files
+        max_workers (int): Number of decode threads (defaults to CPU count)
+        lazy (bool): Decode slices on demand
+
+    Returns:
+        tuple: (list of image arrays or LazyVolume, list of filenames, list of metadata)
+    """
+    if lazy:
+        from .LazyVolume import LazyVolume
+
+        entries = select_dicom_series(folder_path, max_workers=max_workers)
+        if not entries:
+            return [], [], []
+        filenames, metadata_list = _entries_metadata(entries)
+        print(f"✓ Indexed {len(filenames)} DICOM slices from {folder_path}")
+        return LazyVolume(entries, dtype=np.float32), filenames, metadata_list
+
+    volume, filenames, metadata_list = load_dicom_volume(folder_path, max_workers=max_workers)
+    return list(volume), filenames, metadata_list
+
+
+def normalize_image_for_display(img_array, histogram=None):
     """
     Normalize image array to 0-255 range for display.
     Handles different intensity ranges (CT, MRI, etc.)
 
     Args:
         img_array (np.ndarray): Input image array
+        histogram (VolumeHistogram): Histogram of the volume the image comes from;
+                                     its 2nd/98th percentiles are used without sorting the image
 
     Returns:
         np.ndarray: Normalized uint8 array
     """
+    if histogram is not None:
+        return histogram.normalize(img_array)
+
     # Clip outliers (improves visualization)
     p2, p98 = np.percentile(img_array, (2, 98))
     img_normalized = np.clip(img_array, p2, p98)
@@ -142,7 +474,7 @@ def normalize_image_for_display(img_array):
     return img_normalized
 
 
-def create_overlay(image, mask, alpha=0.5, color=[255, 0, 0]):
+def create_overlay(image, mask, alpha=0.5, color=[255, 0, 0], histogram=None):
     """
     Create an overlay of segmentation mask on the original image.
 
@@ -151,13 +483,14 @@ def create_overlay(image, mask, alpha=0.5, color=[255, 0, 0]):
         mask (np.ndarray): Binary mask (H, W)
         alpha (float): Transparency of overlay (0-1)
         color (list): RGB color for mask overlay
+        histogram (VolumeHistogram): Optional histogram of the image's volume (see normalize_image_for_display)
 
     Returns:
         np.ndarray: RGB image with overlay (H, W, 3)
     """
     # Normalize image to 0-255 if needed
-    if image.max() > 255 or image.dtype != np.uint8:
-        image = normalize_image_for_display(image)
+    if image.dtype != np.uint8:
+        image = normalize_image_for_display(image, histogram)
 
     # Create RGB image from grayscale
     img_rgb = np.stack([image, image, image], axis=-1)
@@ -175,18 +508,25 @@ def create_overlay(image, mask, alpha=0.5, color=[255, 0, 0]):
     return overlay
 
 
-def save_results(output_dir, results_data, masks=None):
+def save_results(output_dir, results_data, masks=None, rle=None):
     """
     Save detection results to CSV and optionally save mask images.
 
     Args:
         output_dir (str): Directory to save results
         results_data (list): List of dicts with detection results
-        masks (list): Optional list of mask arrays to save
+        masks (iterable): Optional dicts with 'filename' and 'mask' to save as PNGs
+                          (may be a generator, so masks are made one at a time)
+        rle (dict): Optional {filename: {organ: rle}} run-length encoded masks
+                    (SegmentationResult.to_rle), saved as masks_rle.json
 
     Returns:
         tuple: (csv_path, masks_dir)
     """
+    import pandas as pd
+    import torch
+    from PIL import Image
+
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
@@ -203,11 +543,12 @@ def save_results(output_dir, results_data, masks=None):
 
     # Save masks if provided
     masks_dir = None
-    if masks:
+    if masks is not None:
         masks_dir = run_dir / "masks"
         masks_dir.mkdir(exist_ok=True)
 
-        for i, mask_data in enumerate(masks):
+        count = 0
+        for mask_data in masks:
             mask_array = mask_data['mask']
             filename = mask_data['filename']
 
@@ -215,8 +556,15 @@ def save_results(output_dir, results_data, masks=None):
             mask_img = Image.fromarray((mask_array * 255).astype(np.uint8))
             mask_path = masks_dir / f"{Path(filename).stem}_mask.png"
             mask_img.save(mask_path)
+            count += 1
+
+        print(f"✓ Saved {count} masks to: {masks_dir}")
 
-        print(f"✓ Saved {len(masks)} masks to: {masks_dir}")
+    if rle is not None:
+        rle_path = run_dir / "masks_rle.json"
+        with open(rle_path, 'w') as f:
+            json.dump(rle, f)
+        print(f"✓ Saved run-length encoded masks to: {rle_path}")
 
     # Save run log
     log_data = {
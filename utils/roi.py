@@ -0,0 +1,73 @@
+"""
+Voxel-extent helpers for running work on a region of interest of a volume.
+
+Pure numpy (no VTK), so the detector and the command line can crop volumes
+without loading VTK:
+
+    crop, start = extent_slices(roi, volume.shape, geometry['spacing'], margin=20.0)
+    labels = segment(volume[crop], crop_geometry(geometry, start))
+    labels = paste_crop(labels, volume.shape, crop)
+"""
+
+import numpy as np
+
+
+def crop_geometry(geometry, start):
+    """
+    Geometry of a sub-volume starting at voxel ``start`` of a volume.
+
+    Args:
+        geometry (dict): 'spacing', 'origin' and 'direction' of the full volume
+        start (tuple): (i, j, k) voxel index of the sub-volume's first voxel
+
+    Returns:
+        dict: Geometry with the origin moved to the sub-volume's first voxel
+    """
+    direction = np.asarray(geometry['direction'], dtype=np.float64).reshape(3, 3)
+    offset = direction @ (np.asarray(start, dtype=np.float64) * np.asarray(geometry['spacing'], dtype=np.float64))
+    return {
+        'spacing': tuple(geometry['spacing']),
+        'origin': tuple(float(v) for v in np.asarray(geometry['origin'], dtype=np.float64) + offset),
+        'direction': tuple(geometry['direction']),
+    }
+
+
+def extent_slices(extent, shape, spacing=(1.0, 1.0, 1.0), margin=0.0):
+    """
+    Numpy slices of a voxel extent grown by a margin, clamped to a volume.
+
+    Args:
+        extent (tuple): (i0, i1, j0, j1, k0, k1) inclusive voxel indices along x, y, z
+        shape (tuple): (Z, Y, X) shape of the volume
+        spacing (tuple): (x, y, z) voxel spacing, in the unit of the margin
+        margin (float): Context added on every side (e.g. mm)
+
+    Returns:
+        tuple: ((z, y, x) slices of the volume, (i, j, k) start voxel of the crop)
+    """
+    slices = []
+    for axis in range(3):
+        grow = int(np.ceil(margin / float(spacing[axis]))) if margin > 0 else 0
+        size = shape[2 - axis]
+        low = min(max(int(extent[2 * axis]) - grow, 0), size - 1)
+        high = min(max(int(extent[2 * axis + 1]) + grow, low), size - 1)
+        slices.append(slice(low, high + 1))
+    return tuple(reversed(slices)), tuple(s.start for s in slices)
+
+
+def paste_crop(array, shape, slices, fill=0):
+    """
+    A crop (e.g. labels computed on it) placed back into a volume of the full shape.
+
+    Args:
+        array (np.ndarray): (Z, Y, X) crop
+        shape (tuple): (Z, Y, X) shape of the full volume
+        slices (tuple): (z, y, x) slices the crop was taken from
+        fill: Value outside the crop
+
+    Returns:
+        np.ndarray: Full-shape volume of the crop's dtype
+    """
+    full = np.full(shape, fill, dtype=array.dtype)
+    full[slices] = array
+    return full
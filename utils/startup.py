@@ -0,0 +1,68 @@
+"""
+Startup timing, to keep the time to first window visible.
+
+Stages are marked as the application starts; the report lists each stage's
+duration. It is printed when MPR_VIEWER_STARTUP_REPORT is set or main.py is
+run with --startup-report:
+
+    from utils.startup import startup_timer
+    with startup_timer.stage("import app"):
+        from app import MainWindow
+    startup_timer.mark("main window")
+    startup_timer.report()
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    Durations of consecutive startup stages.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = []
+        self._last = self.start
+
+    def mark(self, name):
+        """End a stage that started at the previous mark."""
+        now = time.perf_counter()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one stage."""
+        if time.perf_counter() - self._last > 0.001:
+            # Time spent outside any stage since the previous mark
+            self.mark("other")
+        self._last = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name)
+
+    def elapsed(self):
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.start
+
+    def enabled(self):
+        """Whether the report was asked for."""
+        return bool(os.environ.get("MPR_VIEWER_STARTUP_REPORT")) or "--startup-report" in sys.argv
+
+    def report(self, file=None):
+        """Print the stages and the total."""
+        file = file or sys.stdout
+        width = max([len(name) for name, _ in self.stages] + [len("total")])
+        print("Startup time:", file=file)
+        for name, seconds in self.stages:
+            print(f"  {name:<{width}}  {seconds * 1000:8.1f} ms", file=file)
+        print(f"  {'total':<{width}}  {self.elapsed() * 1000:8.1f} ms", file=file)
+
+
+# Shared by main.py and the modules it starts
+startup_timer = StartupTimer()
@@ -0,0 +1,117 @@
+"""
+Conversions between numpy volumes and VTK images.
+
+Volumes are (Z, Y, X) C-contiguous numpy arrays; VTK sees them as
+X-fastest point data, so both sides share the same buffer.
+"""
+
+import numpy as np
+from vtk import vtkImageImport, vtkLookupTable
+from vtk.util import numpy_support
+
+
+def numpy_to_vtk_source(volume, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0)):
+    """
+    Wrap a (Z, Y, X) numpy volume in a vtkImageImport pipeline source without copying it.
+
+    The source behaves like a reader (GetOutput, UpdateWholeExtent) and its
+    output scalars point at the numpy buffer. The array is kept alive on the
+    returned object as ``source.volume``.
+
+    Args:
+        volume (np.ndarray): C-contiguous volume in native byte order
+        spacing (tuple): Voxel spacing (x, y, z)
+        origin (tuple): Image origin (x, y, z)
+
+    Returns:
+        vtkImageImport: Pipeline source producing the volume
+    """
+    volume = np.ascontiguousarray(volume)
+    depth, height, width = volume.shape
+
+    source = vtkImageImport()
+    source.SetDataScalarType(numpy_support.get_vtk_array_type(volume.dtype))
+    source.SetNumberOfScalarComponents(1)
+    source.SetWholeExtent(0, width - 1, 0, height - 1, 0, depth - 1)
+    source.SetDataExtentToWholeExtent()
+    source.SetDataSpacing(spacing)
+    source.SetDataOrigin(origin)
+    source.SetImportVoidPointer(volume, 1)
+    source.volume = volume
+    source.UpdateWholeExtent()
+    return source
+
+
+def vtk_image_to_numpy(image):
+    """
+    View the scalars of a single-component vtkImageData as a (Z, Y, X) numpy array.
+
+    No data is copied: the view shares memory with the image and is only
+    valid while the image keeps its scalars.
+
+    Args:
+        image (vtkImageData): Source image
+
+    Returns:
+        np.ndarray: Volume view in the image's native dtype
+    """
+    width, height, depth = image.GetDimensions()
+    scalars = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
+    return scalars.reshape(depth, height, width)
+
+
+def vtk_image_geometry(image):
+    """
+    Spacing, origin and direction of a vtkImageData.
+
+    Args:
+        image (vtkImageData): Source image
+
+    Returns:
+        dict: 'spacing', 'origin' and 'direction' (row-major 3x3) tuples
+    """
+    direction = image.GetDirectionMatrix()
+    return {
+        'spacing': tuple(image.GetSpacing()),
+        'origin': tuple(image.GetOrigin()),
+        'direction': tuple(direction.GetElement(i, j) for i in range(3) for j in range(3)),
+    }
+
+
+def label_color(label):
+    """
+    Distinct RGB color of a label value (golden-ratio hue steps, stable across runs).
+
+    Args:
+        label (int): Label value (> 0)
+
+    Returns:
+        tuple: (r, g, b) in [0, 1]
+    """
+    import colorsys
+
+    return colorsys.hsv_to_rgb((label * 0.618033988749895) % 1.0, 0.75, 1.0)
+
+
+def label_lookup_table(max_label, opacity=1.0, colors=None):
+    """
+    Lookup table mapping integer labels to colors, with label 0 transparent.
+
+    Args:
+        max_label (int): Largest label value
+        opacity (float): Alpha of the labels
+        colors (dict): Optional {label: (r, g, b)} overriding the default colors
+
+    Returns:
+        vtkLookupTable: Indexed over [0, max_label]
+    """
+    max_label = max(1, int(max_label))
+    lut = vtkLookupTable()
+    lut.SetNumberOfTableValues(max_label + 1)
+    lut.SetTableRange(0, max_label)
+    lut.Build()
+    lut.SetTableValue(0, 0.0, 0.0, 0.0, 0.0)
+    for label in range(1, max_label + 1):
+        color = (colors or {}).get(label) or label_color(label)
+        lut.SetTableValue(label, *color, opacity)
+    return lut
@@ -2,6 +2,8 @@
 from vtk import *
 from .VtkViewer import *
 from components.CommandSliceSelect import *
+from utils.SlabProjection import SlabProjector
+from utils.vtk_bridge import numpy_to_vtk_source
 
 class OrthoViewer(VtkViewer):
 
@@ -22,13 +24,7 @@ class OrthoViewer(VtkViewer):
         ]
                        
         # Vtk Stuff
-        ### Image Window Level        
-        self.imageWindowLevel = self.vtkBaseClass.imageWindowLevel
-
-        ### Image Map To Colors
-        self.imageMapToColors = self.vtkBaseClass.imageMapToColors
-        
-        ### Grayscale LUT.        
+        ### Grayscale LUT (window/level of the resliced slices)
         self.grayscaleLut = self.vtkBaseClass.grayscaleLut
 
         ## Render Window Interactor
@@ -58,7 +54,8 @@ class OrthoViewer(VtkViewer):
         self.resliceCursorWidget.SetRepresentation(self.resliceCursorRep)
         self.resliceCursorRep.GetResliceCursorActor().GetCursorAlgorithm().SetResliceCursor(self.resliceCursor)
         self.resliceCursorRep.GetResliceCursorActor().GetCursorAlgorithm().SetReslicePlaneNormal(self.orientation)
-        self.resliceCursorRep.SetWindowLevel(self.imageWindowLevel.GetWindow(),self.imageWindowLevel.GetLevel())
+        self.resliceCursorRep.SetLookupTable(self.grayscaleLut)
+        self.resliceCursorRep.SetWindowLevel(*self.vtkBaseClass.get_window_level())
         
         ## To fix problem of not showing the reslice cursor        
         for i in range(3):
@@ -67,10 +64,38 @@ class OrthoViewer(VtkViewer):
         self.resliceCursorWidget.SetDefaultRenderer(self.renderer)
         self.resliceCursorWidget.EnabledOn()
 
+        ## Thick slab ('mip', 'minip' or 'mean'; None shows the thin resliced slice)
+        self.slabMode = None
+        self.slabThickness = 10
+        self.slabProjector = None
+        self.slabSource = None
+        self.slabActor = vtkImageActor()
+        self.slabActor.GetProperty().SetLookupTable(self.grayscaleLut)
+        self.slabActor.GetProperty().UseLookupTableScalarRangeOn()
+        self.slabActor.VisibilityOff()
+        self.renderer.AddViewProp(self.slabActor)
+
+        ## Cached slice (8-bit images already windowed, shown as is)
+        self.useSliceCache = True
+        self.lastSliceIndex = None
+        self.sliceSource = None
+        self.sliceActor = vtkImageActor()
+        self.sliceActor.GetProperty().SetColorWindow(255)
+        self.sliceActor.GetProperty().SetColorLevel(127.5)
+        self.sliceActor.VisibilityOff()
+        self.renderer.AddViewProp(self.sliceActor)
+        # A new window/level re-maps the shown slice (one slice per view)
+        self.grayscaleLut.AddObserver(vtkCommand.ModifiedEvent, lambda caller, event: self.update_slice_image())
+
+        ## Label overlay: the label slice under the shown axis-aligned slice
+        self.labelPlane = self.vtkBaseClass.labelOverlay.add_plane(self.renderer, self.get_label_location)
+
         # Command Slice Select
         self.commandSliceSelect = self.vtkBaseClass.commandSliceSelect
         self.commandSliceSelect.resliceCursorWidgets[self.orientation] = self.resliceCursorWidget
         self.commandSliceSelect.resliceCursor = self.resliceCursor
+        # Set by ViewersConnection: cursor changes are then applied to all views at once
+        self.syncBus = None
 
         # Renderer Settings
         color = [0.02, 0.02, 0.02]
@@ -92,6 +117,9 @@ class OrthoViewer(VtkViewer):
     def connect_on_data(self, path:str):
         super().connect_on_data(path)
         self.set_slice_range()
+        self.lastSliceIndex = None
+        self.update_slab()
+        self.update_slice_image()
 
     # Add text
     def add_text_actor(self, text:str, position:list):
@@ -132,6 +160,9 @@ class OrthoViewer(VtkViewer):
     # Set slice index
     def set_slice(self, slice_index):
         self.current_slice = slice_index
+        if self.syncBus is not None:
+            self.syncBus.set_slice(self.orientation, slice_index)
+            return
         center = list(self.resliceCursor.GetCenter())
         center[self.orientation] = slice_index
         self.resliceCursor.SetCenter(center)
@@ -140,11 +171,119 @@ class OrthoViewer(VtkViewer):
         for i in range(0,3):
             if self.commandSliceSelect.imagePlaneWidgets[i] is not None:
                 self.commandSliceSelect.imagePlaneWidgets[i].UpdatePlacement()
-            if self.commandSliceSelect.resliceCursorWidgets[i] is not None:
-                self.commandSliceSelect.resliceCursorWidgets[i].Render()
-
+        self.update_slab()
+        self.update_slice_image()
+        
+        # Every linked window is drawn once at the next frame, however many ticks arrive before it
+        self.commandSliceSelect.request_render()
         self.render()
                         
+    # Show the plane at the shared cursor (rendering is left to the caller)
+    def sync_to_cursor(self):
+        self.current_slice = self.resliceCursor.GetCenter()[self.orientation]
+        self.update_slab()
+        self.update_slice_image()
+
+    # Thick-slab projection mode ('mip', 'minip', 'mean', or None for the thin slice)
+    def set_slab(self, mode, thickness=None):
+        self.slabMode = mode
+        if thickness is not None:
+            self.slabThickness = max(1, int(thickness))
+        self.update_slab()
+        self.update_slice_image()
+        self.render()
+
+    # Slab thickness in slices
+    def set_slab_thickness(self, thickness):
+        self.set_slab(self.slabMode, thickness)
+
+    # Voxel index of the cursor along this view's normal
+    def get_voxel_index(self):
+        geometry = self.vtkBaseClass.get_volume_geometry()
+        center = self.resliceCursor.GetCenter()
+        index = (center[self.orientation] - geometry['origin'][self.orientation]) / geometry['spacing'][self.orientation]
+        count = self.vtkBaseClass.imageDimensions[self.orientation]
+        return min(max(int(round(index)), 0), count - 1)
+
+    # Render the cached images of upcoming slice positions (e.g. the next cine frames) in the background
+    def prefetch_slices(self, slice_indices):
+        if not self.useSliceCache or self.slabMode is not None or self.vtkBaseClass.storedVolume is None:
+            return
+        geometry = self.vtkBaseClass.get_volume_geometry()
+        origin, spacing = geometry['origin'][self.orientation], geometry['spacing'][self.orientation]
+        indices = dict.fromkeys(int(round((value - origin) / spacing)) for value in slice_indices)
+        indices.pop(self.lastSliceIndex, None)
+        self.vtkBaseClass.prefetch_slices(self.orientation, list(indices))
+
+    # Whether the cursor plane of this view is still perpendicular to its axis
+    def is_axis_aligned(self):
+        normal = self.resliceCursor.GetPlane(self.orientation).GetNormal()
+        return abs(abs(normal[self.orientation]) - 1.0) < 1e-6
+
+    # Slice whose labels are drawn over this view (none for oblique planes)
+    def get_label_location(self):
+        if self.vtkBaseClass.storedVolume is None or not self.is_axis_aligned():
+            return None
+        return self.orientation, self.get_voxel_index(), self.resliceCursor.GetCenter()[self.orientation]
+
+    # Project the slab around the cursor; only planes entering or leaving it are read
+    def update_slab(self):
+        self.slabActor.SetVisibility(self.slabMode is not None)
+        if self.slabMode is None:
+            return
+        volume = self.vtkBaseClass.get_volume_array()
+        if volume is None:
+            return
+
+        # Numpy axis of this view's normal: volumes are (Z, Y, X)
+        axis = 2 - self.orientation
+        if self.slabProjector is None or self.slabProjector.volume is not volume:
+            if self.slabProjector is not None:
+                self.slabProjector.close()
+            self.slabProjector = SlabProjector(volume, axis)
+
+        image = self.slabProjector.project(self.get_voxel_index(), self.slabThickness, self.slabMode)
+        self.slabSource = self.show_plane_image(self.slabSource, self.slabActor, image)
+
+    # Show the slice from the windowed slice cache: revisiting a slice reslices nothing.
+    # Oblique cursor planes go through the reslice cursor as before.
+    def update_slice_image(self):
+        cached = (self.useSliceCache and self.slabMode is None and self.vtkBaseClass.storedVolume is not None
+                  and self.is_axis_aligned())
+        # The resliced image is only computed when it is the one shown
+        self.resliceCursorRep.SetShowReslicedImage(self.slabMode is None and not cached)
+        self.sliceActor.SetVisibility(cached)
+        if not cached:
+            return
+
+        index = self.get_voxel_index()
+        direction = 0 if self.lastSliceIndex is None else (index > self.lastSliceIndex) - (index < self.lastSliceIndex)
+        self.lastSliceIndex = index
+        image = self.vtkBaseClass.get_slice_image(self.orientation, index, direction)
+        if image is not None:
+            self.sliceSource = self.show_plane_image(self.sliceSource, self.sliceActor, image)
+
+    # Show a 2D image of this view's plane in the cursor plane; returns the (reused) source
+    def show_plane_image(self, source, actor, image):
+        volume = self.vtkBaseClass.get_volume_array()
+        geometry = self.vtkBaseClass.get_volume_geometry()
+        origin = list(geometry['origin'])
+        origin[self.orientation] = self.resliceCursor.GetCenter()[self.orientation]
+
+        # One-voxel-thick volume: the view's axis has a single sample
+        shape = list(volume.shape)
+        shape[2 - self.orientation] = 1
+        image = image.reshape(shape)
+        if source is None or source.volume.shape != image.shape or source.volume.dtype != image.dtype:
+            # Producers reuse or share their buffers, so the displayed image gets its own
+            source = numpy_to_vtk_source(image.copy(), geometry['spacing'], origin)
+            actor.GetMapper().SetInputConnection(source.GetOutputPort())
+        else:
+            source.volume[...] = image
+            source.SetDataOrigin(origin)
+            source.Modified()
+        return source
+
     # Update
     def update(self):
         super().update()
@@ -155,28 +294,23 @@ class OrthoViewer(VtkViewer):
 
     # Events
     def add_observers(self):
-        self.resliceCursorWidget.AddObserver(vtk.vtkResliceCursorWidget.ResliceAxesChangedEvent, lambda caller, event: self.commandSliceSelect(caller, event))
-
-    def update_slice_from_reslice_cursor(self, caller, event):
-        # Get the center of the reslice cursor
-        center = self.resliceCursor.GetCenter()
-
-        # Get the image data
-        image = self.vtkBaseClass.imageReader.GetOutput()
-
-        # Get the spacing and origin of the image
-        spacing = image.GetSpacing()
-        origin = image.GetOrigin()
+        self.resliceCursorWidget.AddObserver(vtk.vtkResliceCursorWidget.ResliceAxesChangedEvent, self.reslice_axes_changed)
+        self.resliceCursorWidget.AddObserver(vtk.vtkCommand.StartInteractionEvent, lambda caller, event: self.set_interacting(True))
+        self.resliceCursorWidget.AddObserver(vtk.vtkCommand.EndInteractionEvent, lambda caller, event: self.set_interacting(False))
+        self.resliceCursorWidget.AddObserver(vtk.vtkResliceCursorWidget.WindowLevelEvent, self.update_window_level)
 
-        # Calculate the slice index
-        slice_index = (center[self.orientation] - origin[self.orientation]) / spacing[self.orientation]
+    # Reslice from a coarse pyramid level while dragging, back to full resolution on release
+    def set_interacting(self, interacting:bool):
+        if self.vtkBaseClass.set_interaction_level(interacting):
+            self.commandSliceSelect.request_render()
 
-        # Set the slice index
-        self.set_slice(slice_index)
+    # The cursor was dragged or rotated in this view
+    def reslice_axes_changed(self, caller, event):
+        if self.syncBus is not None:
+            self.syncBus.cursor_changed()
+        else:
+            self.commandSliceSelect(caller, event)
 
-        # Update the slider
-        if self.commandSliceSelect.sliders[self.orientation] is not None:
-            # Block signals to prevent a feedback loop
-            self.commandSliceSelect.sliders[self.orientation].blockSignals(True)
-            self.commandSliceSelect.sliders[self.orientation].setValue(int(slice_index))
-            self.commandSliceSelect.sliders[self.orientation].blockSignals(False)
\ No newline at end of file
+    # Share a window/level drag in this view with the other views
+    def update_window_level(self, caller, event):
+        self.vtkBaseClass.set_window_level(self.resliceCursorRep.GetWindow(), self.resliceCursorRep.GetLevel())
@@ -3,7 +3,7 @@ from .OrthoViewer import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-from utils.Worker import Worker
+from components.CineEngine import CineEngine, CineTrack
 
 from .QtViewer import *
 
@@ -24,9 +24,9 @@ class QtOrthoViewer(QtViewer):
         # Initialize the UI        
         self._init_UI()
 
-        # Thread
-        self.thread = QThread()
-        self.worker = Worker(self.slider)
+        # Cine playback on the clock shared by all viewers (GUI thread)
+        self.cine = CineTrack(parent=self)
+        self.cine.prefetch = self.viewer.prefetch_slices
         
         # Connect signals and slots
         self.connect()
@@ -61,11 +61,44 @@ class QtOrthoViewer(QtViewer):
         self.nextBtn.setStyleSheet("font-size:15px; border-radius: 6px;border: 1px solid rgba(27, 31, 35, 0.15);padding: 5px 15px; background: black")
         self.nextBtn.setDisabled(True)
         
+        ## Thick slab
+        self.slabCombo = QComboBox()
+        for text, mode in (("Slice", None), ("MIP", "mip"), ("MinIP", "minip"), ("Mean", "mean")):
+            self.slabCombo.addItem(text, mode)
+        self.slabCombo.setToolTip("Thick-slab projection")
+        self.slabCombo.setDisabled(True)
+
+        self.slabSpin = QSpinBox()
+        self.slabSpin.setRange(1, 500)
+        self.slabSpin.setValue(self.viewer.slabThickness)
+        self.slabSpin.setSuffix(" sl")
+        self.slabSpin.setToolTip("Slab thickness (slices)")
+        self.slabSpin.setDisabled(True)
+
+        ## Cine frame rate
+        self.fpsSpin = QSpinBox()
+        self.fpsSpin.setRange(1, 120)
+        self.fpsSpin.setValue(int(CineEngine.default().fps))
+        self.fpsSpin.setSuffix(" fps")
+        self.fpsSpin.setToolTip("Cine frame rate")
+
+        self.linkCheck = QCheckBox("Link")
+        self.linkCheck.setChecked(True)
+        self.linkCheck.setToolTip("Play at the frame rate shared by the linked viewers")
+
+        self.fpsLabel = QLabel()
+        self.fpsLabel.setToolTip("Achieved frame rate (dropped frames)")
+        
         self.buttonsLayout.addSpacerItem(QSpacerItem(80, 10))
         self.buttonsLayout.addWidget(self.prevBtn,4)
         self.buttonsLayout.addWidget(self.playBtn,5)
         self.buttonsLayout.addWidget(self.nextBtn,4)
+        self.buttonsLayout.addWidget(self.fpsSpin,2)
+        self.buttonsLayout.addWidget(self.linkCheck,1)
+        self.buttonsLayout.addWidget(self.fpsLabel,2)
         self.buttonsLayout.addSpacerItem(QSpacerItem(80, 10))
+        self.buttonsLayout.addWidget(self.slabCombo,3)
+        self.buttonsLayout.addWidget(self.slabSpin,2)
         
         # Set up the layouts
         self.topLayout.addWidget(self.slider)
@@ -75,12 +108,26 @@ class QtOrthoViewer(QtViewer):
     def connect(self):
         # Connect slider signals to slice update slots
         self.slider.valueChanged.connect(self.update_slice)
+        self.slider.sliderPressed.connect(lambda: self.viewer.set_interacting(True))
+        self.slider.sliderReleased.connect(lambda: self.viewer.set_interacting(False))
         
         # Connect buttons to slots
         self.prevBtn.clicked.connect(lambda: self.next_prev_btn(self.slider.value()-10))
         self.playBtn.clicked.connect(self.play_pause_btn)
         self.nextBtn.clicked.connect(lambda: self.next_prev_btn(self.slider.value()+10))
 
+        # Slab mode and thickness
+        self.slabCombo.currentIndexChanged.connect(lambda index: self.viewer.set_slab(self.slabCombo.currentData(), self.slabSpin.value()))
+        self.slabSpin.valueChanged.connect(self.viewer.set_slab_thickness)
+
+        # Cine frames move the slider (GUI thread), which updates the slice
+        self.cine.frameChanged.connect(self.slider.setValue)
+        self.cine.finished.connect(self.pause_slices)
+        self.cine.statsChanged.connect(lambda fps, dropped: self.fpsLabel.setText(f"{fps:.0f} fps ({dropped})"))
+        self.fpsSpin.valueChanged.connect(self.set_cine_fps)
+        self.linkCheck.toggled.connect(self.set_cine_linked)
+        CineEngine.default().fpsChanged.connect(self.show_linked_fps)
+
     # Update slice
     def update_slice(self, slice_index):
         self.viewer.set_slice(slice_index)
@@ -93,6 +140,8 @@ class QtOrthoViewer(QtViewer):
         self.prevBtn.setEnabled(True)
         self.playBtn.setEnabled(True)
         self.nextBtn.setEnabled(True)
+        self.slabCombo.setEnabled(True)
+        self.slabSpin.setEnabled(True)
     
         # Settings of the slider
         self.slider.setEnabled(True)
@@ -110,45 +159,46 @@ class QtOrthoViewer(QtViewer):
         self.slider.setValue(slice_index)
         self.viewer.set_slice(slice_index)
         
-    # Play slices            
+    # Play slices
     def play_slices(self):
-        self.thread = QThread()
-        self.worker = Worker(self.slider)
         self.status = True
-        
+
         # Play Button icon
         self.playBtn.setIcon(QIcon("./assets/pause.ico"))
-                
-        # Final resets
-        # Move worker to the thread
-        self.worker.moveToThread(self.thread)
-        
-        # Connect signals and slots
-        self.thread.started.connect(self.worker.play)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.worker.progress.connect(self.update_slice)
-        
-        # Start the thread
-        self.thread.start()
         self.slider.setHidden(True)
-        self.thread.finished.connect(
-            lambda: self.slider.setHidden(False)
-        )
-        self.thread.finished.connect(
-            self.pause_slices
-        )
+
+        # From the current slice to the end, dropping frames if rendering falls behind
+        self.cine.set_range(self.slider.minimum(), self.slider.maximum())
+        self.cine.play(self.slider.value())
 
     # Pause slices
     def pause_slices(self):
+        self.cine.pause()
         self.playBtn.setIcon(QIcon("./assets/play.ico"))
-        self.worker.pause()
+        self.slider.setHidden(False)
         self.status = False
 
+    # Frame rate of the spin box: the shared one while linked, this viewer's own otherwise
+    def set_cine_fps(self, fps):
+        if self.linkCheck.isChecked():
+            CineEngine.default().set_fps(fps)
+        else:
+            self.cine.set_fps(fps)
+
+    def set_cine_linked(self, linked):
+        self.cine.set_linked(linked)
+        self.show_linked_fps(self.cine.rate())
+
+    # Show the shared frame rate set from another linked viewer
+    def show_linked_fps(self, fps):
+        if self.linkCheck.isChecked():
+            self.fpsSpin.blockSignals(True)
+            self.fpsSpin.setValue(int(round(fps)))
+            self.fpsSpin.blockSignals(False)
+
     # Play/Pause button function    
     def play_pause_btn(self):
         if self.status == False:
             self.play_slices()
         else:
-            self.pause_slices()
\ No newline at end of file
+            self.pause_slices()
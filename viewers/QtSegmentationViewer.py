@@ -26,6 +26,15 @@ class QtSegmentationViewer(QtViewer):
 
     def _init_UI(self):
         super()._init_UI()
+
+        ## Volume rendering toggle
+        self.volumeRenderingCheckBox = QCheckBox("Volume rendering")
+        self.volumeRenderingCheckBox.setToolTip("CPU ray casting, coarser while the camera moves")
         
         # Set up the layout
-        self.mainLayout.addItem(QSpacerItem(10,20))
\ No newline at end of file
+        self.mainLayout.addWidget(self.volumeRenderingCheckBox)
+        self.mainLayout.addItem(QSpacerItem(10,20))
+
+    # Connect signals and slots
+    def connect(self):
+        self.volumeRenderingCheckBox.toggled.connect(self.viewer.set_volume_rendering)
\ No newline at end of file
@@ -1,4 +1,12 @@
 import vtk
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtWidgets import QLabel
+
+
+class StatsNotifier(QObject):
+    """Brings the end of the summed-table build back to the GUI thread."""
+    ready = pyqtSignal()
+
 
 class ROIViewer:
     def __init__(self, main_app, vtk_base):
@@ -6,6 +14,16 @@ class ROIViewer:
         self.vtk_base = vtk_base
         self.box_widgets = []
         self.current_box_widget = None
+        self.roi_extent = None
+        self.roi_array = None
+
+        # Live statistics of the box, in the status bar
+        self.stats_label = QLabel()
+        self.main_app.status_bar.addPermanentWidget(self.stats_label)
+        self.stats_bounds = None
+        # Queued to the GUI thread: refresh the label once the tables are built
+        self.stats_notifier = StatsNotifier()
+        self.stats_notifier.ready.connect(self.refresh_stats)
 
         for i in range(3):
             box_widget = vtk.vtkBoxWidget()
@@ -28,6 +46,26 @@ class ROIViewer:
             if box_widget != self.current_box_widget:
                 box_widget.PlaceWidget(planes.GetBounds())
 
+        # O(1) sums from the summed-volume tables: cheap enough for every drag event
+        self.show_stats(planes.GetBounds())
+
+    def show_stats(self, bounds):
+        self.stats_bounds = bounds
+        stats = self.vtk_base.get_roi_stats(bounds, on_ready=self.stats_notifier.ready.emit)
+        self.stats_label.setText(self.format_stats(stats) if stats else "ROI: computing statistics...")
+        return stats
+
+    # Statistics of the last bounds shown, e.g. when the tables become ready
+    def refresh_stats(self):
+        if self.stats_bounds is not None:
+            self.show_stats(self.stats_bounds)
+
+    @staticmethod
+    def format_stats(stats):
+        return (f"ROI: mean {stats['mean']:.1f}  std {stats['std']:.1f}  "
+                f"min {stats['min']:g}  max {stats['max']:g}  "
+                f"{stats['count']} voxels  {stats['volume_ml']:.2f} mL")
+
     def get_roi_bounds(self):
         if self.current_box_widget:
             planes = vtk.vtkPlanes()
@@ -40,20 +78,28 @@ class ROIViewer:
         if bounds:
             print(f"ROI Bounds: {bounds}")
 
-            # Extract the ROI data
-            extract = vtk.vtkExtractVOI()
-            extract.SetInputData(self.vtk_base.imageReader.GetOutput())
-            extract.SetVOI(int(bounds[0]), int(bounds[1]), int(bounds[2]), int(bounds[3]), int(bounds[4]), int(bounds[5]))
-            extract.Update()
+            # Zero-copy view of the ROI in the shared volume
+            self.roi_extent = self.vtk_base.bounds_to_extent(bounds)
+            # Shared with ROI-restricted organ detection
+            self.vtk_base.roiExtent = tuple(self.roi_extent)
+            self.roi_array = self.vtk_base.get_roi_array(bounds)
+            print(f"ROI Extent: {self.roi_extent} ({self.roi_array.size} voxels)")
+            stats = self.show_stats(bounds)
+            if stats:
+                print(self.format_stats(stats))
 
             # Display the ROI in the extra viewer
-            self.main_app.QtExtraViewer.get_viewer().image_actor.SetInputData(extract.GetOutput())
+            self.main_app.QtExtraViewer.get_viewer().set_roi_bounds(bounds)
             self.main_app.QtExtraViewer.render()
 
     def on(self):
+        # Start building the study's summed-volume tables
+        self.vtk_base.get_integral_volume(on_ready=self.stats_notifier.ready.emit)
+        self.stats_label.show()
         for box_widget in self.box_widgets:
             box_widget.On()
 
     def off(self):
+        self.stats_label.hide()
         for box_widget in self.box_widgets:
             box_widget.Off()
\ No newline at end of file
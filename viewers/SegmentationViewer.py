@@ -4,6 +4,7 @@ import numpy as np
 
 from vtk import *
 from .VtkViewer import *
+from components.VolumeRenderer import VolumeRenderer
 
 # Segmentation Viewer
 class SegmentationViewer(VtkViewer):
@@ -19,7 +20,9 @@ class SegmentationViewer(VtkViewer):
         self.imagePlaneWidgets = [vtkImagePlaneWidget(), vtkImagePlaneWidget(), vtkImagePlaneWidget()]
         for imagePlaneWidget in self.imagePlaneWidgets:
             imagePlaneWidget.SetInteractor(self.renderWindowInteractor)
-            imagePlaneWidget.SetInputData(self.vtkBaseClass.imageBlend.GetOutput())
+            imagePlaneWidget.SetInputData(self.vtkBaseClass.imageReader.GetOutput())
+            imagePlaneWidget.UserControlledLookupTableOn()
+            imagePlaneWidget.SetLookupTable(self.vtkBaseClass.grayscaleLut)
             imagePlaneWidget.SetDefaultRenderer(self.renderer)
             imagePlaneWidget.SetPicker(self.picker)
             imagePlaneWidget.RestrictPlaneToVolumeOn()
@@ -29,6 +32,13 @@ class SegmentationViewer(VtkViewer):
             imagePlaneWidget.DisplayTextOn()
             imagePlaneWidget.On()
             imagePlaneWidget.InteractionOn()
+            # Nearest-neighbour (and coarser, on slow machines) reslicing while a plane is dragged
+            imagePlaneWidget.AddObserver(vtkCommand.StartInteractionEvent, lambda caller, event: self.set_plane_interacting(True))
+            imagePlaneWidget.AddObserver(vtkCommand.EndInteractionEvent, lambda caller, event: self.set_plane_interacting(False))
+
+        ## Label overlay on each image plane
+        self.labelPlanes = [self.vtkBaseClass.labelOverlay.add_plane(self.renderer, lambda widget=imagePlaneWidget: self.get_label_location(widget))
+                            for imagePlaneWidget in self.imagePlaneWidgets]
             
         ## Renderer Settings
         self.renderer.SetBackground(0.05, 0.05, 0.05)
@@ -38,6 +48,52 @@ class SegmentationViewer(VtkViewer):
         self.renderer.GetActiveCamera().Dolly(1.15)
         self.renderer.ResetCameraClippingRange()
 
+        ## ROI Outline
+        self.roiOutline = vtkOutlineSource()
+        self.roiOutlineMapper = vtkPolyDataMapper()
+        self.roiOutlineMapper.SetInputConnection(self.roiOutline.GetOutputPort())
+        self.roiOutlineActor = vtkActor()
+        self.roiOutlineActor.SetMapper(self.roiOutlineMapper)
+        self.roiOutlineActor.GetProperty().SetColor(1, 1, 0)
+        self.roiOutlineActor.VisibilityOff()
+        self.renderer.AddActor(self.roiOutlineActor)
+
+        ## Volume Rendering (off until enabled), coarse while the camera moves
+        self.volumeRenderer = VolumeRenderer(self.vtkBaseClass, self.renderer)
+        self.interactorStyle = vtkInteractorStyleTrackballCamera()
+        self.renderWindowInteractor.SetInteractorStyle(self.interactorStyle)
+        self.interactorStyle.AddObserver(vtkCommand.StartInteractionEvent, lambda caller, event: self.volumeRenderer.start_interaction())
+        self.interactorStyle.AddObserver(vtkCommand.EndInteractionEvent, lambda caller, event: self.end_interaction())
+
     # Connect on data
     def connect_on_data(self, path:str):
-        super().connect_on_data(path)
\ No newline at end of file
+        super().connect_on_data(path)
+        if self.volumeRenderer.enabled:
+            self.volumeRenderer.connect_on_data()
+
+    # Show or hide the volume rendering
+    def set_volume_rendering(self, enabled:bool):
+        self.volumeRenderer.set_enabled(enabled)
+        self.render()
+
+    # Full-quality frame once the camera stops
+    def end_interaction(self):
+        self.volumeRenderer.end_interaction()
+        if self.volumeRenderer.enabled:
+            self.render()
+
+    # Reslice quality of every view while a plane is dragged; full quality again on release
+    def set_plane_interacting(self, interacting:bool):
+        if self.vtkBaseClass.set_interaction_level(interacting):
+            self.vtkBaseClass.commandSliceSelect.request_render()
+
+    # Slice of an image plane whose labels are drawn over it
+    def get_label_location(self, imagePlaneWidget):
+        if self.vtkBaseClass.storedVolume is None or not imagePlaneWidget.GetEnabled():
+            return None
+        return imagePlaneWidget.GetPlaneOrientation(), imagePlaneWidget.GetSliceIndex(), imagePlaneWidget.GetSlicePosition()
+
+    # Show the ROI box (world bounds) around the image planes
+    def set_roi_bounds(self, bounds):
+        self.roiOutline.SetBounds(bounds)
+        self.roiOutlineActor.VisibilityOn()
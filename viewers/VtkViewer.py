@@ -2,6 +2,7 @@
 # pylint: disable-msg=E0611,E0602
 import numpy as np
 from components.VtkBase import VtkBase
+from components.RenderScheduler import RenderScheduler
 
 from vtk import *
 import vtk.qt
@@ -26,15 +27,6 @@ class VtkViewer(QVTKRenderWindowInteractor):
         ## Reader
         self.imageReader = self.vtkBaseClass.imageReader
 
-        ## Image Shift Scale
-        self.imageShiftScale = self.vtkBaseClass.imageShiftScale
-        
-        ## Image Window Level
-        self.imageWindowLevel = self.vtkBaseClass.imageWindowLevel
-        
-        ## Image Blend
-        self.imageBlend = self.vtkBaseClass.imageBlend
-        
         ## Renderer
         self.renderer = vtkRenderer()
         
@@ -45,6 +37,9 @@ class VtkViewer(QVTKRenderWindowInteractor):
                 
         ## Interactor
         self.renderWindowInteractor = self.renderWindow.GetInteractor()
+
+        ## The camera is fitted to the data once per loaded study, not on every render
+        self.cameraNeedsReset = True
         
         ## Label Text Actor
         self.labelTextActor = vtkTextActor() 
@@ -59,6 +54,7 @@ class VtkViewer(QVTKRenderWindowInteractor):
 
     # Destructor
     def closeEvent(self, QCloseEvent):
+        RenderScheduler.default().cancel(self.renderWindow)
         super().closeEvent(QCloseEvent)
         self.renderer.FastDelete()
         self.Finalize()
@@ -67,16 +63,16 @@ class VtkViewer(QVTKRenderWindowInteractor):
     def connect_on_data(self, path:str):
         if path == "":
             return
+        self.cameraNeedsReset = True
     
     def update(self):
-        self.imageReader.UpdateWholeExtent()
-        self.imageShiftScale.UpdateWholeExtent()
-        self.imageWindowLevel.UpdateWholeExtent()
-        self.imageBlend.UpdateWholeExtent()
-        self.GetRenderWindow().Modified()
-        self.renderer.ResetCamera()
+        # The shared chain only re-executes if one of its stages changed
+        self.vtkBaseClass.update_pipeline()
+        if self.cameraNeedsReset:
+            self.renderer.ResetCamera()
+            self.cameraNeedsReset = False
 
-    # Render       
+    # Render at the next display frame (requests within a frame are coalesced)
     def render(self):
         self.update()
-        self.GetRenderWindow().Render()
\ No newline at end of file
+        RenderScheduler.default().request(self.renderWindow)